@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class GestionConfig(AppConfig):
     name = "gestion"
+
+    def ready(self):
+        # Relance des écritures SQLite bloquées (voir database.py)
+        from .database import install_lock_retry
+        connection_created.connect(install_lock_retry)
+        # Journal des requêtes lentes (voir slow_queries.py)
+        from .slow_queries import install_slow_query_log
+        connection_created.connect(install_slow_query_log)
+        # Requêtes SQL par vue pour les métriques (voir metrics.py)
+        from .metrics import install_query_counter
+        connection_created.connect(install_query_counter)
+        # Vérifications au démarrage (caches partagés, voir checks.py)
+        from . import checks  # noqa: F401
+        # Enregistre les receivers des signaux (tableau de bord...)
+        from . import signals  # noqa: F401
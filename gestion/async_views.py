@@ -0,0 +1,115 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from . import dashboard
+from .models import Client, Assurance
+from .pagination import API_MAX_PAGE_SIZE, InvalidCursor, KeysetPaginator
+from .search import search_clients
+from .serializers import ClientSerializer, AssuranceSerializer
+
+
+# --------- VUES DE LECTURE ASYNCHRONES (ASGI) ---------
+# Sous ASGI (intia_assurance/asgi.py, ex. `uvicorn intia_assurance.asgi:application`),
+# une vue synchrone passe par un adaptateur qui exécute la requête dans un thread partagé.
+# Ces vues JSON en lecture seule sont des coroutines : les requêtes SQL passent par l'ORM
+# asynchrone (aget, async for), et la boucle d'événements continue de servir d'autres
+# requêtes pendant les attentes. Elles restent utilisables sous WSGI (adaptées par Django).
+# Voir la commande benchmark_asgi pour la comparaison de débit avec le chemin WSGI.
+
+ASYNC_PAGE_SIZE = 50
+
+
+def async_login_required(view):
+    """
+    Décorateur pour les vues async : charge l'utilisateur de la session de façon asynchrone
+    (request.auser()) et répond 401 en JSON s'il n'est pas connecté.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'detail': "Authentification requise."}, status=401)
+        # Remplace l'objet paresseux : un accès synchrone à la base est interdit ici
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _page_size(request):
+    raw = request.GET.get('page_size', '')
+    if raw.isdigit() and int(raw) > 0:
+        return min(int(raw), API_MAX_PAGE_SIZE)
+    return ASYNC_PAGE_SIZE
+
+
+async def _keyset_response(request, queryset, ordering, serializer_class):
+    paginator = KeysetPaginator(queryset, _page_size(request), ordering)
+    try:
+        page = await paginator.apage(request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'detail': "Curseur de pagination invalide."}, status=400)
+    return JsonResponse({
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+        'results': serializer_class(page.object_list, many=True).data,
+    })
+
+
+async def _detail_response(queryset, pk, serializer_class):
+    try:
+        obj = await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        return JsonResponse({'detail': "Introuvable."}, status=404)
+    return JsonResponse(serializer_class(obj).data)
+
+
+@require_GET
+@async_login_required
+async def async_client_list_view(request):
+    """
+    Clients de la branche, triés par nom (pagination par curseur : ?cursor=, ?page_size=).
+    Avec ?q= : recherche plein texte, résultats classés par pertinence (une page).
+    """
+    queryset = Client.objects.for_user(request.user)
+    query = request.GET.get('q', '').strip()
+    if query:
+        # La recherche FTS5 utilise un curseur SQL brut : exécutée dans un thread
+        queryset = await sync_to_async(search_clients)(queryset, query)
+        results = [client async for client in queryset[:_page_size(request)]]
+        return JsonResponse({'next': None, 'previous': None, 'results': ClientSerializer(results, many=True).data})
+    return await _keyset_response(request, queryset, 'nom', ClientSerializer)
+
+
+@require_GET
+@async_login_required
+async def async_client_detail_view(request, pk):
+    return await _detail_response(Client.objects.for_user(request.user), pk, ClientSerializer)
+
+
+@require_GET
+@async_login_required
+async def async_assurance_list_view(request):
+    """
+    Contrats de la branche, triés par date de fin (pagination par curseur).
+    """
+    queryset = Assurance.objects.for_user(request.user)
+    return await _keyset_response(request, queryset, 'date_fin', AssuranceSerializer)
+
+
+@require_GET
+@async_login_required
+async def async_assurance_detail_view(request, pk):
+    return await _detail_response(Assurance.objects.for_user(request.user), pk, AssuranceSerializer)
+
+
+@require_GET
+@async_login_required
+async def async_dashboard_view(request):
+    """
+    Statistiques du tableau de bord par branche visible (mêmes chiffres que la page d'accueil).
+    """
+    statistiques = await dashboard.abranch_statistics(request.user)
+    return JsonResponse(dashboard.statistics_json(statistiques))
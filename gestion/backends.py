@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from . import metrics
+
+
+# --------- CHARGEMENT DE L'UTILISATEUR CONNECTÉ EN CACHE ---------
+# À chaque requête, AuthenticationMiddleware relit l'utilisateur de la session,
+# puis les templates lisent user.branch (encore une requête). Le backend garde
+# l'utilisateur en cache, avec sa branche (select_related) ; la session elle-même
+# est en cache (SESSION_ENGINE cached_db). Cache chaud : aucune requête SQL pour
+# authentifier une requête.
+# Invalidation (signals.py) : enregistrement ou suppression de l'utilisateur
+# (changement de mot de passe, de rôle, de branche, last_login...), modification ou
+# suppression de sa branche. Les écritures sans signal (QuerySet.update) sont
+# prises en compte au plus tard après AUTH_USER_CACHE_TIMEOUT.
+# Le hash de session est vérifié sur l'utilisateur en cache : un mot de passe changé
+# invalide l'entrée, donc les autres sessions sont bien déconnectées.
+# Le cache doit être partagé par tous les workers (voir checks.py) : sinon les autres
+# processus serviraient l'ancien utilisateur jusqu'à AUTH_USER_CACHE_TIMEOUT.
+# Un défaut de cache relit l'utilisateur sur "default", jamais sur la réplique : en
+# retard, elle remettrait en cache l'état d'avant l'invalidation (voir routers.py).
+
+USER_CACHE_ALIAS = getattr(settings, "AUTH_USER_CACHE_ALIAS", "default")
+USER_CACHE_TIMEOUT = getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 300)
+
+
+def user_cache():
+    return caches[USER_CACHE_ALIAS]
+
+
+def user_cache_key(user_id):
+    return f"auth:utilisateur:{user_id}"
+
+
+def invalidate_users(user_ids):
+    """
+    Retire les utilisateurs `user_ids` du cache, maintenant et au commit : une requête
+    concurrente a pu remettre en cache l'état d'avant la transaction entre-temps.
+    """
+    keys = [user_cache_key(pk) for pk in user_ids]
+    if not keys:
+        return
+    user_cache().delete_many(keys)
+    transaction.on_commit(lambda: user_cache().delete_many(keys))
+
+
+def _user_queryset():
+    return get_user_model()._default_manager.using(DEFAULT_DB_ALIAS).select_related("branch")
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend dont get_user() / aget_user() lisent d'abord le cache
+    (utilisateur et branche). L'authentification par mot de passe est inchangée.
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = user_cache().get(key)
+        metrics.cache_result("utilisateurs", user is not None)
+        if user is None:
+            try:
+                user = _user_queryset().get(pk=user_id)
+            except get_user_model().DoesNotExist:
+                return None
+            user_cache().set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = await user_cache().aget(key)
+        metrics.cache_result("utilisateurs", user is not None)
+        if user is None:
+            try:
+                user = await _user_queryset().aget(pk=user_id)
+            except get_user_model().DoesNotExist:
+                return None
+            await user_cache().aset(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,189 @@
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from .signals import bulk_saved
+
+
+# --------- OPÉRATIONS EN MASSE SUR L'API (création / modification / suppression) ---------
+# Une intégration qui pousse des milliers de changements par heure paie, pour chaque
+# objet envoyé séparément, le coût HTTP + authentification + session + transaction.
+# Ce mixin accepte une liste d'objets en une seule requête :
+#   POST   /api/<ressource>/        [{...}, {...}]               -> bulk_create
+#   PATCH  /api/<ressource>/bulk/   [{"id": 1, ...}, ...]        -> bulk_update
+#   DELETE /api/<ressource>/bulk/   [1, 2, 3] ou [{"id": 1}, ...] -> suppression
+# Tout se fait dans une seule transaction : si un élément est invalide, rien n'est écrit
+# et la réponse 400 contient une erreur par élément (dans l'ordre de la liste envoyée).
+# bulk_create / bulk_update n'envoient pas post_save : le signal bulk_saved (signals.py)
+# prévient les agrégats qui en dépendent. La suppression passe par QuerySet.delete(),
+# qui envoie post_delete pour chaque objet.
+
+# Taille des lots SQL (INSERT / UPDATE / DELETE)
+API_BULK_BATCH_SIZE = getattr(settings, "API_BULK_BATCH_SIZE", 500)
+
+# Nombre maximal d'éléments acceptés dans une requête
+API_BULK_MAX_ITEMS = getattr(settings, "API_BULK_MAX_ITEMS", 5000)
+
+
+def _prime_relations(serializer, caches):
+    """
+    Remplace la validation des clés étrangères (une requête SQL par élément)
+    par une recherche dans les objets préchargés en une requête.
+    """
+    for name, cache in caches.items():
+        field = serializer.fields[name]
+
+        def to_internal_value(data, field=field, cache=cache):
+            try:
+                obj = cache.get(int(data))
+            except (TypeError, ValueError):
+                field.fail("incorrect_type", data_type=type(data).__name__)
+            if obj is None:
+                field.fail("does_not_exist", pk_value=data)
+            return obj
+
+        field.to_internal_value = to_internal_value
+
+
+class BulkModelViewSetMixin:
+    """
+    Mixin pour les ModelViewSet : ajoute la création, la modification partielle
+    et la suppression en masse. La taille des lots se règle avec `bulk_batch_size`
+    (ou settings.API_BULK_BATCH_SIZE).
+    """
+
+    bulk_batch_size = API_BULK_BATCH_SIZE
+    bulk_max_items = API_BULK_MAX_ITEMS
+
+    # --- Outils communs ---
+
+    def _check_payload(self, data):
+        if not isinstance(data, list):
+            return Response({"detail": "Une liste d'objets est attendue."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(data) > self.bulk_max_items:
+            return Response(
+                {"detail": f"Trop d'éléments ({len(data)}), maximum {self.bulk_max_items}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return None
+
+    def _relation_caches(self, serializer, items):
+        """
+        Précharge, en une requête par relation, les objets référencés par les éléments.
+        """
+        caches = {}
+        for name, field in serializer.fields.items():
+            if field.read_only or not isinstance(field, PrimaryKeyRelatedField):
+                continue
+            ids = set()
+            for item in items:
+                value = item.get(name) if isinstance(item, dict) else None
+                if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+                    ids.add(int(value))
+            caches[name] = field.get_queryset().in_bulk(ids) if ids else {}
+        return caches
+
+    # --- Création ---
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        error = self._check_payload(request.data)
+        if error:
+            return error
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        _prime_relations(serializer.child, self._relation_caches(serializer.child, request.data))
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        model = serializer.child.Meta.model
+        instances = [model(**attrs) for attrs in serializer.validated_data]
+        with transaction.atomic():
+            model.objects.bulk_create(instances, batch_size=self.bulk_batch_size)
+            bulk_saved.send(sender=model, instances=instances, created=True)
+        serializer.instance = instances
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    # --- Modification partielle et suppression ---
+
+    @action(detail=False, methods=["patch", "delete"], url_path="bulk")
+    def bulk(self, request):
+        if request.method == "DELETE":
+            return self.bulk_destroy(request)
+        return self.bulk_partial_update(request)
+
+    def _item_id(self, item):
+        value = item.get("id") if isinstance(item, dict) else item
+        if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+            return int(value)
+        return None
+
+    def bulk_partial_update(self, request):
+        items = request.data
+        error = self._check_payload(items)
+        if error:
+            return error
+
+        ids = [self._item_id(item) for item in items]
+        # Une seule requête pour charger tous les objets à modifier
+        instances = self.get_queryset().in_bulk([pk for pk in ids if pk is not None])
+        caches = self._relation_caches(self.get_serializer(), items)
+
+        errors, updated, fields = [], [], set()
+        for pk, item in zip(ids, items):
+            instance = instances.get(pk)
+            if instance is None:
+                errors.append({"id": ["Objet introuvable."]})
+                continue
+            serializer = self.get_serializer(instance, data=item, partial=True)
+            _prime_relations(serializer, caches)
+            if not serializer.is_valid():
+                errors.append(serializer.errors)
+                continue
+            for attr, value in serializer.validated_data.items():
+                setattr(instance, attr, value)
+                fields.add(attr)
+            errors.append({})
+            updated.append(instance)
+
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        if fields:
+            model = self.get_queryset().model
+            # bulk_update n'applique pas auto_now : on met à jour updated_at nous-mêmes
+            for field in model._meta.concrete_fields:
+                if getattr(field, "auto_now", False):
+                    for instance in updated:
+                        field.pre_save(instance, add=False)
+                    fields.add(field.name)
+            with transaction.atomic():
+                model.objects.bulk_update(updated, sorted(fields), batch_size=self.bulk_batch_size)
+                bulk_saved.send(sender=model, instances=updated)
+        return Response(self.get_serializer(updated, many=True).data)
+
+    def bulk_destroy(self, request):
+        items = request.data
+        error = self._check_payload(items)
+        if error:
+            return error
+
+        ids = [self._item_id(item) for item in items]
+        existing = set(
+            self.get_queryset().filter(pk__in=[pk for pk in ids if pk is not None]).values_list("pk", flat=True)
+        )
+        errors = [{} if pk in existing else {"id": ["Objet introuvable."]} for pk in ids]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        ordered = sorted(existing)
+        with transaction.atomic():
+            for start in range(0, len(ordered), self.bulk_batch_size):
+                batch = ordered[start:start + self.bulk_batch_size]
+                # QuerySet.delete() des modèles journalisés : journal et caches mis à jour
+                # par lot (bulk_deleted), pas objet par objet
+                self.get_queryset().filter(pk__in=batch).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,226 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import Page
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import metrics
+from .pagination import KeysetPage, KeysetPaginator
+
+
+# --------- CACHE DES LISTES PAR BRANCHE ---------
+# Les agents d'une même branche demandent sans cesse les mêmes pages (/clients/,
+# /api/assurances/...) entre deux écritures. On met en cache le résultat d'une page
+# (objets de la page pour les vues web, données sérialisées pour l'API), avec une clé :
+#   liste:<ressource>:<périmètre>:<version>:<empreinte de l'URL et des filtres>
+# - le périmètre est celui de Branche/Client/Assurance.objects.for_user() :
+#   'all' (siège), 'b<id>' (une branche) ou 'none' ;
+# - la version est un compteur par (ressource, périmètre), incrémenté par les signaux
+#   post_save / post_delete / bulk_saved (signals.py) : les anciennes clés ne sont plus lues
+#   et disparaissent à expiration (LIST_CACHE_TIMEOUT) ou par éviction.
+# Éviction : FileBasedCache n'est pas LRU. Au-delà de MAX_ENTRIES, chaque set() supprime
+# une part 1/CULL_FREQUENCY des fichiers, choisis au hasard (et liste le dossier pour
+# compter les entrées : un coût par page mise en cache, pas par page servie). Pour une
+# éviction LRU, utiliser Redis (maxmemory-policy allkeys-lru) ou Memcached.
+# Le cache doit être partagé par les workers (FileBasedCache, Redis...) pour que
+# l'invalidation soit vue de tous (voir checks.py). Sur FileBasedCache, incr() n'est pas
+# atomique : deux écritures simultanées peuvent ne compter qu'un incrément, mais la version
+# change quand même, les anciennes clés ne sont donc plus lues.
+# Succès / échecs : comptés en mémoire par metrics.py (aucune écriture dans le cache).
+# Le HTML n'est pas mis en cache tel quel : la barre de navigation dépend de l'utilisateur.
+
+LIST_CACHE_ALIAS = getattr(settings, "LIST_CACHE_ALIAS", "default")
+LIST_CACHE_TIMEOUT = getattr(settings, "LIST_CACHE_TIMEOUT", 300)
+
+# Listes à invalider quand un objet change : les listes de contrats affichent aussi
+# le client et la branche, celles des clients affichent la branche
+DEPENDENCIES = {
+    "branche": ("branche", "client", "assurance"),
+    "client": ("client", "assurance"),
+    "assurance": ("assurance",),
+}
+
+def list_cache():
+    return caches[LIST_CACHE_ALIAS]
+
+
+def user_scope(user):
+    """
+    Périmètre des données visibles par `user`, avec les mêmes règles que
+    BrancheScopedQuerySet.for_user().
+    """
+    if not user.is_authenticated:
+        return "none"
+    if user.is_superuser or user.is_super_admin():
+        return "all"
+    if user.branch_id is None:
+        return "none"
+    return f"b{user.branch_id}"
+
+
+# --- Versions ---
+
+def _version_key(resource, scope):
+    return f"liste:version:{resource}:{scope}"
+
+
+def get_version(resource, scope):
+    cache = list_cache()
+    key = _version_key(resource, scope)
+    version = cache.get(key)
+    if version is None:
+        # Valeur de départ imprévisible : si la clé a été évincée, la nouvelle version
+        # ne peut pas retomber sur celle d'anciennes entrées encore présentes
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(resource, scopes):
+    cache = list_cache()
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(resource, scope))
+        except ValueError:
+            # Clé absente : aucune entrée de ce périmètre n'est lisible
+            get_version(resource, scope)
+
+
+def invalidate(model_name, branche_ids):
+    """
+    Invalide les listes qui peuvent afficher un objet de `model_name` appartenant
+    aux branches `branche_ids` (périmètres de ces branches et du siège).
+    L'incrément est refait au commit : une lecture concurrente a pu remettre en cache
+    les données d'avant la transaction entre-temps.
+    """
+    scopes = {"all"} | {f"b{pk}" for pk in branche_ids if pk is not None}
+
+    def bump():
+        for resource in DEPENDENCIES[model_name]:
+            bump_versions(resource, scopes)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+# --- Compteurs ---
+
+def stats():
+    """Succès / échecs du cache des listes, tous workers confondus (compteurs de metrics.py)."""
+    totals = metrics.cache_totals("listes")
+    hits, misses = totals["hit"], totals["miss"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+        "backend": settings.CACHES[LIST_CACHE_ALIAS]["BACKEND"],
+    }
+
+
+# --- Clés ---
+
+def list_cache_key(resource, request):
+    """
+    Clé de cache d'une page de liste pour l'utilisateur de `request` :
+    ressource, périmètre, version, et empreinte du chemin, des paramètres (page, curseur,
+    filtres, recherche), de l'hôte (liens absolus de l'API) et du jour (échéances).
+    """
+    scope = user_scope(request.user)
+    params = sorted((key, tuple(values)) for key, values in request.GET.lists())
+    raw = repr((request.get_host(), request.path, params, timezone.localdate().isoformat()))
+    digest = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    return f"liste:{resource}:{scope}:{get_version(resource, scope)}:{digest}"
+
+
+# --- Mixins ---
+
+class CachedListViewMixin:
+    """
+    Mixin pour les ListView paginées : met en cache les objets de la page et
+    les informations de pagination (nombre total en mode classique, curseurs en mode keyset).
+    À placer avant KeysetPaginationMixin. L'en-tête X-Cache indique HIT ou MISS.
+    """
+
+    cache_resource = None
+    list_cache_status = None
+
+    def get_cache_resource(self):
+        return self.cache_resource or self.model._meta.model_name
+
+    def paginate_queryset(self, queryset, page_size):
+        cache = list_cache()
+        key = list_cache_key(self.get_cache_resource(), self.request)
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.cache_result("listes", True)
+            self.list_cache_status = "HIT"
+            return self._restore_page(queryset, page_size, cached)
+
+        metrics.cache_result("listes", False)
+        self.list_cache_status = "MISS"
+        paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+        rows = list(object_list)
+        if isinstance(page, KeysetPage):
+            frozen = ("keyset", rows, page.next_cursor, page.previous_cursor, is_paginated)
+        else:
+            frozen = ("offset", rows, page.number, paginator.count, is_paginated)
+        cache.set(key, frozen, LIST_CACHE_TIMEOUT)
+        return paginator, page, rows, is_paginated
+
+    def _restore_page(self, queryset, page_size, cached):
+        mode, rows, *state = cached
+        if mode == "keyset":
+            next_cursor, previous_cursor, is_paginated = state
+            paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+            page = KeysetPage(rows, next_cursor, previous_cursor)
+        else:
+            number, count, is_paginated = state
+            paginator = self.get_paginator(
+                queryset, page_size, orphans=self.get_paginate_orphans(),
+                allow_empty_first_page=self.get_allow_empty(),
+            )
+            # Nombre total mémorisé : pas de COUNT(*)
+            paginator.__dict__["count"] = count
+            page = Page(rows, number, paginator)
+        return paginator, page, rows, is_paginated
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        if self.list_cache_status:
+            response["X-Cache"] = self.list_cache_status
+        return response
+
+
+class CachedListViewSetMixin:
+    """
+    Mixin pour les ViewSets : met en cache les données sérialisées de l'action `list`
+    (page de résultats avec ses liens next / previous). L'en-tête X-Cache indique HIT ou MISS.
+    """
+
+    cache_resource = None
+
+    def get_cache_resource(self):
+        return self.cache_resource or self.queryset.model._meta.model_name
+
+    def list(self, request, *args, **kwargs):
+        cache = list_cache()
+        key = list_cache_key(self.get_cache_resource(), request)
+        data = cache.get(key)
+        if data is not None:
+            metrics.cache_result("listes", True)
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        metrics.cache_result("listes", False)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, LIST_CACHE_TIMEOUT)
+        response["X-Cache"] = "MISS"
+        return response
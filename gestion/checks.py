@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+
+# --------- VÉRIFICATIONS AU DÉMARRAGE (manage.py check, runserver, migrate...) ---------
+# Un cache propre à chaque processus (LocMemCache, DummyCache) ne convient pas aux données
+# qui doivent être invalidées pour tous les workers : sessions et utilisateurs connectés
+# (erreur), pages des listes (avertissement).
+# Avec plusieurs workers, un utilisateur déconnecté, désactivé ou changé de branche resterait
+# servi par les autres workers jusqu'à expiration de l'entrée.
+
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def _process_local(alias):
+    return settings.CACHES.get(alias, {}).get("BACKEND") in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_shared_auth_cache(app_configs, **kwargs):
+    errors = []
+    if "gestion.backends.CachedModelBackend" in settings.AUTHENTICATION_BACKENDS:
+        alias = getattr(settings, "AUTH_USER_CACHE_ALIAS", "default")
+        if _process_local(alias):
+            errors.append(Error(
+                f"CachedModelBackend garde les utilisateurs dans le cache '{alias}', propre à chaque processus.",
+                hint="Configurer ce cache sur un backend partagé (FileBasedCache, DatabaseCache, Redis).",
+                id="gestion.E001",
+            ))
+    if settings.SESSION_ENGINE in ("django.contrib.sessions.backends.cached_db", "django.contrib.sessions.backends.cache"):
+        alias = settings.SESSION_CACHE_ALIAS
+        if _process_local(alias):
+            errors.append(Error(
+                f"Les sessions ({settings.SESSION_ENGINE}) sont lues dans le cache '{alias}', propre à chaque processus.",
+                hint="Configurer ce cache sur un backend partagé (FileBasedCache, DatabaseCache, Redis).",
+                id="gestion.E002",
+            ))
+    return errors
+
+
+@register(Tags.caches)
+def check_shared_list_cache(app_configs, **kwargs):
+    alias = getattr(settings, "LIST_CACHE_ALIAS", "default")
+    if _process_local(alias):
+        return [Warning(
+            f"Le cache des listes '{alias}' est propre à chaque processus : avec plusieurs workers, "
+            "une écriture peut rester invisible jusqu'à LIST_CACHE_TIMEOUT sur les autres workers.",
+            hint="Configurer ce cache sur un backend partagé (FileBasedCache, DatabaseCache, Redis).",
+            id="gestion.W001",
+        )]
+    return []
@@ -0,0 +1,103 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .caching import LIST_CACHE_TIMEOUT, list_cache, list_cache_key, user_scope
+
+
+# --------- REQUÊTES CONDITIONNELLES (ETag / Last-Modified) SUR L'API ---------
+# Les applications mobiles rechargent les mêmes clients et contrats à chaque rafraîchissement.
+# Chaque réponse GET porte un ETag fort (et un Last-Modified pour le détail) ; si le client
+# renvoie If-None-Match / If-Modified-Since et que rien n'a changé, on répond 304
+# sans charger ni sérialiser les objets :
+# - détail : la validation lit seulement (pk, updated_at) de l'objet ;
+# - liste : elle lit MAX(updated_at) et COUNT(*) de la liste filtrée (le COUNT détecte
+#   les suppressions). Pas de Last-Modified sur les listes : une suppression ne change pas
+#   MAX(updated_at), seul l'ETag permet de la voir.
+#   Ce résumé est calculé à chaque requête, avant la lecture du cache des listes : il est
+#   donc lui-même mis en cache, sous la version de la liste (caching.py), et recalculé
+#   seulement après une écriture. Le recalcul passe par les index (branche, updated_at)
+#   de Client et Assurance : MAX lu en bout d'index, COUNT sans lire la table.
+# Les écritures qui ne passent pas par save() (QuerySet.update) ne changent pas updated_at.
+
+
+def make_etag(*parts):
+    """ETag fort (entre guillemets) construit à partir des valeurs données."""
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return quote_etag(digest)
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value is not None else None
+
+
+class ConditionalViewSetMixin:
+    """
+    Mixin pour les ModelViewSet : ETag / Last-Modified et réponses 304
+    sur `list` et `retrieve`. À placer avant CachedListViewSetMixin :
+    la validation a lieu avant la lecture du cache.
+    """
+
+    updated_field = "updated_at"
+
+    def _representation(self, request):
+        # Même objet, autre représentation (format, paramètres) : autre ETag
+        return request.accepted_renderer.format, request.get_full_path()
+
+    def _conditional(self, request, etag, last_modified, respond):
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=_timestamp(last_modified)
+        )
+        response = not_modified if not_modified is not None else respond()
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(_timestamp(last_modified))
+        return response
+
+    def _list_summary(self, request):
+        """
+        MAX(updated_at) et COUNT(*) de la liste filtrée. Avec CachedListViewSetMixin,
+        gardés dans le cache des listes : une lecture de cache par requête au lieu d'un agrégat.
+        """
+        if not hasattr(self, "get_cache_resource"):
+            queryset = self.filter_queryset(self.get_queryset())
+            return queryset.order_by().aggregate(last=Max(self.updated_field), count=Count("pk"))
+        cache = list_cache()
+        # Même version que la page : une écriture change la clé du résumé et celle de la page
+        key = f"{list_cache_key(self.get_cache_resource(), request)}:resume"
+        summary = cache.get(key)
+        if summary is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            summary = queryset.order_by().aggregate(last=Max(self.updated_field), count=Count("pk"))
+            cache.set(key, summary, LIST_CACHE_TIMEOUT)
+        return summary
+
+    def list(self, request, *args, **kwargs):
+        summary = self._list_summary(request)
+        etag = make_etag(
+            "list", user_scope(request.user), *self._representation(request),
+            summary["last"], summary["count"],
+        )
+        return self._conditional(
+            request, etag, None, lambda: super(ConditionalViewSetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = (
+            self.filter_queryset(self.get_queryset())
+            .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+            .values_list("pk", self.updated_field)
+            .first()
+        )
+        if row is None:
+            # Réponse 404 habituelle
+            return super().retrieve(request, *args, **kwargs)
+        pk, updated_at = row
+        etag = make_etag("detail", pk, *self._representation(request), updated_at)
+        return self._conditional(
+            request, etag, updated_at, lambda: super(ConditionalViewSetMixin, self).retrieve(request, *args, **kwargs)
+        )
@@ -0,0 +1,332 @@
+import datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Branche, Client, Assurance, StatistiqueBranche
+
+
+# --------- AGRÉGATS DU TABLEAU DE BORD ---------
+# La page d'accueil affiche, par branche : les contrats actifs, leur montant total,
+# les nouveaux clients du mois et les contrats qui expirent dans les 30 jours.
+# La liste des échéances (contrats à renouveler) lit aussi les compteurs à 7 / 30 / 90 jours.
+# Au lieu de recalculer ces GROUP BY à chaque affichage, on les garde dans
+# StatistiqueBranche (une ligne par branche et par mois) :
+# - chaque save / delete d'un Client ou d'une Assurance applique un delta (signals.py) ;
+# - les écritures en masse (import, API bulk), qui n'envoient pas ces signaux,
+#   marquent les branches concernées "à recalculer" (calcule_le = NULL) ;
+# - "actif" et "expire sous 30 jours" dépendent de la date du jour : une ligne calculée
+#   un autre jour est recalculée à la première lecture, une fois par branche et par jour
+#   (ou chaque matin par `manage.py rebuild_dashboard`, avant l'affluence).
+
+# Horizons (en jours) de la liste des échéances ; celui de la page d'accueil
+EXPIRING_HORIZONS = (7, 30, 90)
+EXPIRATION_HORIZON_DAYS = 30
+
+
+def expiring_field(horizon):
+    """Nom du compteur StatistiqueBranche des contrats expirant sous `horizon` jours."""
+    return f"contrats_expirant_{horizon}j"
+
+
+FIGURES = (
+    "contrats_actifs", "montant_actif", "nouveaux_clients",
+    *(expiring_field(horizon) for horizon in EXPIRING_HORIZONS),
+)
+
+
+def current_period(today):
+    """Premier jour du mois de `today` : clé de période des statistiques."""
+    return today.replace(day=1)
+
+
+def _as_date(value):
+    # Les objets créés avec des chaînes (ex. Assurance.objects.create(date_fin="2025-12-31"))
+    # gardent la chaîne en attribut après le save
+    if isinstance(value, str):
+        return parse_date(value)
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def _as_decimal(value):
+    return Decimal(str(value)) if value is not None else Decimal(0)
+
+
+# --- Instantanés et deltas (mise à jour incrémentale) ---
+
+def contract_snapshot(instance):
+    """
+    Valeurs d'une Assurance utiles au tableau de bord, ou None si un champ
+    n'est pas chargé (queryset avec only() / defer()).
+    """
+    values = instance.__dict__
+    if not all(name in values for name in ("branche_id", "date_debut", "date_fin", "montant")):
+        return None
+    return (
+        values["branche_id"],
+        _as_date(values["date_debut"]),
+        _as_date(values["date_fin"]),
+        _as_decimal(values["montant"]),
+    )
+
+
+def client_snapshot(instance):
+    """Valeurs d'un Client utiles au tableau de bord (voir contract_snapshot)."""
+    values = instance.__dict__
+    if not all(name in values for name in ("branche_id", "date_inscription")):
+        return None
+    return values["branche_id"], _as_date(values["date_inscription"])
+
+
+def contract_figures(snapshot, today):
+    """
+    Contribution d'un contrat aux chiffres de sa branche : (branche_id, {chiffre: valeur}).
+    """
+    branche_id, date_debut, date_fin, montant = snapshot
+    if branche_id is None or not date_debut or not date_fin or not (date_debut <= today <= date_fin):
+        return branche_id, {}
+    values = {"contrats_actifs": 1, "montant_actif": montant}
+    for horizon in EXPIRING_HORIZONS:
+        values[expiring_field(horizon)] = 1 if date_fin <= today + datetime.timedelta(days=horizon) else 0
+    return branche_id, values
+
+
+def client_figures(snapshot, today):
+    branche_id, date_inscription = snapshot
+    if branche_id is None or not date_inscription or current_period(date_inscription) != current_period(today):
+        return branche_id, {}
+    return branche_id, {"nouveaux_clients": 1}
+
+
+def apply_change(figures, old, new, today=None):
+    """
+    Applique à StatistiqueBranche la différence entre l'ancien et le nouvel état
+    d'un objet (`old` / `new` : instantanés, None pour une création / suppression).
+    `figures` est contract_figures ou client_figures.
+    Seules les lignes déjà calculées aujourd'hui sont modifiées (UPDATE ... SET x = x + delta) :
+    les autres seront recalculées à la lecture.
+    """
+    apply_changes(figures, [(old, new)], today)
+
+
+def apply_changes(figures, changes, today=None):
+    """
+    Comme apply_change pour une liste de couples (old, new) : les deltas sont
+    additionnés par branche, soit un UPDATE par branche quel que soit le nombre d'objets.
+    """
+    today = today or timezone.localdate()
+    deltas = {}
+    for old, new in changes:
+        for snapshot, sign in ((old, -1), (new, 1)):
+            if snapshot is None:
+                continue
+            branche_id, values = figures(snapshot, today)
+            branche_deltas = deltas.setdefault(branche_id, {})
+            for name, value in values.items():
+                branche_deltas[name] = branche_deltas.get(name, 0) + sign * value
+
+    for branche_id, values in deltas.items():
+        values = {name: value for name, value in values.items() if value}
+        if branche_id is None or not values:
+            continue
+        StatistiqueBranche.objects.filter(
+            branche_id=branche_id, periode=current_period(today), calcule_le=today
+        ).update(**{name: F(name) + value for name, value in values.items()})
+
+
+def mark_stale(branche_ids=None):
+    """
+    Marque les statistiques des branches données (toutes si None) comme à recalculer.
+    Utilisé après les écritures en masse, qui n'envoient pas les signaux post_save.
+    """
+    queryset = StatistiqueBranche.objects.exclude(calcule_le=None)
+    if branche_ids is not None:
+        branche_ids = {pk for pk in branche_ids if pk is not None}
+        if not branche_ids:
+            return
+        queryset = queryset.filter(branche_id__in=branche_ids)
+    queryset.update(calcule_le=None)
+
+
+# --- Recalcul complet ---
+
+def compute(branche_ids, today=None):
+    """
+    Recalcule et enregistre les statistiques du mois pour les branches données.
+    Deux requêtes GROUP BY (contrats, clients) quel que soit le nombre de branches,
+    plus un INSERT ... ON CONFLICT DO UPDATE. Renvoie {branche_id: StatistiqueBranche}.
+    Lectures sur "default", jamais sur la réplique : des chiffres en retard seraient
+    enregistrés comme calculés aujourd'hui, et servis jusqu'au lendemain.
+    """
+    today = today or timezone.localdate()
+    periode = current_period(today)
+    branche_ids = list(branche_ids)
+    if not branche_ids:
+        return {}
+
+    contracts = (
+        Assurance.objects.using(DEFAULT_DB_ALIAS)
+        .filter(branche_id__in=branche_ids, date_debut__lte=today, date_fin__gte=today)
+        .values("branche_id")
+        .annotate(
+            contrats_actifs=Count("pk"),
+            montant_actif=Sum("montant"),
+            **{
+                expiring_field(horizon): Count(
+                    "pk", filter=Q(date_fin__lte=today + datetime.timedelta(days=horizon))
+                )
+                for horizon in EXPIRING_HORIZONS
+            },
+        )
+        .order_by()
+    )
+    month_end = (periode + datetime.timedelta(days=32)).replace(day=1)
+    new_clients = (
+        Client.objects.using(DEFAULT_DB_ALIAS)
+        .filter(branche_id__in=branche_ids, date_inscription__gte=periode, date_inscription__lt=month_end)
+        .values("branche_id")
+        .annotate(nouveaux_clients=Count("pk"))
+        .order_by()
+    )
+
+    stats = {
+        pk: StatistiqueBranche(branche_id=pk, periode=periode, calcule_le=today)
+        for pk in branche_ids
+    }
+    for row in contracts:
+        stat = stats[row.pop("branche_id")]
+        # SUM() de SQLite perd l'échelle : même valeur qu'une ligne relue (2 décimales)
+        row["montant_actif"] = _as_decimal(row["montant_actif"]).quantize(Decimal("0.01"))
+        for name, value in row.items():
+            setattr(stat, name, value)
+    for row in new_clients:
+        stats[row["branche_id"]].nouveaux_clients = row["nouveaux_clients"]
+
+    StatistiqueBranche.objects.bulk_create(
+        stats.values(),
+        update_conflicts=True,
+        unique_fields=["branche", "periode"],
+        update_fields=[*FIGURES, "calcule_le"],
+    )
+    return stats
+
+
+def rebuild(today=None):
+    """Recalcule les statistiques de toutes les branches (commande rebuild_dashboard)."""
+    return compute(Branche.objects.values_list("pk", flat=True), today)
+
+
+def branch_statistics(user, today=None):
+    """
+    Statistiques du mois pour les branches visibles par `user`, triées par nom :
+    liste de tuples (branche, StatistiqueBranche). Lit une ligne par branche ;
+    seules les branches sans ligne à jour sont recalculées.
+    """
+    today = today or timezone.localdate()
+    branches = list(Branche.objects.for_user(user).only("nom", "ville").order_by("nom", "pk"))
+    stats = {
+        stat.branche_id: stat
+        for stat in StatistiqueBranche.objects.filter(
+            branche__in=[branche.pk for branche in branches],
+            periode=current_period(today),
+            calcule_le=today,
+        )
+    }
+    stale = [branche.pk for branche in branches if branche.pk not in stats]
+    if stale:
+        stats.update(compute(stale, today))
+    return [(branche, stats[branche.pk]) for branche in branches]
+
+
+async def abranch_statistics(user, today=None):
+    """
+    Version asynchrone de branch_statistics() : lectures avec l'ORM asynchrone ;
+    le recalcul éventuel (écritures groupées) passe par sync_to_async.
+    """
+    today = today or timezone.localdate()
+    branches = [
+        branche async for branche in Branche.objects.for_user(user).only("nom", "ville").order_by("nom", "pk")
+    ]
+    stats = {
+        stat.branche_id: stat
+        async for stat in StatistiqueBranche.objects.filter(
+            branche__in=[branche.pk for branche in branches],
+            periode=current_period(today),
+            calcule_le=today,
+        )
+    }
+    stale = [branche.pk for branche in branches if branche.pk not in stats]
+    if stale:
+        stats.update(await sync_to_async(compute)(stale, today))
+    return [(branche, stats[branche.pk]) for branche in branches]
+
+
+def statistics_json(statistiques):
+    """
+    Statistiques (résultat de branch_statistics) au format JSON de l'API :
+    {"branches": [{"branche": id, "nom": ..., <chiffres de FIGURES>}, ...]}.
+    """
+    return {
+        "branches": [
+            {
+                "branche": branche.pk,
+                "nom": branche.nom,
+                **{name: getattr(stat, name) for name in FIGURES},
+            }
+            for branche, stat in statistiques
+        ],
+    }
+
+
+# --------- ÉCHÉANCES (contrats à renouveler) ---------
+
+def parse_expiring_params(params):
+    """
+    Lit les filtres de la liste des échéances : ?horizon=7|30|90 (défaut 30) et ?branche=<id>.
+    Renvoie (horizon, branche_id ou None). Lève ValueError si un paramètre est invalide.
+    """
+    raw = params.get("horizon") or str(EXPIRATION_HORIZON_DAYS)
+    if not raw.isdigit() or int(raw) not in EXPIRING_HORIZONS:
+        choices = ", ".join(str(horizon) for horizon in EXPIRING_HORIZONS)
+        raise ValueError(f"Le paramètre 'horizon' doit valoir {choices}.")
+    branche = params.get("branche")
+    if branche and not branche.isdigit():
+        raise ValueError("Le paramètre 'branche' doit être un identifiant numérique.")
+    return int(raw), int(branche) if branche else None
+
+
+def expiring_contracts(queryset, horizon, branche_id=None, today=None):
+    """
+    Contrats actifs de `queryset` dont la date de fin tombe dans les `horizon` prochains jours.
+    Avec une branche (filtre ou périmètre de l'agent), SQLite lit un intervalle de l'index
+    (branche, date_fin) ; sans branche, celui de l'index sur date_fin.
+    """
+    today = today or timezone.localdate()
+    if branche_id is not None:
+        queryset = queryset.filter(branche_id=branche_id)
+    return queryset.filter(
+        date_fin__gte=today,
+        date_fin__lte=today + datetime.timedelta(days=horizon),
+        date_debut__lte=today,
+    )
+
+
+def expiring_counts(statistics, branche_id=None):
+    """
+    Nombre de contrats expirant sous chaque horizon, lu dans les statistiques précalculées
+    (résultat de branch_statistics) : {7: n, 30: n, 90: n}.
+    """
+    return {
+        horizon: sum(
+            getattr(stat, expiring_field(horizon))
+            for branche, stat in statistics
+            if branche_id is None or branche.pk == branche_id
+        )
+        for horizon in EXPIRING_HORIZONS
+    }
@@ -0,0 +1,79 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError
+
+
+# --------- SQLITE EN PRODUCTION : REPRISE DES ÉCRITURES BLOQUÉES ---------
+# Le profil de settings.DATABASES (WAL, busy_timeout, transactions IMMEDIATE...) supprime
+# l'essentiel des erreurs "database is locked" : les lecteurs ne bloquent plus les écrivains
+# et une écriture attend le verrou jusqu'à busy_timeout. Au-delà (rafale d'écritures,
+# import en cours), l'instruction est relancée après une attente croissante (backoff
+# exponentiel avec une part aléatoire, pour que les écrivains ne se réveillent pas ensemble).
+# On ne relance une instruction que si c'est sans risque :
+# - hors transaction (autocommit) : l'instruction est sa propre transaction ;
+# - le BEGIN d'une transaction : en mode IMMEDIATE, c'est lui qui prend le verrou d'écriture,
+#   rien n'a encore été exécuté. Une fois la transaction ouverte, elle détient le verrou.
+# Une erreur au milieu d'une transaction remonte telle quelle : c'est toute la transaction
+# qu'il faudrait rejouer.
+
+LOCK_RETRY_ATTEMPTS = getattr(settings, "DB_LOCK_RETRY_ATTEMPTS", 5)
+LOCK_RETRY_BASE_DELAY = getattr(settings, "DB_LOCK_RETRY_BASE_DELAY", 0.05)
+LOCK_RETRY_MAX_DELAY = getattr(settings, "DB_LOCK_RETRY_MAX_DELAY", 2.0)
+
+_stats = {"retries": 0, "failures": 0}
+_stats_lock = threading.Lock()
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return "database is locked" in message or "database table is locked" in message
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def lock_retry_stats():
+    """Nombre d'instructions relancées et d'abandons (depuis le démarrage du processus)."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def backoff_delay(attempt):
+    """Attente avant la tentative `attempt` (1, 2, ...) : exponentielle, plafonnée, avec jitter."""
+    delay = min(LOCK_RETRY_BASE_DELAY * 2 ** (attempt - 1), LOCK_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def retry_on_lock(execute, sql, params, many, context):
+    """
+    Execute wrapper (voir connection.execute_wrapper) : relance l'instruction
+    sur "database is locked" quand c'est sans risque (voir plus haut).
+    """
+    connection = context["connection"]
+    retriable = sql.lstrip().upper().startswith("BEGIN") or (
+        not connection.in_atomic_block and connection.get_autocommit()
+    )
+    attempt = 0
+    while True:
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as exc:
+            attempt += 1
+            if not retriable or not is_lock_error(exc):
+                raise
+            if attempt > LOCK_RETRY_ATTEMPTS:
+                _count("failures")
+                raise
+            _count("retries")
+            time.sleep(backoff_delay(attempt))
+
+
+def install_lock_retry(sender, connection, **kwargs):
+    """Receiver de connection_created : ajoute retry_on_lock aux connexions SQLite."""
+    if connection.vendor == "sqlite" and retry_on_lock not in connection.execute_wrappers:
+        connection.execute_wrappers.append(retry_on_lock)
@@ -0,0 +1,133 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+
+
+# --------- EXPORTS EN STREAMING (CSV / NDJSON) ---------
+# Les exports lisent la table par blocs (iterator(chunk_size=...)) et envoient
+# la réponse au fur et à mesure (StreamingHttpResponse) : la mémoire utilisée
+# reste constante, quelle que soit la taille du portefeuille.
+
+# Nombre de lignes lues en base à chaque aller-retour
+EXPORT_CHUNK_SIZE = 2000
+
+# Nombre de lignes regroupées dans un même morceau de réponse HTTP
+EXPORT_LINES_PER_WRITE = 500
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Colonnes exportées : (nom de la colonne, chemin ORM)
+# Les noms du client et de la branche viennent d'une jointure, pas d'une requête par ligne.
+ASSURANCE_COLUMNS = [
+    ("id", "id"),
+    ("type_assurance", "type_assurance"),
+    ("date_debut", "date_debut"),
+    ("date_fin", "date_fin"),
+    ("montant", "montant"),
+    ("client_id", "client_id"),
+    ("client_nom", "client__nom"),
+    ("client_prenom", "client__prenom"),
+    ("branche_id", "branche_id"),
+    ("branche_nom", "branche__nom"),
+]
+
+CLIENT_COLUMNS = [
+    ("id", "id"),
+    ("nom", "nom"),
+    ("prenom", "prenom"),
+    ("adresse", "adresse"),
+    ("email", "email"),
+    ("telephone", "telephone"),
+    ("date_inscription", "date_inscription"),
+    ("branche_id", "branche_id"),
+    ("branche_nom", "branche__nom"),
+]
+
+
+class _Echo:
+    """
+    Pseudo-fichier pour csv.writer : write() renvoie la ligne au lieu de la stocker.
+    (Technique recommandée par la documentation Django pour le CSV en streaming.)
+    """
+
+    def write(self, value):
+        return value
+
+
+def filter_export(queryset, params, date_field):
+    """
+    Applique les filtres communs aux exports :
+    - ?branche=<id>
+    - ?date_min=AAAA-MM-JJ et ?date_max=AAAA-MM-JJ sur `date_field` (bornes incluses)
+    Lève ValueError si un paramètre est invalide.
+    """
+    branche = params.get("branche")
+    if branche:
+        if not branche.isdigit():
+            raise ValueError("Le paramètre 'branche' doit être un identifiant numérique.")
+        queryset = queryset.filter(branche_id=int(branche))
+
+    for param, lookup in (("date_min", "gte"), ("date_max", "lte")):
+        value = params.get(param)
+        if value:
+            try:
+                date = parse_date(value)
+            except ValueError:
+                date = None
+            if date is None:
+                raise ValueError(f"Le paramètre '{param}' doit être une date AAAA-MM-JJ.")
+            queryset = queryset.filter(**{f"{date_field}__{lookup}": date})
+    return queryset
+
+
+def iter_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Renvoie un itérateur de tuples, lu par blocs de `chunk_size` lignes.
+    values_list() évite d'instancier un objet modèle par ligne.
+    """
+    lookups = [lookup for _, lookup in columns]
+    return queryset.order_by("pk").values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def iter_csv(rows, headers):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_ndjson(rows, headers):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def _batched(lines, size=EXPORT_LINES_PER_WRITE):
+    """
+    Regroupe les lignes par paquets pour limiter le nombre d'écritures réseau.
+    """
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def streaming_export(queryset, columns, fmt, filename):
+    """
+    Construit la StreamingHttpResponse d'un export au format `fmt` ('csv' ou 'ndjson').
+    """
+    headers = [name for name, _ in columns]
+    rows = iter_rows(queryset, columns)
+    lines = iter_csv(rows, headers) if fmt == "csv" else iter_ndjson(rows, headers)
+    response = StreamingHttpResponse(_batched(lines), content_type=EXPORT_FORMATS[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    return response
@@ -0,0 +1,110 @@
+from functools import cached_property
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ParseError
+
+
+# --------- CHAMPS À LA DEMANDE SUR L'API (?fields= / ?omit=) ---------
+# Un écran qui n'affiche que le nom des clients n'a pas besoin de l'adresse ni des
+# autres colonnes :
+#   GET /api/clients/?fields=id,nom,prenom
+#   GET /api/assurances/?omit=montant,date_debut
+# Le JSON ne contient que ces champs, et la requête SQL ne lit que leurs colonnes
+# (QuerySet.only(), qui revient à un defer() des autres colonnes). S'y ajoutent toujours
+# la clé primaire et les champs de tri de la pagination par curseur (lus sur le
+# dernier objet de la page pour construire le lien "next").
+# Clés étrangères : le champ "branche" (ou "client") est servi par la colonne branche_id
+# de la ligne, sans jointure ni requête supplémentaire.
+# Seules les lectures (GET, HEAD) sont concernées : les écritures renvoient l'objet complet.
+# Un champ inconnu donne une réponse 400.
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def _split(values):
+    names = []
+    for value in values:
+        names += [name.strip() for name in value.split(",") if name.strip()]
+    return names
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Mixin pour les ModelSerializer : arguments `fields` (champs gardés)
+    et `omit` (champs retirés). Sans ces arguments, tous les champs sont servis.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        self.sparse_fields = fields
+        self.sparse_omit = omit or ()
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.sparse_fields is not None:
+            fields = {name: field for name, field in fields.items() if name in self.sparse_fields}
+        for name in self.sparse_omit:
+            fields.pop(name, None)
+        return fields
+
+
+class SparseFieldsetViewSetMixin:
+    """
+    Mixin pour les ModelViewSet (serializer avec SparseFieldsetSerializerMixin) :
+    lit ?fields= et ?omit=, les passe au serializer et restreint les colonnes lues.
+    """
+
+    @cached_property
+    def sparse_fieldset(self):
+        """(champs demandés ou None, champs omis), validés, ou None sans paramètre."""
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None
+        params = self.request.query_params
+        requested = _split(params.getlist("fields"))
+        omitted = _split(params.getlist("omit"))
+        if not requested and not omitted:
+            return None
+        available = self.get_serializer_class()().fields
+        unknown = sorted(set(requested + omitted) - set(available))
+        if unknown:
+            raise ParseError(
+                f"Champs inconnus : {', '.join(unknown)}. Champs disponibles : {', '.join(available)}."
+            )
+        return (requested or None), omitted
+
+    def get_serializer(self, *args, **kwargs):
+        if self.sparse_fieldset is not None:
+            kwargs["fields"], kwargs["omit"] = self.sparse_fieldset
+        return super().get_serializer(*args, **kwargs)
+
+    def sparse_columns(self):
+        """
+        Champs du modèle à charger avec only(), ou None s'il faut tout charger
+        (pas de paramètre, ou champ calculé qui peut lire n'importe quelle colonne).
+        """
+        if self.sparse_fieldset is None:
+            return None
+        requested, omitted = self.sparse_fieldset
+        serializer = self.get_serializer_class()(fields=requested, omit=omitted)
+        model = serializer.Meta.model
+        columns = {model._meta.pk.name}
+        for field in serializer.fields.values():
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete or model_field.many_to_many:
+                return None
+            # Clé étrangère : only("branche") charge la seule colonne branche_id
+            columns.add(model_field.name)
+
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        for name in (ordering,) if isinstance(ordering, str) else ordering:
+            if isinstance(name, str):
+                columns.add(name.lstrip("-"))
+        return sorted(columns)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        columns = self.sparse_columns()
+        return queryset.only(*columns) if columns else queryset
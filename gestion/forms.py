@@ -2,20 +2,46 @@ from django import forms
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 # On importe get_user_model() pour obtenir notre modèle Utilisateur personnalisé
 from django.contrib.auth import get_user_model
+from django.urls import reverse_lazy
 from .models import Client, Assurance, Branche, Utilisateur
+from .widgets import AutocompleteSelect
 
 # On récupère le modèle utilisateur actif (notre Utilisateur personnalisé)
 Utilisateur = get_user_model()
 
-class ClientForm(forms.ModelForm):
+class BrancheScopedFormMixin:
+    """
+    Restreint les choix des clés étrangères (branche, client) à la branche
+    de l'utilisateur passé en argument `user` (voir BrancheScopedQuerySet.for_user).
+    """
+
+    scoped_fields = ('branche', 'branch', 'client')
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user is None:
+            return
+        for name in self.scoped_fields:
+            field = self.fields.get(name)
+            if field is not None and hasattr(field.queryset, 'for_user'):
+                field.queryset = field.queryset.for_user(user)
+
+
+class ClientForm(BrancheScopedFormMixin, forms.ModelForm):
     class Meta:
         model = Client
         fields = '__all__'
 
-class AssuranceForm(forms.ModelForm):
+class AssuranceForm(BrancheScopedFormMixin, forms.ModelForm):
     class Meta:
         model = Assurance
         fields = '__all__'
+        # Champs de recherche au lieu de <select> contenant toute la table.
+        # La validation ne lit que l'id envoyé (ModelChoiceField fait un get(pk=...)).
+        widgets = {
+            'client': AutocompleteSelect(url=reverse_lazy('autocomplete_clients')),
+            'branche': AutocompleteSelect(url=reverse_lazy('autocomplete_branches')),
+        }
 
 class BrancheForm(forms.ModelForm):
     class Meta:
@@ -23,6 +49,20 @@ class BrancheForm(forms.ModelForm):
         fields = '__all__'
 
 
+# --------- FORMULAIRES D'IMPORT EN MASSE ---------
+# Mêmes règles de validation que ClientForm / AssuranceForm, mais sans les clés
+# étrangères : l'import les résout lui-même avec des dictionnaires en mémoire,
+# au lieu d'une requête ModelChoiceField par ligne.
+
+class ClientImportForm(ClientForm):
+    class Meta(ClientForm.Meta):
+        fields = ('nom', 'prenom', 'adresse', 'email', 'telephone', 'date_inscription')
+
+class AssuranceImportForm(AssuranceForm):
+    class Meta(AssuranceForm.Meta):
+        fields = ('type_assurance', 'date_debut', 'date_fin', 'montant')
+
+
 # --------- FORMULAIRES D'AUTHENTIFICATION ---------
 
 class LoginForm(AuthenticationForm):
@@ -47,7 +87,7 @@ class LoginForm(AuthenticationForm):
     )
 
 
-class AddEmployeeForm(UserCreationForm):
+class AddEmployeeForm(BrancheScopedFormMixin, UserCreationForm):
     """
     Formulaire pour ajouter un nouvel employé (réservé aux administrateurs).
     Hérite de UserCreationForm qui gère déjà username, password1, password2.
@@ -0,0 +1,322 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+
+from .forms import ClientImportForm, AssuranceImportForm
+from .models import Branche, Client, Assurance
+from .signals import bulk_saved
+
+
+# --------- IMPORT EN MASSE (CSV / NDJSON) ---------
+# Utilisé par la commande `manage.py import_portfolio` et par l'endpoint
+# POST /api/<clients|assurances>/import/.
+# Le fichier est lu ligne par ligne, validé par lots avec les règles des formulaires,
+# puis écrit avec bulk_create dans une transaction par lot.
+# Une ligne invalide est signalée mais n'interrompt pas l'import.
+# Un fichier dans un autre encodage que celui annoncé (CSV enregistré par Excel en cp1252
+# et lu en UTF-8) arrête l'import à la première ligne illisible : les lots précédents
+# restent écrits, et le rapport indique la ligne.
+
+# Nombre de lignes validées et écrites ensemble
+IMPORT_BATCH_SIZE = 1000
+
+# Nombre maximal d'erreurs conservées dans le rapport (les autres sont seulement comptées)
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# utf-8-sig : ignore le BOM ajouté par Excel en tête des fichiers CSV
+IMPORT_ENCODING = "utf-8-sig"
+
+
+class ImportEncodingError(ValueError):
+    """
+    Ligne impossible à décoder avec l'encodage annoncé. `result` : rapport des lignes
+    importées avant l'erreur (renseigné par BaseImporter.run).
+    """
+
+    def __init__(self, line, encoding):
+        self.line = line
+        self.encoding = encoding
+        self.result = None
+        super().__init__(
+            f"Ligne {line} : caractères illisibles en {encoding}. Préciser l'encodage du fichier "
+            f"(par exemple cp1252 pour un CSV enregistré par Excel)."
+        )
+
+
+def check_encoding(encoding):
+    """Vrai si `encoding` est un encodage connu de Python."""
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        return False
+    return True
+
+
+def decode_lines(stream, encoding=IMPORT_ENCODING):
+    """
+    Décode ligne par ligne un flux binaire (fichier, fichier envoyé), sans le charger
+    en mémoire. Une ligne illisible lève ImportEncodingError avec son numéro.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    number = 0
+    for number, raw in enumerate(stream, start=1):
+        try:
+            yield decoder.decode(raw)
+        except UnicodeDecodeError:
+            raise ImportEncodingError(number, encoding) from None
+    try:
+        tail = decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise ImportEncodingError(number, encoding) from None
+    if tail:
+        yield tail
+
+
+def guess_format(filename, default="csv"):
+    """
+    Devine le format d'entrée à partir de l'extension du fichier.
+    """
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+def read_records(stream, fmt):
+    """
+    Lit un flux texte et renvoie des tuples (numéro de ligne, dictionnaire).
+    Une ligne NDJSON illisible donne un dictionnaire None (signalé comme erreur).
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield number, record if isinstance(record, dict) else None
+
+
+class ImportResult:
+    """
+    Rapport d'import : nombre de lignes créées, en erreur, et détail des erreurs.
+    """
+
+    def __init__(self, max_errors=MAX_REPORTED_ERRORS):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "errors": errors})
+
+    def as_dict(self):
+        return {"created": self.created, "failed": self.failed, "errors": self.errors}
+
+
+def _value(record, key):
+    value = record.get(key)
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+class BaseImporter:
+    """
+    Logique commune aux imports.
+    Les sous-classes définissent `model`, `form_class` et resolve_foreign_keys().
+    """
+
+    model = None
+    form_class = None
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, max_errors=MAX_REPORTED_ERRORS, user=None):
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        # `user` (import via l'API) : seules ses branches et ses clients sont acceptés
+        self.user = user
+        # Les branches sont peu nombreuses : on les charge une seule fois (id et nom)
+        self.branches_by_id = {}
+        self.branches_by_name = {}
+        for pk, nom in self.scoped(Branche).values_list("pk", "nom"):
+            self.branches_by_id[pk] = pk
+            self.branches_by_name.setdefault(nom.casefold(), pk)
+
+    def scoped(self, model):
+        if self.user is None:
+            return model.objects.all()
+        return model.objects.for_user(self.user)
+
+    def resolve_branche(self, record, errors, required=True):
+        """
+        Résout la branche à partir de la colonne 'branche' (id) ou 'branche_nom'.
+        """
+        raw_id = _value(record, "branche")
+        raw_name = _value(record, "branche_nom")
+        if raw_id:
+            if raw_id.isdigit() and int(raw_id) in self.branches_by_id:
+                return int(raw_id)
+            errors["branche"] = [f"Branche inconnue : {raw_id}."]
+        elif raw_name:
+            pk = self.branches_by_name.get(raw_name.casefold())
+            if pk is not None:
+                return pk
+            errors["branche"] = [f"Branche inconnue : {raw_name}."]
+        elif required:
+            errors["branche"] = ["Colonne 'branche' ou 'branche_nom' obligatoire."]
+        return None
+
+    def build_lookups(self, batch):
+        """
+        Prépare les dictionnaires de correspondance nécessaires à un lot.
+        """
+        return {}
+
+    def resolve_foreign_keys(self, record, lookups, errors):
+        raise NotImplementedError
+
+    def run(self, records):
+        """
+        Importe tous les enregistrements (itérable de tuples (ligne, dict)).
+        """
+        result = ImportResult(self.max_errors)
+        records = iter(records)
+        try:
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch, result)
+        except ImportEncodingError as exc:
+            exc.result = result
+            raise
+        return result
+
+    def import_batch(self, batch, result):
+        lookups = self.build_lookups(batch)
+        instances = []
+        for line, record in batch:
+            if record is None:
+                result.add_error(line, {"__all__": ["Ligne illisible."]})
+                continue
+
+            errors = {}
+            foreign_keys = self.resolve_foreign_keys(record, lookups, errors)
+            form = self.form_class(data=record)
+            if not form.is_valid():
+                errors.update({field: list(messages) for field, messages in form.errors.items()})
+            if errors:
+                result.add_error(line, errors)
+                continue
+
+            instance = form.save(commit=False)
+            for attname, value in foreign_keys.items():
+                setattr(instance, attname, value)
+            instances.append((line, instance))
+
+        if not instances:
+            return
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(
+                    [instance for _, instance in instances], batch_size=self.batch_size
+                )
+        except DatabaseError as exc:
+            # Le lot entier est annulé : on signale chacune de ses lignes
+            for line, _ in instances:
+                result.add_error(line, {"__all__": [f"Erreur base de données : {exc}"]})
+        else:
+            result.created += len(instances)
+            bulk_saved.send(sender=self.model, instances=[instance for _, instance in instances], created=True)
+
+
+class ClientImporter(BaseImporter):
+    """
+    Import de clients. Colonnes : nom, prenom, adresse, email, telephone,
+    date_inscription, et branche (id) ou branche_nom.
+    """
+
+    model = Client
+    form_class = ClientImportForm
+
+    def resolve_foreign_keys(self, record, lookups, errors):
+        return {"branche_id": self.resolve_branche(record, errors)}
+
+
+class AssuranceImporter(BaseImporter):
+    """
+    Import d'assurances. Colonnes : type_assurance, date_debut, date_fin, montant,
+    client (id) ou client_email, et optionnellement branche / branche_nom
+    (par défaut, la branche du client).
+    """
+
+    model = Assurance
+    form_class = AssuranceImportForm
+
+    def build_lookups(self, batch):
+        # Une seule requête par lot pour tous les clients référencés
+        ids, emails = set(), set()
+        for _, record in batch:
+            if record is None:
+                continue
+            raw_id = _value(record, "client")
+            if raw_id.isdigit():
+                ids.add(int(raw_id))
+            email = _value(record, "client_email")
+            if email:
+                emails.add(email)
+
+        by_id, by_email = {}, {}
+        if ids or emails:
+            rows = self.scoped(Client).filter(Q(pk__in=ids) | Q(email__in=emails)).values_list(
+                "pk", "email", "branche_id"
+            )
+            for pk, email, branche_id in rows:
+                by_id[pk] = (pk, branche_id)
+                by_email.setdefault(email, (pk, branche_id))
+        return {"by_id": by_id, "by_email": by_email}
+
+    def resolve_foreign_keys(self, record, lookups, errors):
+        raw_id = _value(record, "client")
+        email = _value(record, "client_email")
+        client = None
+        if raw_id:
+            client = lookups["by_id"].get(int(raw_id)) if raw_id.isdigit() else None
+            if client is None:
+                errors["client"] = [f"Client inconnu : {raw_id}."]
+        elif email:
+            client = lookups["by_email"].get(email)
+            if client is None:
+                errors["client"] = [f"Client inconnu : {email}."]
+        else:
+            errors["client"] = ["Colonne 'client' ou 'client_email' obligatoire."]
+
+        branche_id = self.resolve_branche(record, errors, required=False)
+        if client is None:
+            return {}
+        client_id, client_branche_id = client
+        return {"client_id": client_id, "branche_id": branche_id or client_branche_id}
+
+
+IMPORTERS = {
+    "clients": ClientImporter,
+    "assurances": AssuranceImporter,
+}
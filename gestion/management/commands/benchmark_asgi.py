@@ -0,0 +1,228 @@
+import asyncio
+import io
+import math
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.test.utils import override_settings
+
+from gestion.caching import LIST_CACHE_ALIAS
+from gestion.models import Client
+
+
+# Chemins comparés : (libellé, URL de la vue synchrone actuelle, URL de la vue async).
+# Les deux vues d'une ligne renvoient du JSON, avec le même sérialiseur et la même taille
+# de page (50) ; seul le tri des listes diffère (id pour l'API, nom pour les vues async)
+TARGETS = [
+    ("Liste des clients", "/api/clients/", "/async/clients/"),
+    ("Détail d'un client", "/api/clients/{client}/", "/async/clients/{client}/"),
+    ("Liste des contrats", "/api/assurances/", "/async/assurances/"),
+    ("Recherche de clients", "/api/clients/?q={q}", "/async/clients/?q={q}"),
+    ("Tableau de bord", "/stats/dashboard/", "/async/dashboard/"),
+]
+
+
+class Command(BaseCommand):
+    """
+    Compare le débit en requêtes concurrentes des chemins WSGI et ASGI.
+
+    Les applications de intia_assurance/wsgi.py et intia_assurance/asgi.py sont appelées
+    directement, dans le processus (sans serveur HTTP) :
+    - WSGI, vue synchrone : un pool de threads, comme un serveur WSGI multi-thread ;
+    - ASGI, vue synchrone : la même vue, via l'adaptateur sync_to_async de Django ;
+    - ASGI, vue async : les vues de gestion/async_views.py, en tâches asyncio concurrentes.
+
+    Les requêtes sont authentifiées par une session créée pour l'occasion (supprimée à la fin).
+    Les données lues sont celles de la base configurée. Le cache des listes (caching.py),
+    que seules les vues synchrones de l'API utilisent, est remplacé par un DummyCache
+    pendant la mesure : chaque requête lit la base, dans les trois modes.
+
+    Exemple :
+        python manage.py benchmark_asgi --requests 500 --concurrency 50 --username admin
+    """
+
+    help = "Compare le débit des vues de lecture sous WSGI (sync) et ASGI (sync et async)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requêtes par chemin et par mode (défaut : 200).")
+        parser.add_argument("--concurrency", type=int, default=20, help="Requêtes simultanées (défaut : 20).")
+        parser.add_argument("--username", help="Utilisateur dont la session est utilisée (défaut : un SuperAdmin).")
+        parser.add_argument("--host", default="localhost", help="En-tête Host envoyé (doit être dans ALLOWED_HOSTS).")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests et --concurrency doivent être supérieurs à 0.")
+        user = self.get_user(options["username"])
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        self.cookie = f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+        self.host = options["host"]
+
+        from intia_assurance.asgi import application as asgi_application
+        from intia_assurance.wsgi import application as wsgi_application
+
+        try:
+            with self.without_list_cache():
+                self.run_targets(user, wsgi_application, asgi_application, options)
+        finally:
+            session.delete()
+
+    def without_list_cache(self):
+        # Caches reconstruits à l'entrée et à la sortie (signal setting_changed) ;
+        # les autres alias (sessions, utilisateurs) restent ceux de la configuration
+        dummy = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+        return override_settings(CACHES={**settings.CACHES, LIST_CACHE_ALIAS: dummy})
+
+    def run_targets(self, user, wsgi_application, asgi_application, options):
+        values = self.path_values(user)
+        for label, sync_url, async_url in TARGETS:
+            sync_url, async_url = sync_url.format(**values), async_url.format(**values)
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            runs = (
+                ("WSGI, vue sync", sync_url, lambda url: self.run_wsgi(wsgi_application, url, options)),
+                ("ASGI, vue sync", sync_url, lambda url: self.run_asgi(asgi_application, url, options)),
+                ("ASGI, vue async", async_url, lambda url: self.run_asgi(asgi_application, url, options)),
+            )
+            for title, url, run in runs:
+                self.report(title, url, *run(url))
+
+    def get_user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"Utilisateur inconnu : {username}.")
+        user = User.objects.filter(Q(is_superuser=True) | Q(role="SuperAdmin")).order_by("pk").first()
+        if user is None:
+            raise CommandError("Aucun SuperAdmin : précisez --username.")
+        return user
+
+    def path_values(self, user):
+        client = Client.objects.for_user(user).order_by("pk").only("nom").first()
+        if client is None:
+            raise CommandError("Aucun client visible : la base est vide.")
+        return {"client": client.pk, "q": client.nom[:3]}
+
+    # --- WSGI ---
+
+    def wsgi_environ(self, url):
+        path, _, query = url.partition("?")
+        return {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SCRIPT_NAME": "",
+            "SERVER_NAME": self.host,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": self.host,
+            "HTTP_COOKIE": self.cookie,
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(b""),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+
+    def run_wsgi(self, application, url, options):
+        def request():
+            statuses = []
+            start = time.perf_counter()
+            body = application(self.wsgi_environ(url), lambda status, headers, exc_info=None: statuses.append(status))
+            try:
+                for _ in body:
+                    pass
+            finally:
+                if hasattr(body, "close"):
+                    body.close()
+            return time.perf_counter() - start, int(statuses[0].split()[0])
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = list(pool.map(lambda _: request(), range(options["requests"])))
+        return time.perf_counter() - start, results
+
+    # --- ASGI ---
+
+    def asgi_scope(self, url):
+        path, _, query = url.partition("?")
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", self.host.encode()), (b"cookie", self.cookie.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": (self.host, 80),
+        }
+
+    async def asgi_request(self, application, url):
+        done = asyncio.Event()
+        messages = iter([{"type": "http.request", "body": b"", "more_body": False}])
+        status = []
+
+        async def receive():
+            message = next(messages, None)
+            if message is not None:
+                return message
+            # Le client ne se déconnecte qu'une fois la réponse reçue
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                done.set()
+
+        start = time.perf_counter()
+        await application(self.asgi_scope(url), receive, send)
+        done.set()
+        return time.perf_counter() - start, status[0]
+
+    def run_asgi(self, application, url, options):
+        async def main():
+            semaphore = asyncio.Semaphore(options["concurrency"])
+
+            async def limited():
+                async with semaphore:
+                    return await self.asgi_request(application, url)
+
+            return await asyncio.gather(*(limited() for _ in range(options["requests"])))
+
+        start = time.perf_counter()
+        results = asyncio.run(main())
+        return time.perf_counter() - start, results
+
+    # --- Affichage ---
+
+    def report(self, title, url, elapsed, results):
+        durations = sorted(duration for duration, _ in results)
+        errors = sum(1 for _, status in results if status >= 400)
+        p95 = durations[math.ceil(len(durations) * 0.95) - 1]
+        line = (
+            f"  {title:<16} {len(results) / elapsed:8.1f} req/s"
+            f"  p50 {statistics.median(durations) * 1000:7.2f} ms  p95 {p95 * 1000:7.2f} ms  {url}"
+        )
+        if errors:
+            line += self.style.ERROR(f"  ({errors} erreurs HTTP)")
+        self.stdout.write(line)
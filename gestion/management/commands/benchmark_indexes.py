@@ -0,0 +1,155 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from gestion.models import Branche, Client, Assurance
+
+
+class _Rollback(Exception):
+    """Sert à annuler la transaction du benchmark (données et index restaurés)."""
+
+
+class Command(BaseCommand):
+    """
+    Compare le plan d'exécution et la durée des requêtes principales
+    avec et sans les index déclarés dans Meta.indexes (Client et Assurance).
+
+    Tout se passe dans une transaction annulée à la fin : les données générées
+    par --seed et la suppression temporaire des index ne sont jamais conservées.
+
+    Exemple :
+        python manage.py benchmark_indexes --seed 200000
+    """
+
+    help = "Mesure l'effet des index d'accès (plan EXPLAIN et durée) sur un jeu de données."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Nombre de contrats à générer temporairement avant la mesure (défaut : 0).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Nombre d'exécutions de chaque requête (la médiane est affichée).",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Ce benchmark utilise EXPLAIN QUERY PLAN et DROP INDEX de SQLite.")
+
+        try:
+            with transaction.atomic():
+                if options["seed"]:
+                    self.seed(options["seed"])
+                paths = self.access_paths()
+                after = self.measure(paths, options["repeat"], "avec index")
+                self.drop_indexes()
+                before = self.measure(paths, options["repeat"], "sans index")
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        for label, _ in paths:
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            for title, (plan, duration) in (("sans index", before[label]), ("avec index", after[label])):
+                self.stdout.write(f"  {title:<11} {duration * 1000:8.3f} ms  {plan}")
+
+    def seed(self, count):
+        """
+        Génère `count` contrats (et count / 2 clients) répartis sur 20 branches.
+        Graine fixe : les mesures sont reproductibles.
+        """
+        rng = random.Random(42)
+        branches = Branche.objects.bulk_create(
+            [Branche(nom=f"Branche {i}", ville=f"Ville {i}") for i in range(20)]
+        )
+        start = datetime.date(2020, 1, 1)
+        clients = Client.objects.bulk_create(
+            [
+                Client(
+                    nom=f"Nom{rng.randrange(5000)}",
+                    prenom=f"Prenom{rng.randrange(500)}",
+                    adresse="Adresse",
+                    email=f"client{i}@example.com",
+                    telephone=f"6{i:08d}",
+                    branche=rng.choice(branches),
+                    date_inscription=start + datetime.timedelta(days=rng.randrange(2000)),
+                )
+                for i in range(max(count // 2, 1))
+            ],
+            batch_size=5000,
+        )
+        Assurance.objects.bulk_create(
+            [
+                Assurance(
+                    type_assurance=rng.choice(["Auto", "Habitation", "Santé", "Vie"]),
+                    date_debut=start,
+                    date_fin=start + datetime.timedelta(days=rng.randrange(3000)),
+                    montant=rng.randrange(10000, 1000000) / 100,
+                    client=client,
+                    branche_id=client.branche_id,
+                )
+                for client in (rng.choice(clients) for _ in range(count))
+            ],
+            batch_size=5000,
+        )
+
+    def access_paths(self):
+        """
+        Requêtes représentatives des écrans et de l'API (une par chemin d'accès).
+        """
+        branche = Branche.objects.order_by("pk").first()
+        client = Client.objects.order_by("pk").first()
+        branche_id = branche.pk if branche else 0
+        email = client.email if client else ""
+        telephone = client.telephone if client else ""
+        today = datetime.date.today()
+        horizon = today + datetime.timedelta(days=30)
+        return [
+            ("Contrats d'une branche expirant sous 30 jours",
+             Assurance.objects.filter(branche_id=branche_id, date_fin__range=(today, horizon))),
+            ("Client par email", Client.objects.filter(email=email)),
+            ("Client par téléphone", Client.objects.filter(telephone=telephone)),
+            ("Clients triés par nom, prénom (1re page)", Client.objects.order_by("nom", "prenom")[:10]),
+            ("Contrats triés par date de fin (1re page)", Assurance.objects.order_by("date_fin", "pk")[:10]),
+        ]
+
+    def explain(self, queryset, phase):
+        """
+        Renvoie le plan EXPLAIN QUERY PLAN sur une ligne.
+        Le commentaire rend le texte SQL unique par phase : sinon le cache de requêtes
+        préparées de sqlite3 renverrait le plan calculé avant la suppression des index.
+        """
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql} /* {phase} */", params)
+            return " | ".join(row[-1] for row in cursor.fetchall())
+
+    def measure(self, paths, repeat, phase):
+        results = {}
+        for label, queryset in paths:
+            plan = self.explain(queryset, phase)
+            durations = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                durations.append(time.perf_counter() - start)
+            results[label] = (plan, statistics.median(durations))
+        return results
+
+    def drop_indexes(self):
+        """
+        Supprime les index déclarés dans Meta.indexes (restaurés par l'annulation).
+        """
+        with connection.cursor() as cursor:
+            for model in (Client, Assurance):
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
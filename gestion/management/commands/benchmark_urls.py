@@ -0,0 +1,328 @@
+import contextlib
+import datetime
+import io
+import json
+import math
+import tempfile
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.test import Client as HttpClient
+from django.test.utils import override_settings
+from django.urls import URLResolver, reverse
+
+from gestion import urls as gestion_urls
+from gestion.profiling import QueryRecorder
+from gestion.models import Branche, Client, Assurance, Utilisateur
+
+
+# Routes non mesurées : déconnexion (un GET a un effet de bord) et suppressions,
+# appelées en POST depuis les listes (pas de page de confirmation)
+EXCLUDED = {"logout", "client_delete", "assurance_delete", "branche_delete"}
+# Paramètres de requête ajoutés à certaines routes ({q} : début du nom d'un client visible)
+QUERY_PARAMS = {
+    "autocomplete_clients": {"q": "{q}"},
+    "autocomplete_branches": {"q": "{q_branche}"},
+}
+ROLES = ("SuperAdmin", "BranchAdmin", "Agent")
+FILE_BASED_CACHE = "django.core.cache.backends.filebased.FileBasedCache"
+
+
+def percentile(sorted_values, p):
+    """Percentile par rang (valeurs triées, p entre 0 et 100)."""
+    return sorted_values[max(math.ceil(len(sorted_values) * p / 100) - 1, 0)]
+
+
+def discover_routes():
+    """
+    Routes nommées de gestion/urls.py qui répondent à GET :
+    liste de (nom, paramètres de l'URL). Les variantes à suffixe de format de l'API
+    (.json...) sont ignorées, comme les actions sans GET (import, bulk).
+    """
+    routes, seen = [], set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns)
+            elif pattern.name:
+                yield pattern
+
+    for pattern in walk(gestion_urls.urlpatterns):
+        params = set(pattern.pattern.regex.groupindex)
+        actions = getattr(pattern.callback, "actions", None)
+        view_class = getattr(pattern.callback, "view_class", None)
+        if (
+            pattern.name in seen or pattern.name in EXCLUDED or "format" in params
+            or (actions is not None and "get" not in actions)
+            or (actions is None and view_class is not None and not hasattr(view_class, "get"))
+        ):
+            continue
+        seen.add(pattern.name)
+        routes.append((pattern.name, params))
+    return routes
+
+
+class Command(BaseCommand):
+    """
+    Benchmark de latence et de requêtes SQL de toutes les routes GET de gestion/urls.py,
+    pour chaque rôle (SuperAdmin, BranchAdmin, Agent).
+
+    Pour chaque route et chaque rôle : latence p50 / p95 / p99, nombre de requêtes SQL,
+    temps SQL et taille de la réponse (médianes). Les requêtes passent par toute la pile
+    Django (middlewares, sessions, caches), dans le processus, sans serveur HTTP.
+
+    - Sans --scales : mesure la base configurée (utilisateurs existants de chaque rôle).
+    - Avec --scales 1k,100k : pour chaque échelle, crée une base SQLite temporaire,
+      la remplit avec seed_portfolio (graine fixe) et la mesure. La base configurée
+      n'est pas touchée, ni les caches configurés.
+    - --output écrit les résultats en JSON ; --compare les compare à un fichier de
+      référence et échoue (code de sortie 1) si une route régresse : p95 ou taille au-delà
+      de --threshold %, ou requêtes SQL en plus.
+
+    Exemples :
+        python manage.py benchmark_urls --scales 1k,50k --output reference.json
+        python manage.py benchmark_urls --scales 1k,50k --compare reference.json
+    """
+
+    help = "Mesure latence, requêtes SQL et taille de réponse de chaque route, par rôle."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scales", help="Échelles à générer (ex. 1k,100k) ; par défaut la base configurée.")
+        parser.add_argument("--iterations", type=int, default=20, help="Mesures par route et par rôle (défaut : 20).")
+        parser.add_argument("--warmup", type=int, default=2, help="Appels non mesurés avant (défaut : 2).")
+        parser.add_argument("--only", help="Ne mesurer que les routes dont le nom contient ce texte.")
+        parser.add_argument("--roles", default=",".join(ROLES), help="Rôles mesurés, séparés par des virgules.")
+        parser.add_argument("--host", default="localhost", help="En-tête Host envoyé (doit être dans ALLOWED_HOSTS).")
+        parser.add_argument("--output", help="Fichier JSON où écrire les résultats.")
+        parser.add_argument("--compare", help="Fichier JSON de référence à comparer aux résultats.")
+        parser.add_argument("--threshold", type=float, default=20.0, help="Régression tolérée en %% (défaut : 20).")
+        parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                            help="Écart de p95 ignoré en dessous de cette valeur, en ms (défaut : 2).")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1 or options["warmup"] < 0:
+            raise CommandError("--iterations doit être supérieur à 0 et --warmup positif.")
+        roles = [role.strip() for role in options["roles"].split(",") if role.strip()]
+        unknown = set(roles) - set(ROLES)
+        if unknown:
+            raise CommandError(f"Rôles inconnus : {', '.join(sorted(unknown))}.")
+        baseline = self.load(options["compare"]) if options["compare"] else None
+
+        results = []
+        if options["scales"]:
+            from gestion.management.commands.seed_portfolio import parse_scale
+            for label in options["scales"].split(","):
+                total = parse_scale(label)
+                with self.temporary_database():
+                    self.stdout.write(self.style.MIGRATE_HEADING(f"Échelle {label} : génération de {total} contrats..."))
+                    call_command("seed_portfolio", contracts=str(total), seed=42, stdout=io.StringIO())
+                    results += self.run_scale(label.strip(), roles, options)
+        else:
+            results += self.run_scale(f"{Assurance.objects.count()} contrats", roles, options)
+
+        report = {
+            "meta": {
+                "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                "django": django.get_version(),
+                "debug": settings.DEBUG,
+                "iterations": options["iterations"],
+            },
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                json.dump(report, stream, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Résultats écrits dans {options['output']}.")
+        if baseline is not None:
+            self.compare(baseline, results, options)
+
+    # --- Base temporaire ---
+
+    @contextlib.contextmanager
+    def temporary_database(self):
+        """
+        Pointe "default" (et la réplique en lecture seule) vers une base SQLite neuve
+        et migrée, le temps du bloc, avec des caches neufs dans le même dossier temporaire
+        (voir temporary_caches).
+        """
+        databases = connections.settings
+        replica = getattr(settings, "DATABASE_READ_REPLICA", None)
+        aliases = [DEFAULT_DB_ALIAS] + ([replica] if replica in databases else [])
+        original = {alias: databases[alias]["NAME"] for alias in aliases}
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "benchmark.sqlite3"
+            try:
+                with self.temporary_caches(Path(directory) / "cache"):
+                    self.switch(aliases, {DEFAULT_DB_ALIAS: str(path), replica: path.as_uri() + "?mode=ro"})
+                    call_command("migrate", verbosity=0, interactive=False)
+                    yield
+            finally:
+                self.switch(aliases, original)
+
+    def temporary_caches(self, directory):
+        """
+        Remplace chaque cache par un FileBasedCache dans `directory`, le temps du bloc.
+        Les caches configurés sont partagés avec les workers en service : sessions,
+        utilisateurs (auth:utilisateur:<pk>) et listes de la base générée ne doivent pas
+        y être écrits, ni les leurs être vidés.
+        """
+        temporary = {}
+        for alias, config in settings.CACHES.items():
+            if config["BACKEND"] == FILE_BASED_CACHE:
+                temporary[alias] = {**config, "LOCATION": str(directory / alias)}
+            else:
+                temporary[alias] = {"BACKEND": FILE_BASED_CACHE, "LOCATION": str(directory / alias)}
+        # override_settings reconstruit les caches à l'entrée et à la sortie
+        # (signal setting_changed) ; les connexions ouvertes sont fermées avant
+        caches.close_all()
+        return override_settings(CACHES=temporary)
+
+    def switch(self, aliases, names):
+        for alias in aliases:
+            connections[alias].close()
+            # settings_dict de la connexion = connections.settings[alias]
+            connections.settings[alias]["NAME"] = names[alias]
+
+    # --- Mesures ---
+
+    def users_by_role(self, roles):
+        lookups = {
+            "SuperAdmin": Q(role="SuperAdmin") | Q(is_superuser=True),
+            "BranchAdmin": Q(role="BranchAdmin", branch__isnull=False),
+            "Agent": Q(role="Agent", branch__isnull=False),
+        }
+        users = {}
+        for role in roles:
+            user = Utilisateur.objects.filter(lookups[role], is_active=True).order_by("pk").first()
+            if user is None:
+                self.stderr.write(f"Aucun utilisateur actif de rôle {role} : rôle ignoré.")
+            else:
+                users[role] = user
+        return users
+
+    def samples(self, user):
+        """Objets visibles par `user`, pour les routes de détail, et textes de recherche."""
+        client = Client.objects.for_user(user).order_by("pk").first()
+        branche = Branche.objects.for_user(user).order_by("pk").first()
+        return {
+            "client": client.pk if client else None,
+            "assurance": Assurance.objects.for_user(user).order_by("pk").values_list("pk", flat=True).first(),
+            "branche": branche.pk if branche else None,
+            "q": client.nom[:3] if client else "a",
+            "q_branche": branche.nom[:3] if branche else "a",
+        }
+
+    def build_path(self, name, params, values):
+        kwargs = {}
+        if "pk" in params:
+            model = next((m for m in ("assurance", "client", "branche") if m in name), None)
+            if model is None or values[model] is None:
+                return None
+            kwargs["pk"] = values[model]
+        elif params:
+            return None
+        path = reverse(name, kwargs=kwargs)
+        query = {key: value.format(**values) for key, value in QUERY_PARAMS.get(name, {}).items()}
+        if query:
+            path += "?" + "&".join(f"{key}={value}" for key, value in query.items())
+        return path
+
+    def run_scale(self, scale, roles, options):
+        routes = [(name, params) for name, params in discover_routes()
+                  if not options["only"] or options["only"] in name]
+        results = []
+        for role, user in self.users_by_role(roles).items():
+            # Une erreur 500 est mesurée comme une réponse (statut dans les résultats)
+            http = HttpClient(raise_request_exception=False, HTTP_HOST=options["host"])
+            http.force_login(user)
+            values = self.samples(user)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{scale} — {role} ({user.username})"))
+            for name, params in routes:
+                path = self.build_path(name, params, values)
+                if path is None:
+                    continue
+                result = {"scale": scale, "role": role, "name": name, "path": path,
+                          **self.measure(http, path, options)}
+                results.append(result)
+                self.stdout.write(
+                    f"  {name:<28} {result['status']}  p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  "
+                    f"p99 {result['p99_ms']:8.2f} ms  {result['queries']:3d} req. SQL  "
+                    f"{result['sql_ms']:7.2f} ms SQL  {result['bytes'] / 1024:8.1f} Kio"
+                )
+        return results
+
+    def measure(self, http, path, options):
+        for _ in range(options["warmup"]):
+            self.request(http, path)
+        durations, queries, sql_times, sizes, status = [], [], [], [], None
+        for _ in range(options["iterations"]):
+            with QueryRecorder().record() as recorder:
+                start = time.perf_counter()
+                status, size = self.request(http, path)
+                durations.append(time.perf_counter() - start)
+            queries.append(recorder.count)
+            sql_times.append(recorder.duration)
+            sizes.append(size)
+        durations.sort()
+        return {
+            "status": status,
+            "p50_ms": round(percentile(durations, 50) * 1000, 3),
+            "p95_ms": round(percentile(durations, 95) * 1000, 3),
+            "p99_ms": round(percentile(durations, 99) * 1000, 3),
+            "queries": sorted(queries)[len(queries) // 2],
+            "sql_ms": round(sorted(sql_times)[len(sql_times) // 2] * 1000, 3),
+            "bytes": sorted(sizes)[len(sizes) // 2],
+        }
+
+    def request(self, http, path):
+        response = http.get(path)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        return response.status_code, size
+
+    # --- Comparaison ---
+
+    def load(self, path):
+        try:
+            with open(path, encoding="utf-8") as stream:
+                return {
+                    (r["scale"], r["role"], r["name"]): r for r in json.load(stream)["results"]
+                }
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"Référence illisible ({path}) : {exc}")
+
+    def compare(self, baseline, results, options):
+        factor = 1 + options["threshold"] / 100
+        regressions = []
+        for result in results:
+            before = baseline.get((result["scale"], result["role"], result["name"]))
+            if before is None:
+                continue
+            problems = []
+            if (result["p95_ms"] > before["p95_ms"] * factor
+                    and result["p95_ms"] - before["p95_ms"] >= options["min_delta_ms"]):
+                problems.append(f"p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+            if result["queries"] > before["queries"]:
+                problems.append(f"requêtes SQL {before['queries']} -> {result['queries']}")
+            if result["bytes"] > before["bytes"] * factor:
+                problems.append(f"taille {before['bytes']} -> {result['bytes']} octets")
+            if result["status"] != before["status"]:
+                problems.append(f"statut {before['status']} -> {result['status']}")
+            if problems:
+                regressions.append(f"{result['scale']} / {result['role']} / {result['name']} : {', '.join(problems)}")
+
+        if regressions:
+            for line in regressions:
+                self.stderr.write(self.style.ERROR(f"RÉGRESSION {line}"))
+            raise CommandError(f"{len(regressions)} régression(s) par rapport à la référence.")
+        self.stdout.write(self.style.SUCCESS("Aucune régression par rapport à la référence."))
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.importers import (
+    IMPORTERS, IMPORT_BATCH_SIZE, IMPORT_ENCODING, IMPORT_FORMATS, ImportEncodingError,
+    check_encoding, decode_lines, guess_format, read_records,
+)
+
+
+class Command(BaseCommand):
+    """
+    Import en masse de clients ou d'assurances depuis un fichier CSV ou NDJSON.
+
+    Exemples :
+        python manage.py import_portfolio clients clients_douala.csv
+        python manage.py import_portfolio assurances contrats.ndjson --batch-size 5000
+        python manage.py import_portfolio clients export_excel.csv --encoding cp1252
+    """
+
+    help = "Importe des clients ou des assurances en masse depuis un fichier CSV ou NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=sorted(IMPORTERS), help="Type de données à importer.")
+        parser.add_argument("path", help="Chemin du fichier à importer.")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="Format du fichier (déduit de l'extension par défaut).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help=f"Nombre de lignes par lot et par transaction (défaut : {IMPORT_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--encoding",
+            default=IMPORT_ENCODING,
+            help=f"Encodage du fichier (défaut : {IMPORT_ENCODING}, cp1252 pour un CSV enregistré par Excel).",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or guess_format(options["path"])
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size doit être supérieur à 0.")
+        if not check_encoding(options["encoding"]):
+            raise CommandError(f"Encodage inconnu : {options['encoding']}.")
+
+        importer = IMPORTERS[options["model"]](batch_size=options["batch_size"])
+        start = time.perf_counter()
+        try:
+            with open(options["path"], "rb") as stream:
+                result = importer.run(read_records(decode_lines(stream, options["encoding"]), fmt))
+        except OSError as exc:
+            raise CommandError(f"Impossible de lire {options['path']} : {exc}")
+        except ImportEncodingError as exc:
+            raise CommandError(f"{exc} {exc.result.created} lignes importées avant l'erreur.")
+        elapsed = time.perf_counter() - start
+
+        for error in result.errors:
+            self.stderr.write(f"Ligne {error['line']} : {error['errors']}")
+        if result.failed > len(result.errors):
+            self.stderr.write(f"... et {result.failed - len(result.errors)} autres lignes en erreur.")
+
+        rate = result.created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.created} lignes importées, {result.failed} en erreur "
+            f"en {elapsed:.1f} s ({rate:.0f} lignes/s)."
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gestion import dashboard
+
+
+class Command(BaseCommand):
+    """
+    Recalcule les statistiques du tableau de bord (StatistiqueBranche) de toutes les branches.
+
+    Les statistiques sont tenues à jour par les signaux et recalculées à la demande
+    quand elles sont périmées ; la commande sert après une écriture directe en base
+    (SQL, shell) ou, planifiée chaque nuit, à éviter le recalcul à la première visite du jour.
+
+    Exemple :
+        python manage.py rebuild_dashboard
+    """
+
+    help = "Recalcule les statistiques du tableau de bord pour toutes les branches."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        stats = dashboard.rebuild()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(stats)} branche(s) recalculée(s) en {elapsed:.2f} s."
+        ))
@@ -0,0 +1,230 @@
+import datetime
+import itertools
+import math
+import random
+import re
+import time
+import unicodedata
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from gestion import dashboard
+from gestion.models import Branche, Client, Assurance, Utilisateur
+from gestion.signals import bulk_saved
+
+
+VILLES = [
+    "Douala", "Yaoundé", "Bafoussam", "Garoua", "Bamenda", "Maroua", "Ngaoundéré", "Bertoua",
+    "Ebolowa", "Kribi", "Limbé", "Buea", "Kumba", "Dschang", "Edéa", "Nkongsamba",
+    "Foumban", "Sangmélima", "Kousséri", "Mbalmayo",
+]
+NOMS = [
+    "Mbarga", "Nkoulou", "Fotso", "Kamga", "Tchoumi", "Ngono", "Essomba", "Abena", "Owona", "Etoa",
+    "Nana", "Talla", "Ndongo", "Atangana", "Mvondo", "Ewane", "Ekambi", "Moukoko", "Njoya", "Tagne",
+    "Wamba", "Kouam", "Nguemo", "Simo", "Tchinda", "Youmbi", "Bello", "Hamadou", "Oumarou", "Ngassa",
+]
+PRENOMS = [
+    "Jean", "Marie", "Paul", "Aïcha", "Ibrahim", "Christelle", "Serge", "Brice", "Armelle", "Fadimatou",
+    "Hervé", "Rodrigue", "Sandrine", "Yannick", "Estelle", "Boris", "Carine", "Alain", "Nadège", "Franck",
+]
+RUES = ["Rue de la Joie", "Boulevard de la Liberté", "Avenue Kennedy", "Rue des Palmiers", "Carrefour Mvog-Mbi"]
+
+# Type de contrat -> (poids, montant médian, durées possibles en jours avec leurs poids)
+TYPES = {
+    "Auto": (35, 150_000, {365: 80, 182: 20}),
+    "Santé": (25, 250_000, {365: 90, 730: 10}),
+    "Habitation": (20, 90_000, {365: 70, 730: 20, 1095: 10}),
+    "Vie": (12, 500_000, {1825: 40, 3650: 60}),
+    "Voyage": (8, 30_000, {7: 30, 30: 50, 90: 20}),
+}
+TYPE_NAMES = list(TYPES)
+TYPE_CUM_WEIGHTS = list(itertools.accumulate(t[0] for t in TYPES.values()))
+# Nombre de contrats par client -> poids (moyenne ~1,7 ; certains clients n'en ont plus)
+CONTRATS_PAR_CLIENT = {0: 8, 1: 45, 2: 27, 3: 12, 4: 5, 5: 3}
+MONTANT_MAX = Decimal("99999999.99")
+
+
+def parse_scale(value):
+    """'5000', '10k', '2.5M' -> nombre entier de contrats."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([kKmM]?)", value.strip())
+    if not match:
+        raise CommandError(f"Échelle invalide : {value} (ex. 1000, 50k, 10M).")
+    number, suffix = match.groups()
+    return int(float(number) * {"": 1, "k": 1_000, "m": 1_000_000}[suffix.lower()])
+
+
+def ascii_slug(text):
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+
+
+class Command(BaseCommand):
+    """
+    Génère un portefeuille synthétique réaliste : branches, utilisateurs, clients et contrats,
+    de 1k à 10M contrats, pour reproduire en local les problèmes de performance.
+
+    - Reproductible : même --seed, même --date et même échelle = mêmes données.
+    - Répartition inégale entre branches (loi de Zipf : les premières villes pèsent le plus).
+    - Inscriptions plus nombreuses ces dernières années, contrats qui démarrent après
+      l'inscription, durées et montants (loi log-normale) selon le type de contrat.
+    - Écriture par bulk_create, un lot par transaction. Le signal bulk_saved est envoyé
+      pour chaque lot, comme pour un import : journal de synchronisation, caches et
+      tableau de bord restent cohérents (les statistiques sont recalculées à la fin).
+
+    Exemples :
+        python manage.py seed_portfolio --contracts 100k
+        python manage.py seed_portfolio --contracts 10M --batch-size 20000 --seed 7
+    """
+
+    help = "Génère un portefeuille synthétique reproductible (branches, clients, contrats, utilisateurs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contracts", default="1k", help="Nombre de contrats : 1000, 50k, 10M... (défaut : 1k).")
+        parser.add_argument("--branches", type=int, help="Nombre de branches (défaut : selon l'échelle, 5 à 40).")
+        parser.add_argument("--seed", type=int, default=42, help="Graine aléatoire (défaut : 42).")
+        parser.add_argument("--date", help="Date de référence AAAA-MM-JJ (défaut : aujourd'hui).")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Clients par lot et par transaction (défaut : 5000).")
+        parser.add_argument("--password", default="intia2025", help="Mot de passe des utilisateurs créés.")
+        parser.add_argument("--append", action="store_true", help="Ajouter aux données existantes.")
+
+    def handle(self, *args, **options):
+        total = parse_scale(options["contracts"])
+        if total < 1 or options["batch_size"] < 1:
+            raise CommandError("--contracts et --batch-size doivent être supérieurs à 0.")
+        if not options["append"] and Branche.objects.exists():
+            raise CommandError("La base contient déjà des branches : utilisez --append pour ajouter des données.")
+        try:
+            self.today = datetime.date.fromisoformat(options["date"]) if options["date"] else timezone.localdate()
+        except ValueError:
+            raise CommandError(f"Date invalide : {options['date']} (format AAAA-MM-JJ).")
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        nb_branches = options["branches"] or min(40, max(5, round(math.log10(total) * 6) - 13))
+
+        start = time.perf_counter()
+        branches, weights = self.create_branches(nb_branches)
+        users = self.create_users(branches, weights, total, options["password"])
+        clients, contracts = self.create_portfolio(branches, weights, total)
+        written = time.perf_counter() - start
+
+        stats_start = time.perf_counter()
+        dashboard.rebuild()
+        stats_elapsed = time.perf_counter() - stats_start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(branches)} branches, {users} utilisateurs, {clients} clients, {contracts} contrats "
+            f"en {written:.1f} s ({(clients + contracts) / written:.0f} lignes/s)."
+        ))
+        self.stdout.write(f"Tableau de bord recalculé en {stats_elapsed:.1f} s.")
+
+    # --- Branches et utilisateurs ---
+
+    def create_branches(self, count):
+        names = [
+            VILLES[i % len(VILLES)] + (f" {i // len(VILLES) + 1}" if i >= len(VILLES) else "")
+            for i in range(count)
+        ]
+        branches = [Branche(nom=f"INTIA {name}", ville=name.split(" ")[0]) for name in names]
+        with transaction.atomic():
+            Branche.objects.bulk_create(branches)
+            bulk_saved.send(sender=Branche, instances=branches, created=True)
+        # Loi de Zipf (s = 1) : la 1re branche pèse deux fois la 2e, trois fois la 3e...
+        weights = [1 / (rank + 1) for rank in range(count)]
+        return branches, weights
+
+    def create_users(self, branches, weights, total, password):
+        # Un seul hachage : PBKDF2 coûte volontairement cher
+        hashed = make_password(password)
+        users = []
+        if not Utilisateur.objects.filter(username="siege").exists():
+            users.append(Utilisateur(username="siege", role="SuperAdmin", password=hashed, is_staff=True))
+        share = sum(weights)
+        for branche, weight in zip(branches, weights):
+            users.append(Utilisateur(
+                username=f"admin_b{branche.pk}", role="BranchAdmin", branch=branche, password=hashed,
+                first_name=self.rng.choice(PRENOMS), last_name=self.rng.choice(NOMS),
+            ))
+            # Un agent pour ~2000 contrats de la branche
+            agents = max(1, round(total * weight / share / 2000))
+            users += [
+                Utilisateur(
+                    username=f"agent_b{branche.pk}_{n}", role="Agent", branch=branche, password=hashed,
+                    first_name=self.rng.choice(PRENOMS), last_name=self.rng.choice(NOMS),
+                )
+                for n in range(1, agents + 1)
+            ]
+        Utilisateur.objects.bulk_create(users, batch_size=self.batch_size)
+        return len(users)
+
+    # --- Clients et contrats ---
+
+    def create_portfolio(self, branches, weights, total):
+        cum_weights = list(itertools.accumulate(weights))
+        counts, count_weights = zip(*CONTRATS_PAR_CLIENT.items())
+        clients_done = contracts_done = 0
+        clients, contracts = [], []
+        next_report = 100_000
+        start = time.perf_counter()
+
+        # Tirages dans un ordre fixe (client puis ses contrats) : les données ne dépendent
+        # pas de --batch-size
+        while contracts_done < total:
+            client = self.make_client(clients_done + len(clients), self.rng.choices(branches, cum_weights=cum_weights)[0])
+            n = min(self.rng.choices(counts, weights=count_weights)[0], total - contracts_done)
+            clients.append(client)
+            contracts += [self.make_contract(client) for _ in range(n)]
+            contracts_done += n
+            if len(clients) < self.batch_size and contracts_done < total:
+                continue
+
+            with transaction.atomic():
+                Client.objects.bulk_create(clients)
+                bulk_saved.send(sender=Client, instances=clients, created=True)
+                # client_id est repris des clients qui viennent de recevoir leur pk
+                Assurance.objects.bulk_create(contracts, batch_size=self.batch_size)
+                bulk_saved.send(sender=Assurance, instances=contracts, created=True)
+            clients_done += len(clients)
+            clients, contracts = [], []
+
+            if contracts_done >= next_report or contracts_done >= total:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"  {contracts_done}/{total} contrats ({contracts_done / elapsed:.0f} contrats/s)")
+                next_report = contracts_done + 100_000
+        return clients_done, contracts_done
+
+    def make_client(self, number, branche):
+        rng = self.rng
+        nom, prenom = rng.choice(NOMS), rng.choice(PRENOMS)
+        # Croissance du portefeuille : les inscriptions récentes sont les plus nombreuses
+        days_ago = int(8 * 365 * rng.random() ** 2)
+        return Client(
+            nom=nom,
+            prenom=prenom,
+            adresse=f"{rng.randint(1, 400)} {rng.choice(RUES)}, {branche.ville}",
+            email=f"{ascii_slug(prenom)}.{ascii_slug(nom)}{number}@example.com",
+            telephone=f"6{rng.randint(50_000_000, 99_999_999)}",
+            branche=branche,
+            date_inscription=self.today - datetime.timedelta(days=days_ago),
+        )
+
+    def make_contract(self, client):
+        rng = self.rng
+        type_assurance = rng.choices(TYPE_NAMES, cum_weights=TYPE_CUM_WEIGHTS)[0]
+        _, median, durations = TYPES[type_assurance]
+        # Début entre l'inscription et dans un mois (contrats déjà signés, pas encore commencés)
+        span = (self.today - client.date_inscription).days + 30
+        date_debut = client.date_inscription + datetime.timedelta(days=rng.randrange(span))
+        duration = rng.choices(list(durations), weights=list(durations.values()))[0]
+        montant = Decimal(rng.lognormvariate(math.log(median), 0.6)).quantize(Decimal("0.01"))
+        return Assurance(
+            type_assurance=type_assurance,
+            date_debut=date_debut,
+            date_fin=date_debut + datetime.timedelta(days=duration),
+            montant=min(montant, MONTANT_MAX),
+            client=client,
+            branche_id=client.branche_id,
+        )
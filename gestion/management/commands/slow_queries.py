@@ -0,0 +1,125 @@
+import datetime
+import json
+import math
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion import slow_queries
+
+
+SORTS = {
+    "total": lambda q: q["total_ms"],
+    "max": lambda q: q["max_ms"],
+    "p95": lambda q: q["p95_ms"],
+    "count": lambda q: q["count"],
+}
+
+
+def read_entries(path):
+    """Lignes du journal et de sa copie tournée (.1), les plus anciennes d'abord."""
+    for candidate in (path.with_name(path.name + ".1"), path):
+        if not candidate.exists():
+            continue
+        with open(candidate, encoding="utf-8") as stream:
+            for line in stream:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Ligne tronquée (écriture interrompue) : ignorée
+                    continue
+
+
+def aggregate(entries):
+    """Regroupe les entrées par empreinte SQL : nombre, durées, appelants, plan."""
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry["fingerprint"], {
+            "fingerprint": entry["fingerprint"],
+            "sql": entry["sql"],
+            "durations": [],
+            "callers": Counter(),
+            "params": Counter(),
+            "plan": None,
+            "full_scans": [],
+            "last_seen": None,
+        })
+        group["durations"].append(entry["duration_ms"])
+        group["callers"][entry.get("caller") or "?"] += 1
+        group["params"][entry.get("params", "")] += 1
+        if entry.get("plan"):
+            group["plan"] = entry["plan"]
+            group["full_scans"] = entry.get("full_scans", [])
+        group["last_seen"] = entry["time"]
+
+    results = []
+    for group in groups.values():
+        durations = sorted(group.pop("durations"))
+        results.append({
+            **group,
+            "count": len(durations),
+            "total_ms": round(sum(durations), 3),
+            "max_ms": durations[-1],
+            # Percentile par rang (même calcul que benchmark_urls)
+            "p95_ms": durations[max(math.ceil(len(durations) * 0.95) - 1, 0)],
+            "callers": group["callers"].most_common(3),
+            "params": group["params"].most_common(1)[0][0],
+        })
+    return results
+
+
+class Command(BaseCommand):
+    """
+    Rapport du journal des requêtes lentes (voir gestion/slow_queries.py) :
+    les N requêtes distinctes les plus coûteuses, avec leurs appelants, leur plan
+    SQLite et les parcours complets de gestion_client / gestion_assurance.
+
+    Exemples :
+        python manage.py slow_queries --top 10
+        python manage.py slow_queries --sort max --since 2026-10-01 --json
+    """
+
+    help = "Agrège le journal des requêtes lentes en un classement des N requêtes les plus coûteuses."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", help="Fichier du journal (défaut : settings.SLOW_QUERY_LOG).")
+        parser.add_argument("--top", type=int, default=20, help="Nombre de requêtes affichées (défaut : 20).")
+        parser.add_argument("--sort", choices=list(SORTS), default="total",
+                            help="Classement : durée cumulée (défaut), maximale, p95 ou nombre d'occurrences.")
+        parser.add_argument("--since", help="Ignorer les entrées antérieures à cette date (AAAA-MM-JJ).")
+        parser.add_argument("--json", action="store_true", help="Sortie JSON.")
+
+    def handle(self, *args, **options):
+        path = Path(options["log"]) if options["log"] else slow_queries.SLOW_QUERY_LOG
+        entries = read_entries(path)
+        if options["since"]:
+            try:
+                since = datetime.date.fromisoformat(options["since"]).isoformat()
+            except ValueError:
+                raise CommandError(f"Date invalide : {options['since']} (format AAAA-MM-JJ).")
+            # Dates ISO 8601 : l'ordre alphabétique est l'ordre chronologique
+            entries = (entry for entry in entries if entry["time"] >= since)
+
+        results = sorted(aggregate(entries), key=SORTS[options["sort"]], reverse=True)[:options["top"]]
+        if options["json"]:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+        if not results:
+            self.stdout.write(f"Aucune requête lente dans {path}.")
+            return
+
+        for rank, query in enumerate(results, 1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{rank}. [{query['fingerprint']}] {query['count']} fois, "
+                f"total {query['total_ms']:.0f} ms, p95 {query['p95_ms']:.0f} ms, max {query['max_ms']:.0f} ms"
+            ))
+            if query["full_scans"]:
+                self.stdout.write(self.style.WARNING(f"   Parcours complet : {', '.join(query['full_scans'])}"))
+            self.stdout.write(f"   {query['sql']}")
+            if query["params"]:
+                self.stdout.write(f"   Paramètres : {query['params']}")
+            for caller, count in query["callers"]:
+                self.stdout.write(f"   Appelant : {caller} ({count})")
+            for detail in query["plan"] or []:
+                self.stdout.write(f"   Plan : {detail}")
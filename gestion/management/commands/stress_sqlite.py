@@ -0,0 +1,157 @@
+import math
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from gestion.database import lock_retry_stats, retry_on_lock
+
+
+class Command(BaseCommand):
+    """
+    Test de charge concurrente de SQLite : profil par défaut de Django contre le profil
+    de production de settings.DATABASES (WAL, busy_timeout, IMMEDIATE, relance avec backoff).
+
+    Chaque profil travaille sur sa propre base temporaire (la base de l'application n'est
+    pas touchée), avec la même charge :
+    - des écrivains : transactions lecture-puis-écriture (lire un solde, écrire un mouvement,
+      mettre à jour le solde), comme les mises à jour du tableau de bord ;
+    - des lecteurs : agrégats en boucle tant que les écrivains travaillent.
+    Affiche les transactions réussies / en erreur ("database is locked"), le débit
+    d'écriture et la latence des lectures.
+
+    Exemple :
+        python manage.py stress_sqlite --writers 8 --readers 8 --transactions 200
+    """
+
+    help = "Compare SQLite par défaut et le profil de production sous écritures concurrentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8, help="Threads écrivains (défaut : 8).")
+        parser.add_argument("--readers", type=int, default=4, help="Threads lecteurs (défaut : 4).")
+        parser.add_argument("--transactions", type=int, default=100, help="Transactions par écrivain (défaut : 100).")
+
+    def handle(self, *args, **options):
+        production = settings.DATABASES["default"].get("OPTIONS", {})
+        profiles = (
+            ("Django par défaut", {}, False),
+            ("Profil de production", production, True),
+        )
+        for label, db_options, retry in profiles:
+            result = self.run_profile(db_options, retry, options)
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(
+                f"  écritures : {result['ok']} réussies, {result['errors']} en erreur, "
+                f"{result['ok'] / result['elapsed']:.1f} tx/s, {result['retries']} relance(s)"
+            )
+            self.stdout.write(
+                f"  lectures  : {result['reads']} requêtes, p50 {result['read_p50'] * 1000:.2f} ms, "
+                f"p95 {result['read_p95'] * 1000:.2f} ms, {result['read_errors']} en erreur"
+            )
+
+    def run_profile(self, db_options, retry, options):
+        with tempfile.TemporaryDirectory() as directory:
+            alias = f"stress_{os.path.basename(directory)}"
+            config = {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(directory, "stress.sqlite3"),
+                      "OPTIONS": dict(db_options)}
+            # Alias ajouté le temps du test ("default" n'est là que pour la validation)
+            connections.settings[alias] = connections.configure_settings({DEFAULT_DB_ALIAS: {}, alias: config})[alias]
+            try:
+                return self.stress(alias, retry, options)
+            finally:
+                del connections[alias]
+                del connections.settings[alias]
+
+    def connect(self, alias, retry):
+        connection = connections[alias]
+        if connection.connection is None:
+            connection.connect()
+        if not retry and retry_on_lock in connection.execute_wrappers:
+            connection.execute_wrappers.remove(retry_on_lock)
+        return connection
+
+    def stress(self, alias, retry, options):
+        connection = self.connect(alias, retry)
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE compte (id INTEGER PRIMARY KEY, branche INTEGER NOT NULL, solde INTEGER NOT NULL)")
+            cursor.execute("CREATE TABLE mouvement (id INTEGER PRIMARY KEY, compte INTEGER NOT NULL, montant INTEGER NOT NULL)")
+            cursor.executemany("INSERT INTO compte (branche, solde) VALUES (%s, 0)", [(i % 10,) for i in range(100)])
+        connection.close()
+
+        results = {"ok": 0, "errors": 0, "reads": [], "read_errors": 0}
+        lock = threading.Lock()
+        writing = threading.Event()
+        writing.set()
+
+        def writer(number):
+            connection = self.connect(alias, retry)
+            ok = errors = 0
+            try:
+                for i in range(options["transactions"]):
+                    compte = (number * 31 + i) % 100 + 1
+                    try:
+                        with transaction.atomic(using=alias), connection.cursor() as cursor:
+                            cursor.execute("SELECT solde FROM compte WHERE id = %s", [compte])
+                            solde = cursor.fetchone()[0]
+                            cursor.execute("INSERT INTO mouvement (compte, montant) VALUES (%s, 10)", [compte])
+                            cursor.execute("UPDATE compte SET solde = %s WHERE id = %s", [solde + 10, compte])
+                        ok += 1
+                    except OperationalError:
+                        errors += 1
+            finally:
+                connection.close()
+            with lock:
+                results["ok"] += ok
+                results["errors"] += errors
+
+        def reader():
+            connection = self.connect(alias, retry)
+            durations, errors = [], 0
+            try:
+                while writing.is_set():
+                    start = time.perf_counter()
+                    try:
+                        with connection.cursor() as cursor:
+                            cursor.execute(
+                                "SELECT c.branche, SUM(m.montant) FROM mouvement m "
+                                "JOIN compte c ON c.id = m.compte GROUP BY c.branche"
+                            )
+                            cursor.fetchall()
+                        durations.append(time.perf_counter() - start)
+                    except OperationalError:
+                        errors += 1
+            finally:
+                connection.close()
+            with lock:
+                results["reads"] += durations
+                results["read_errors"] += errors
+
+        retries_before = lock_retry_stats()["retries"]
+        writers = [threading.Thread(target=writer, args=(n,)) for n in range(options["writers"])]
+        readers = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        start = time.perf_counter()
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        writing.clear()
+        for thread in readers:
+            thread.join()
+
+        reads = sorted(results["reads"]) or [0.0]
+        return {
+            "ok": results["ok"],
+            "errors": results["errors"],
+            "elapsed": elapsed,
+            "retries": lock_retry_stats()["retries"] - retries_before,
+            "reads": len(results["reads"]),
+            "read_errors": results["read_errors"],
+            "read_p50": statistics.median(reads),
+            "read_p95": reads[math.ceil(len(reads) * 0.95) - 1],
+        }
@@ -0,0 +1,335 @@
+import atexit
+import bisect
+import contextlib
+import contextvars
+import hmac
+import json
+import os
+import re
+import secrets
+import socket
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus (poste de développement)
+    fcntl = None
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+# --------- MÉTRIQUES PAR VUE (FORMAT PROMETHEUS) ---------
+# MetricsMiddleware compte, par nom d'URL (resolver_match.view_name) :
+# - les requêtes par méthode et code de statut, et leur durée (histogramme) ;
+# - les requêtes SQL et leur durée (execute wrapper installé sur chaque connexion) ;
+# - les succès / échecs des caches (listes par branche, utilisateurs connectés).
+# Plusieurs workers : chaque processus écrit ses compteurs dans
+# METRICS_DIR/process-<machine>-<pid>-<aléa>.json (remplacement atomique, au plus une fois
+# par METRICS_FLUSH_INTERVAL secondes) ; l'endpoint additionne tous les fichiers.
+# Les compteurs exposés ne doivent jamais baisser : une baisse est lue par Prometheus
+# comme une remise à zéro, et rate() / increase() comptent alors la valeur entière comme
+# une augmentation (pic). À sa sortie, un processus ajoute donc ses compteurs à
+# METRICS_DIR/aggregate.json avant de retirer son fichier (sous verrou : la somme ne voit
+# jamais les deux, ni aucun des deux). Le nom aléatoire évite qu'un pid réutilisé, ou le
+# même pid dans un autre conteneur partageant le dossier, écrase le fichier d'un autre.
+# Un processus tué sans passer par atexit (kill -9) laisse son fichier, toujours compté :
+# vider METRICS_DIR au redéploiement, quand tous les workers redémarrent. Avec gunicorn,
+# le hook worker_exit peut appeler metrics.store.close() (idempotent).
+# Sans METRICS_DIR, l'endpoint ne montre que le processus qui répond.
+# Endpoint : /stats/metrics/ (siège, ou jeton METRICS_TOKEN en "Authorization: Bearer").
+
+METRICS_DIR = getattr(settings, "METRICS_DIR", None)
+METRICS_FLUSH_INTERVAL = getattr(settings, "METRICS_FLUSH_INTERVAL", 1.0)
+METRICS_LATENCY_BUCKETS = tuple(getattr(
+    settings, "METRICS_LATENCY_BUCKETS", (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+))
+METRICS_TOKEN = getattr(settings, "METRICS_TOKEN", None)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "intia"
+# Séparateur des valeurs d'étiquettes dans les clés JSON
+_SEP = "\t"
+# Compteurs des processus terminés, et verrou entre le repli d'un processus et la lecture
+AGGREGATE_FILE = "aggregate.json"
+LOCK_FILE = ".lock"
+
+# Mesures de la requête en cours : {"queries": int, "db_seconds": float, "cache": {(cache, résultat): int}}
+_current = contextvars.ContextVar("gestion_metrics", default=None)
+
+
+def _empty():
+    return {"requests": {}, "latency": {}, "db_queries": {}, "db_seconds": {}, "cache": {}}
+
+
+class MetricsStore:
+    """Compteurs du processus, et lecture de ceux des autres processus (METRICS_DIR)."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory) if directory else None
+        self.lock = threading.Lock()
+        self.pid = None
+        self._reset()
+
+    def _reset(self):
+        # Après un fork (gunicorn --preload), le fils repart de zéro avec son propre fichier
+        self.pid = os.getpid()
+        host = re.sub(r"[^A-Za-z0-9_.]+", "_", socket.gethostname()) or "machine"
+        self.name = f"process-{host}-{self.pid}-{secrets.token_hex(4)}.json"
+        self.data = _empty()
+        self.last_flush = 0.0
+
+    @property
+    def path(self):
+        return self.directory / self.name if self.directory else None
+
+    def record(self, view, method, status, duration, request_state):
+        with self.lock:
+            if self.pid != os.getpid():
+                self._reset()
+            data = self.data
+            key = _SEP.join((view, method, str(status)))
+            data["requests"][key] = data["requests"].get(key, 0) + 1
+
+            histogram = data["latency"].setdefault(view, {"buckets": [0] * (len(METRICS_LATENCY_BUCKETS) + 1), "sum": 0.0})
+            histogram["buckets"][bisect.bisect_left(METRICS_LATENCY_BUCKETS, duration)] += 1
+            histogram["sum"] += duration
+
+            data["db_queries"][view] = data["db_queries"].get(view, 0) + request_state["queries"]
+            data["db_seconds"][view] = data["db_seconds"].get(view, 0.0) + request_state["db_seconds"]
+            for (cache, result), count in request_state["cache"].items():
+                key = _SEP.join((view, cache, result))
+                data["cache"][key] = data["cache"].get(key, 0) + count
+
+            if self.directory is not None and time.monotonic() - self.last_flush >= METRICS_FLUSH_INTERVAL:
+                # Sous le verrou : une écriture en retard ne peut pas recréer le fichier après close()
+                self.last_flush = time.monotonic()
+                _write(self.path, json.dumps(data))
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive):
+        """Verrou entre processus sur METRICS_DIR (exclusif pour close(), partagé pour collect())."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / LOCK_FILE, "a") as stream:
+            if fcntl is not None:
+                fcntl.flock(stream, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            # Fermer le fichier libère le verrou
+            yield
+
+    def close(self):
+        """
+        À la sortie du processus : ajoute ses derniers compteurs (y compris ceux pas encore
+        écrits) à aggregate.json et retire son fichier. Le processus repart ensuite de zéro
+        avec un nouveau fichier, si d'autres requêtes suivent.
+        """
+        if self.directory is None:
+            return
+        with self.lock:
+            if self.pid != os.getpid() or self.data == _empty():
+                return
+            with self._locked(exclusive=True):
+                aggregate = self.directory / AGGREGATE_FILE
+                total = _read(aggregate) or _empty()
+                _merge(total, self.data)
+                _write(aggregate, json.dumps(total))
+                self.path.unlink(missing_ok=True)
+            self._reset()
+
+    def collect(self):
+        """Somme des compteurs de ce processus, des autres processus et des processus terminés."""
+        with self.lock:
+            if self.pid != os.getpid():
+                self._reset()
+            total = json.loads(json.dumps(self.data))
+            own = self.path
+        if self.directory is None or not self.directory.exists():
+            return total
+        with self._locked(exclusive=False):
+            for path in (self.directory / AGGREGATE_FILE, *self.directory.glob("process-*.json")):
+                if path == own:
+                    continue
+                other = _read(path)
+                if other is not None:
+                    _merge(total, other)
+        return total
+
+
+def _write(path, snapshot):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temporary.write_text(snapshot, encoding="utf-8")
+    os.replace(temporary, path)
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(total, other):
+    for family in ("requests", "db_queries", "db_seconds", "cache"):
+        for key, value in other.get(family, {}).items():
+            total[family][key] = total[family].get(key, 0) + value
+    for view, histogram in other.get("latency", {}).items():
+        mine = total["latency"].get(view)
+        if mine is None or len(mine["buckets"]) != len(histogram["buckets"]):
+            # Buckets différents (configuration changée entre deux déploiements) : on garde le plus récent
+            total["latency"].setdefault(view, histogram)
+            continue
+        mine["buckets"] = [a + b for a, b in zip(mine["buckets"], histogram["buckets"])]
+        mine["sum"] += histogram["sum"]
+
+
+store = MetricsStore(METRICS_DIR)
+atexit.register(store.close)
+
+
+# --- Collecte pendant la requête ---
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper : ajoute la requête SQL aux mesures de la requête HTTP en cours."""
+    state = _current.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        state["queries"] += 1
+        state["db_seconds"] += time.perf_counter() - start
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """Receiver de connection_created : ajoute count_query à la connexion."""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def cache_result(cache, hit):
+    """À appeler après une lecture de cache : compte un succès ou un échec pour la vue en cours."""
+    state = _current.get()
+    if state is not None:
+        key = (cache, "hit" if hit else "miss")
+        state["cache"][key] = state["cache"].get(key, 0) + 1
+
+
+def cache_totals(cache):
+    """Succès et échecs de `cache`, toutes vues et tous processus confondus."""
+    totals = {"hit": 0, "miss": 0}
+    for key, count in store.collect()["cache"].items():
+        _, name, result = key.split(_SEP)
+        if name == cache:
+            totals[result] += count
+    return totals
+
+
+class MetricsMiddleware:
+    """
+    Mesure chaque requête et l'enregistre dans `store`. À placer en tête de MIDDLEWARE.
+    Compatible WSGI et ASGI : le contexte (contextvars) suit la requête dans les threads
+    de sync_to_async, les requêtes SQL des vues async sont donc comptées.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = {"queries": 0, "db_seconds": 0.0, "cache": {}}
+        token = _current.set(state)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, time.perf_counter() - start, state)
+        return response
+
+    async def __acall__(self, request):
+        state = {"queries": 0, "db_seconds": 0.0, "cache": {}}
+        token = _current.set(state)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, time.perf_counter() - start, state)
+        return response
+
+    def _record(self, request, response, duration, state):
+        match = request.resolver_match
+        # Nom d'URL et non chemin : le nombre de séries reste borné
+        view = match.view_name if match else "unresolved"
+        store.record(view, request.method, response.status_code, duration, state)
+
+
+# --- Export ---
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Toutes les métriques, au format texte de Prometheus (exposition 0.0.4)."""
+    data = store.collect()
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+    family("http_requests_total", "counter", "Requêtes HTTP par vue, méthode et code de statut.")
+    for key, count in sorted(data["requests"].items()):
+        view, method, status = key.split(_SEP)
+        lines.append(f"{PREFIX}_http_requests_total{_labels(view=view, method=method, status=status)} {count}")
+
+    family("http_request_duration_seconds", "histogram", "Durée des requêtes HTTP par vue.")
+    for view, histogram in sorted(data["latency"].items()):
+        cumulative = 0
+        bounds = [*(_number(float(b)) for b in METRICS_LATENCY_BUCKETS), "+Inf"]
+        for bound, count in zip(bounds, histogram["buckets"]):
+            cumulative += count
+            lines.append(f"{PREFIX}_http_request_duration_seconds_bucket{_labels(view=view, le=bound)} {cumulative}")
+        lines.append(f"{PREFIX}_http_request_duration_seconds_sum{_labels(view=view)} {_number(histogram['sum'])}")
+        lines.append(f"{PREFIX}_http_request_duration_seconds_count{_labels(view=view)} {cumulative}")
+
+    family("db_queries_total", "counter", "Requêtes SQL exécutées par vue.")
+    for view, count in sorted(data["db_queries"].items()):
+        lines.append(f"{PREFIX}_db_queries_total{_labels(view=view)} {count}")
+
+    family("db_query_duration_seconds_total", "counter", "Temps passé dans les requêtes SQL par vue.")
+    for view, seconds in sorted(data["db_seconds"].items()):
+        lines.append(f"{PREFIX}_db_query_duration_seconds_total{_labels(view=view)} {_number(float(seconds))}")
+
+    family("cache_requests_total", "counter", "Lectures de cache par vue, cache et résultat (hit / miss).")
+    for key, count in sorted(data["cache"].items()):
+        view, cache, result = key.split(_SEP)
+        lines.append(f"{PREFIX}_cache_requests_total{_labels(view=view, cache=cache, result=result)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def has_scrape_token(request):
+    """Vrai si la requête présente METRICS_TOKEN (Authorization: Bearer ...), pour Prometheus."""
+    if not METRICS_TOKEN:
+        return False
+    header = request.headers.get("Authorization", "")
+    return header.startswith("Bearer ") and hmac.compare_digest(header[7:].encode(), METRICS_TOKEN.encode())
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gestion", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(fields=["nom", "prenom"], name="client_nom_prenom_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(fields=["email"], name="client_email_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(fields=["telephone"], name="client_telephone_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="assurance",
+            index=models.Index(
+                fields=["branche", "date_fin", "montant"], name="assurance_branche_fin_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="assurance",
+            index=models.Index(fields=["date_fin"], name="assurance_date_fin_idx"),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import DatabaseError, migrations
+
+
+# SQL figé tel qu'à l'écriture de la migration : elle ne doit pas dépendre du code
+# courant de gestion/search.py, qui peut évoluer (apps.py réinstalle l'index après migrate).
+
+CREATE_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS gestion_client_fts USING fts5("
+    "nom, prenom, email, telephone, adresse, content='gestion_client', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+
+INSERT_NEW = (
+    "INSERT INTO gestion_client_fts(rowid, nom, prenom, email, telephone, adresse) "
+    "VALUES (new.id, new.nom, new.prenom, new.email, new.telephone, new.adresse);"
+)
+DELETE_OLD = (
+    "INSERT INTO gestion_client_fts(gestion_client_fts, rowid, nom, prenom, email, telephone, adresse) "
+    "VALUES ('delete', old.id, old.nom, old.prenom, old.email, old.telephone, old.adresse);"
+)
+
+TRIGGERS = {
+    "gestion_client_fts_ai": f"AFTER INSERT ON gestion_client BEGIN {INSERT_NEW} END",
+    "gestion_client_fts_ad": f"AFTER DELETE ON gestion_client BEGIN {DELETE_OLD} END",
+    "gestion_client_fts_au": f"AFTER UPDATE ON gestion_client BEGIN {DELETE_OLD} {INSERT_NEW} END",
+}
+
+
+def install(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_TABLE)
+        except DatabaseError:
+            # SQLite compilé sans FTS5 : la recherche utilisera le repli par préfixe
+            return
+        for name, body in TRIGGERS.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+        cursor.execute("INSERT INTO gestion_client_fts(gestion_client_fts) VALUES ('rebuild')")
+
+
+def uninstall(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute("DROP TABLE IF EXISTS gestion_client_fts")
+
+
+class Migration(migrations.Migration):
+    """
+    Index plein texte FTS5 des clients (SQLite uniquement, voir gestion/search.py).
+    """
+
+    dependencies = [
+        ("gestion", "0002_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
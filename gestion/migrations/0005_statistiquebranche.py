@@ -0,0 +1,51 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gestion", "0004_client_branche_nom_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatistiqueBranche",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("periode", models.DateField()),
+                ("contrats_actifs", models.PositiveIntegerField(default=0)),
+                (
+                    "montant_actif",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("nouveaux_clients", models.PositiveIntegerField(default=0)),
+                ("contrats_expirant", models.PositiveIntegerField(default=0)),
+                ("calcule_le", models.DateField(blank=True, null=True)),
+                (
+                    "branche",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="statistiques",
+                        to="gestion.branche",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("branche", "periode"),
+                        name="statistique_branche_periode_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
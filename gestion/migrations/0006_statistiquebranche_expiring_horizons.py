@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def mark_statistics_stale(apps, schema_editor):
+    # Les nouveaux compteurs valent 0 : les lignes existantes seront recalculées à la lecture
+    StatistiqueBranche = apps.get_model("gestion", "StatistiqueBranche")
+    StatistiqueBranche.objects.update(calcule_le=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gestion", "0005_statistiquebranche"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="statistiquebranche",
+            old_name="contrats_expirant",
+            new_name="contrats_expirant_30j",
+        ),
+        migrations.AddField(
+            model_name="statistiquebranche",
+            name="contrats_expirant_7j",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="statistiquebranche",
+            name="contrats_expirant_90j",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(mark_statistics_stale, migrations.RunPython.noop),
+    ]
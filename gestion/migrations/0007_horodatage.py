@@ -0,0 +1,68 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# SQLite reconstruit gestion_client pour ajouter ces colonnes NOT NULL : les triggers de
+# l'index FTS5 (0003_client_fts) disparaissent avec l'ancienne table. On les recrée après
+# la reconstruction, dans les deux sens (SQL figé, comme dans 0003).
+INSERT_NEW = (
+    "INSERT INTO gestion_client_fts(rowid, nom, prenom, email, telephone, adresse) "
+    "VALUES (new.id, new.nom, new.prenom, new.email, new.telephone, new.adresse);"
+)
+DELETE_OLD = (
+    "INSERT INTO gestion_client_fts(gestion_client_fts, rowid, nom, prenom, email, telephone, adresse) "
+    "VALUES ('delete', old.id, old.nom, old.prenom, old.email, old.telephone, old.adresse);"
+)
+
+TRIGGERS = {
+    "gestion_client_fts_ai": f"AFTER INSERT ON gestion_client BEGIN {INSERT_NEW} END",
+    "gestion_client_fts_ad": f"AFTER DELETE ON gestion_client BEGIN {DELETE_OLD} END",
+    "gestion_client_fts_au": f"AFTER UPDATE ON gestion_client BEGIN {DELETE_OLD} {INSERT_NEW} END",
+}
+
+
+def recreate_client_fts_triggers(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'gestion_client_fts'")
+        if cursor.fetchone() is None:
+            # SQLite sans FTS5 : pas d'index (voir 0003_client_fts)
+            return
+        for name, body in TRIGGERS.items():
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+        cursor.execute("INSERT INTO gestion_client_fts(gestion_client_fts) VALUES ('rebuild')")
+
+
+def _timestamps(model_name):
+    # Les lignes existantes reçoivent la date de la migration
+    return [
+        migrations.AddField(
+            model_name=model_name,
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name=model_name,
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gestion", "0006_statistiquebranche_expiring_horizons"),
+    ]
+
+    operations = [
+        # En arrière, exécutée en dernier : après la reconstruction qui retire les colonnes
+        migrations.RunPython(migrations.RunPython.noop, recreate_client_fts_triggers),
+        *_timestamps("branche"),
+        *_timestamps("client"),
+        *_timestamps("assurance"),
+        migrations.RunPython(recreate_client_fts_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations, models
+
+
+SYNC_MODELS = (("branche", "Branche", "pk"), ("client", "Client", "branche_id"), ("assurance", "Assurance", "branche_id"))
+
+
+def journal_existing_rows(apps, schema_editor):
+    # Les objets existants entrent dans le journal : une première synchronisation les reçoit tous
+    Changement = apps.get_model("gestion", "Changement")
+    db = schema_editor.connection.alias
+    for modele, model_name, branche_field in SYNC_MODELS:
+        model = apps.get_model("gestion", model_name)
+        rows = model.objects.using(db).order_by("pk").values_list("pk", branche_field)
+        Changement.objects.using(db).bulk_create(
+            (Changement(modele=modele, objet_id=pk, branche_id=branche_id) for pk, branche_id in rows.iterator()),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gestion", "0007_horodatage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Changement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("modele", models.CharField(max_length=20)),
+                ("objet_id", models.BigIntegerField()),
+                ("branche_id", models.BigIntegerField()),
+                ("supprime", models.BooleanField(default=False)),
+                ("date", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["branche_id", "id"], name="changement_branche_seq_idx"),
+                    models.Index(fields=["modele", "objet_id"], name="changement_objet_idx"),
+                ],
+            },
+        ),
+        migrations.RunPython(journal_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+import gestion.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gestion", "0008_changement"),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name="utilisateur",
+            managers=[
+                ("objects", gestion.models.UtilisateurManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gestion", "0009_utilisateur_manager"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(fields=["branche", "updated_at"], name="client_branche_maj_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="assurance",
+            index=models.Index(fields=["branche", "updated_at"], name="assurance_branche_maj_idx"),
+        ),
+    ]
@@ -1,18 +1,74 @@
-from django.db import models
+from django.db import models, transaction
 # On importe AbstractUser pour créer un modèle utilisateur personnalisé
 # AbstractUser contient déjà username, email, password et d'autres champs utiles
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
+
+# --------- FILTRAGE PAR BRANCHE ---------
+class BrancheScopedQuerySet(models.QuerySet):
+    """
+    QuerySet qui sait se restreindre à la branche d'un utilisateur.
+    Le filtre est appliqué en SQL (WHERE branche_id = ...), servi par un index
+    qui commence par la branche : une page ne lit que les lignes de la branche.
+    """
+
+    # Chemin vers l'id de la branche depuis le modèle ('branche_id' ou 'pk' pour Branche)
+    branche_lookup = 'branche_id'
+
+    def for_user(self, user):
+        """
+        - SuperAdmin (ou superuser Django) : toutes les branches
+        - BranchAdmin / Agent : uniquement sa branche
+        - utilisateur anonyme ou sans branche : aucune ligne
+        """
+        if not getattr(user, 'is_authenticated', False):
+            return self.none()
+        if user.is_superuser or user.is_super_admin():
+            return self
+        if user.branch_id is None:
+            return self.none()
+        return self.filter(**{self.branche_lookup: user.branch_id})
+
+
+# --------- SUPPRESSIONS GROUPÉES ---------
+class GroupedDeleteMixin:
+    """
+    Pour les modèles et QuerySets journalisés : les post_delete d'un delete() (cascades
+    comprises) sont traités par lot à la fin (voir signals.grouped_deletes).
+    Suppression et traitement dans la même transaction : si le journal échoue, rien
+    n'est supprimé (sinon les clients synchronisés ne verraient jamais la suppression).
+    """
+
+    def delete(self, *args, **kwargs):
+        # Import local : signals importe ce module
+        from .signals import grouped_deletes
+        with transaction.atomic(), grouped_deletes():
+            return super().delete(*args, **kwargs)
+
+
+class GroupedDeleteQuerySet(GroupedDeleteMixin, BrancheScopedQuerySet):
+    pass
+
+
+class BrancheQuerySet(GroupedDeleteQuerySet):
+    branche_lookup = 'pk'
+
 
 # --------- MODÈLE BRANCHE ---------
-class Branche(models.Model):
+class Branche(GroupedDeleteMixin, models.Model):
     """
     Modèle représentant une branche/succursale de l'assurance.
     """
     nom = models.CharField(max_length=100)
     ville = models.CharField(max_length=100)
+    # Horodatage : validateurs HTTP (ETag / Last-Modified) de l'API
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = BrancheQuerySet.as_manager()
+
     def __str__(self): return self.nom
 
-class Client(models.Model):
+class Client(GroupedDeleteMixin, models.Model):
     nom = models.CharField(max_length=100)
     prenom = models.CharField(max_length=100)
     adresse = models.TextField()
@@ -20,19 +76,130 @@ class Client(models.Model):
     telephone = models.CharField(max_length=20)
     branche = models.ForeignKey(Branche, on_delete=models.CASCADE)
     date_inscription = models.DateField()
+    # Horodatage : validateurs HTTP (ETag / Last-Modified) de l'API
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Client.objects.for_user(user) : clients de la branche de l'utilisateur
+    objects = GroupedDeleteQuerySet.as_manager()
+
+    class Meta:
+        # Index adaptés aux recherches réelles (voir la commande benchmark_indexes)
+        indexes = [
+            # Liste des clients d'une branche, triée par nom (filtrage par branche)
+            models.Index(fields=['branche', 'nom'], name='client_branche_nom_idx'),
+            # Tri des listes par nom puis prénom
+            models.Index(fields=['nom', 'prenom'], name='client_nom_prenom_idx'),
+            # Recherche d'un client par email ou par téléphone
+            models.Index(fields=['email'], name='client_email_idx'),
+            models.Index(fields=['telephone'], name='client_telephone_idx'),
+            # MAX(updated_at) / COUNT(*) d'une branche (ETag des listes de l'API, voir conditional.py)
+            models.Index(fields=['branche', 'updated_at'], name='client_branche_maj_idx'),
+        ]
+
     def __str__(self): return f"{self.nom} {self.prenom}"
 
-class Assurance(models.Model):
+class Assurance(GroupedDeleteMixin, models.Model):
     type_assurance = models.CharField(max_length=100)
     date_debut = models.DateField()
     date_fin = models.DateField()
     montant = models.DecimalField(max_digits=10, decimal_places=2)
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
     branche = models.ForeignKey(Branche, on_delete=models.CASCADE)
+    # Horodatage : validateurs HTTP (ETag / Last-Modified) de l'API
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Assurance.objects.for_user(user) : contrats de la branche de l'utilisateur
+    objects = GroupedDeleteQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Contrats d'une branche qui expirent dans une période donnée.
+            # montant en dernier : l'index "couvre" aussi les totaux par branche/période
+            # (SQLite répond sans lire la table).
+            models.Index(fields=['branche', 'date_fin', 'montant'], name='assurance_branche_fin_idx'),
+            # Tri par date de fin (pagination keyset de la liste des assurances)
+            models.Index(fields=['date_fin'], name='assurance_date_fin_idx'),
+            # MAX(updated_at) / COUNT(*) d'une branche (ETag des listes de l'API, voir conditional.py)
+            models.Index(fields=['branche', 'updated_at'], name='assurance_branche_maj_idx'),
+        ]
+
     def __str__(self): return f"{self.type_assurance} pour {self.client}"
 
 
+# --------- STATISTIQUES DU TABLEAU DE BORD ---------
+class StatistiqueBranche(models.Model):
+    """
+    Chiffres du tableau de bord pour une branche et une période (le mois).
+    Tenus à jour de façon incrémentale par les signaux de Client / Assurance
+    (voir dashboard.py et signals.py) : la page d'accueil lit une ligne par branche
+    au lieu de refaire des GROUP BY sur les tables de contrats et de clients.
+    """
+    branche = models.ForeignKey(Branche, on_delete=models.CASCADE, related_name='statistiques')
+    # Premier jour du mois concerné
+    periode = models.DateField()
+    contrats_actifs = models.PositiveIntegerField(default=0)
+    montant_actif = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    nouveaux_clients = models.PositiveIntegerField(default=0)
+    # Contrats actifs expirant sous 7, 30 et 90 jours (liste des échéances)
+    contrats_expirant_7j = models.PositiveIntegerField(default=0)
+    contrats_expirant_30j = models.PositiveIntegerField(default=0)
+    contrats_expirant_90j = models.PositiveIntegerField(default=0)
+    # Jour de référence des chiffres qui dépendent de la date (contrats actifs, expirant) ;
+    # NULL = à recalculer
+    calcule_le = models.DateField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['branche', 'periode'], name='statistique_branche_periode_uniq'),
+        ]
+
+    def __str__(self): return f"{self.branche} - {self.periode:%m/%Y}"
+
+
+# --------- JOURNAL DE SYNCHRONISATION ---------
+class Changement(models.Model):
+    """
+    Journal des modifications pour la synchronisation des agents hors ligne (voir sync.py).
+    Une ligne par objet et par branche : sa dernière création / modification, ou sa suppression
+    (supprime=True, "tombstone"). L'id, auto-incrémenté, sert de séquence monotone :
+    un nouvel enregistrement remplace l'ancienne ligne par une ligne d'id plus grand.
+    """
+    # 'branche', 'client' ou 'assurance'
+    modele = models.CharField(max_length=20)
+    objet_id = models.BigIntegerField()
+    # Pas de clé étrangère : les tombstones survivent à la suppression de la branche
+    branche_id = models.BigIntegerField()
+    supprime = models.BooleanField(default=False)
+    date = models.DateTimeField(auto_now=True)
+
+    # Changement.objects.for_user(user) : journal de la branche de l'utilisateur
+    objects = BrancheScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Lecture du journal d'une branche à partir d'un jeton (id > jeton)
+            models.Index(fields=['branche_id', 'id'], name='changement_branche_seq_idx'),
+            # Remplacement de la ligne précédente d'un objet
+            models.Index(fields=['modele', 'objet_id'], name='changement_objet_idx'),
+        ]
+
+    def __str__(self):
+        action = "suppression" if self.supprime else "modification"
+        return f"#{self.pk} {action} {self.modele} {self.objet_id}"
+
+
 # --------- MODÈLE UTILISATEUR PERSONNALISÉ ---------
+class UtilisateurQuerySet(BrancheScopedQuerySet):
+    branche_lookup = 'branch_id'
+
+
+# Garde create_user / create_superuser, avec for_user() : employés de la branche
+class UtilisateurManager(UserManager.from_queryset(UtilisateurQuerySet)):
+    pass
+
+
 class Utilisateur(AbstractUser):
     
     # Choix pour le champ role (liste de tuples)
@@ -62,6 +229,9 @@ class Utilisateur(AbstractUser):
         blank=True,
         help_text="Branche assignée à l'utilisateur (optionnel pour SuperAdmin)"
     )
+
+    # Utilisateur.objects.for_user(user) : employés de la branche de l'utilisateur
+    objects = UtilisateurManager()
     
     # Méthode __str__ pour l'affichage dans l'admin et les templates
     def __str__(self):
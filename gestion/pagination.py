@@ -0,0 +1,257 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+# --------- PAGINATION PAR CURSEUR (KEYSET) POUR LES VUES WEB ---------
+# La pagination classique (?page=N) exécute un COUNT(*) puis un OFFSET :
+# plus la page est lointaine, plus la base doit parcourir de lignes.
+# La pagination "keyset" repart de la dernière ligne affichée :
+#   WHERE (cle, id) > (derniere_cle, dernier_id) ORDER BY cle, id LIMIT n
+# Le coût d'une page ne dépend plus de sa position, et aucun COUNT n'est fait.
+
+
+class InvalidCursor(Exception):
+    """Levée quand le curseur reçu dans l'URL ne peut pas être décodé."""
+
+
+def encode_cursor(value, pk, reverse=False):
+    """
+    Encode une position (valeur de la clé de tri + id) en chaîne opaque pour l'URL.
+    `reverse` indique qu'il faut lire les lignes *avant* cette position.
+    """
+    payload = {"v": value, "pk": pk}
+    if reverse:
+        payload["r"] = 1
+    raw = json.dumps(payload, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Décode un curseur produit par encode_cursor().
+    Renvoie un tuple (valeur, pk, reverse).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return payload["v"], int(payload["pk"]), bool(payload.get("r"))
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+
+
+class KeysetPage:
+    """
+    Une page de résultats en mode keyset.
+    Expose la même interface minimale que django.core.paginator.Page
+    (object_list, has_next, has_previous) et les curseurs voisins.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginateur keyset : cherche sur le couple (champ de tri, pk).
+    `ordering` est le nom du champ, préfixé par '-' pour un tri décroissant.
+    Le pk sert de départage pour que l'ordre soit stable même si
+    plusieurs lignes ont la même valeur de tri.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.descending = ordering.startswith("-")
+        self.field = ordering.lstrip("-")
+
+    def _order(self, descending):
+        prefix = "-" if descending else ""
+        return (prefix + self.field, prefix + "pk")
+
+    def _seek(self, value, pk, after):
+        """
+        Filtre les lignes situées après (ou avant) la position (value, pk).
+        """
+        op = "gt" if after else "lt"
+        return Q(**{f"{self.field}__{op}": value}) | Q(**{self.field: value, f"pk__{op}": pk})
+
+    def _position(self, obj):
+        return getattr(obj, self.field), obj.pk
+
+    def _page_queryset(self, cursor):
+        """
+        Renvoie (queryset limité à per_page + 1 lignes, reverse) pour le curseur.
+        """
+        reverse = False
+        queryset = self.queryset
+        if cursor:
+            value, pk, reverse = decode_cursor(cursor)
+            # En mode inverse on remonte le tri : "après" devient "avant"
+            after = self.descending == reverse
+            queryset = queryset.filter(self._seek(value, pk, after))
+
+        queryset = queryset.order_by(*self._order(self.descending != reverse))
+        return queryset[: self.per_page + 1], reverse
+
+    def page(self, cursor=None):
+        """
+        Renvoie la KeysetPage correspondant au curseur (None = première page).
+        Lit per_page + 1 lignes pour savoir s'il existe une page suivante.
+        """
+        queryset, reverse = self._page_queryset(cursor)
+        return self._build_page(list(queryset), cursor, reverse)
+
+    async def apage(self, cursor=None):
+        """Version asynchrone de page() (ORM asynchrone, vues async)."""
+        queryset, reverse = self._page_queryset(cursor)
+        return self._build_page([obj async for obj in queryset], cursor, reverse)
+
+    def _build_page(self, rows, cursor, reverse):
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if reverse:
+            rows.reverse()
+            # On arrive depuis la page suivante : elle existe forcément
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(*self._position(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor(*self._position(rows[0]), reverse=True)
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+class KeysetPaginationMixin:
+    """
+    Mixin pour les ListView : ajoute un mode de pagination keyset, optionnel.
+
+    - `keyset_ordering` : champ de tri (ex. 'nom' ou '-date_fin'), complété par le pk.
+    - `pagination_mode` : 'offset' (classique) ou 'keyset'. Par défaut on lit
+      settings.LIST_PAGINATION_MODE ('offset' si absent).
+    - Une requête avec ?pagination=keyset ou ?cursor=... passe en mode keyset.
+    """
+
+    keyset_ordering = "pk"
+    pagination_mode = None
+
+    def get_ordering(self):
+        # Tri stable dans les deux modes : (champ, pk)
+        prefix = "-" if self.keyset_ordering.startswith("-") else ""
+        field = self.keyset_ordering.lstrip("-")
+        if field == "pk":
+            return (prefix + "pk",)
+        return (prefix + field, prefix + "pk")
+
+    def use_keyset(self):
+        params = self.request.GET
+        if "cursor" in params:
+            return True
+        mode = params.get("pagination") or self.pagination_mode or getattr(
+            settings, "LIST_PAGINATION_MODE", "offset"
+        )
+        return mode == "keyset"
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        try:
+            page = paginator.page(self.request.GET.get("cursor"))
+        except InvalidCursor:
+            raise Http404("Curseur de pagination invalide.")
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["keyset_pagination"] = self.use_keyset()
+        # Paramètres de l'URL à conserver dans les liens de pagination (filtres, recherche...)
+        params = self.request.GET.copy()
+        for key in ("page", "cursor"):
+            params.pop(key, None)
+        if context["keyset_pagination"]:
+            params["pagination"] = "keyset"
+        query = params.urlencode()
+        context["pagination_query"] = f"{query}&" if query else ""
+        return context
+
+
+# --------- PAGINATION DE L'API REST ---------
+# Sans pagination, /api/clients/ sérialiserait toute la table en une réponse.
+# Par défaut l'API pagine par curseur sur l'id (index de la clé primaire) :
+# pas de COUNT(*), pas d'OFFSET, et une taille de page bornée.
+
+API_MAX_PAGE_SIZE = getattr(settings, "API_MAX_PAGE_SIZE", 500)
+
+
+class ApiCursorPagination(CursorPagination):
+    """
+    Pagination par défaut de l'API (voir REST_FRAMEWORK dans settings.py).
+    ?page_size=N permet de choisir la taille, plafonnée à API_MAX_PAGE_SIZE.
+    """
+
+    ordering = "id"
+    page_size_query_param = "page_size"
+    max_page_size = API_MAX_PAGE_SIZE
+
+
+class ExpiringCursorPagination(ApiCursorPagination):
+    """
+    Pagination de la liste des échéances : par date de fin puis id,
+    dans l'ordre de l'index (branche, date_fin).
+    """
+
+    ordering = ("date_fin", "id")
+
+
+class ApiOffsetPagination(LimitOffsetPagination):
+    """
+    Pagination classique ?limit=&offset=, sur demande (?pagination=offset).
+    Renvoie le nombre total de lignes (COUNT), donc plus coûteuse.
+    """
+
+    max_limit = API_MAX_PAGE_SIZE
+
+
+class OptionalOffsetPaginationMixin:
+    """
+    Mixin pour les ViewSets : garde la pagination par curseur par défaut,
+    mais permet au client de demander la pagination par offset
+    avec le paramètre ?pagination=offset.
+    """
+
+    offset_pagination_class = ApiOffsetPagination
+
+    def use_offset_pagination(self):
+        return self.request.query_params.get("pagination") == "offset"
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator") and self.request is not None:
+            if self.use_offset_pagination():
+                self._paginator = self.offset_pagination_class()
+        return super().paginator
@@ -0,0 +1,181 @@
+import contextlib
+import contextvars
+import cProfile
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+
+# --------- PROFILAGE DES REQUÊTES (désactivé par défaut) ---------
+# Avec PROFILING_ENABLED = True, chaque réponse porte un en-tête Server-Timing
+# (visible dans l'onglet Réseau / Timing du navigateur) :
+#   view;desc="client_list", total;dur=41.2, db;dur=6.3;desc="12 requêtes",
+#   tpl;dur=22.8, app;dur=12.1
+# - db : requêtes SQL (toutes les bases) ; tpl : rendu des templates (base.html et
+#   les includes comptent dans la page qui les inclut) ; app : le reste (vue,
+#   formulaires, sérialisation DRF, middlewares).
+# Profils cProfile (fichiers .prof, à ouvrir avec snakeviz ou pstats) écrits dans PROFILING_DIR :
+# - pour une part PROFILING_SAMPLE_RATE des requêtes (0.01 = 1 %) ;
+# - pour les requêtes plus lentes que PROFILING_SLOW_MS : il faut alors profiler toutes
+#   les requêtes (cProfile ralentit le code Python) et ne garder que les lentes.
+# Seuls les PROFILING_MAX_FILES profils les plus récents sont gardés.
+# Depuis Python 3.12, un seul profileur peut être actif à la fois dans le processus :
+# une requête concurrente (serveur multi-thread, ASGI) n'est pas profilée, mais garde
+# son en-tête Server-Timing.
+# Le middleware est synchrone : sous ASGI, les vues async sont mesurées via l'adaptateur.
+
+PROFILING_ENABLED = getattr(settings, "PROFILING_ENABLED", False)
+PROFILING_SAMPLE_RATE = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+PROFILING_SLOW_MS = getattr(settings, "PROFILING_SLOW_MS", None)
+PROFILING_DIR = Path(getattr(settings, "PROFILING_DIR", Path(settings.BASE_DIR) / "profiles"))
+PROFILING_MAX_FILES = getattr(settings, "PROFILING_MAX_FILES", 50)
+
+# Mesures de la requête en cours (RequestTimings), ou None
+_current = contextvars.ContextVar("gestion_profiling", default=None)
+
+
+class QueryRecorder:
+    """Execute wrapper : compte les requêtes SQL et cumule leur durée."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+    @contextlib.contextmanager
+    def record(self):
+        """Installe l'enregistreur sur toutes les connexions du thread, le temps du bloc."""
+        with contextlib.ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = QueryRecorder()
+        self.template = 0.0
+        self.template_depth = 0
+
+
+# --- Temps de rendu des templates ---
+
+_original_render = DjangoTemplate.render
+
+
+def _timed_render(self, context=None, request=None):
+    timings = _current.get()
+    if timings is None or timings.template_depth:
+        # Hors profilage, ou template rendu à l'intérieur d'un autre (widgets de formulaire)
+        return _original_render(self, context, request)
+    timings.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        timings.template += time.perf_counter() - start
+        timings.template_depth -= 1
+
+
+def server_timing(view_name, total, timings):
+    db = timings.queries.duration
+    app = max(total - db - timings.template, 0.0)
+    parts = [
+        f'view;desc="{view_name}"',
+        f"total;dur={total * 1000:.1f}",
+        f'db;dur={db * 1000:.1f};desc="{timings.queries.count} requêtes"',
+        f"tpl;dur={timings.template * 1000:.1f}",
+        f"app;dur={app * 1000:.1f}",
+    ]
+    return ", ".join(parts)
+
+
+# --- Profils cProfile ---
+
+# Tenu par la requête dont le profileur est actif (un seul à la fois, voir plus haut)
+_profiler_lock = threading.Lock()
+
+
+def start_profiler():
+    """Profileur démarré, ou None si un autre profileur est déjà actif."""
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # "Another profiling tool is already active" : débogueur, coverage, autre profileur
+        _profiler_lock.release()
+        return None
+    return profiler
+
+
+def stop_profiler(profiler):
+    profiler.disable()
+    _profiler_lock.release()
+
+
+def dump_profile(profiler, view_name, total):
+    """Écrit le profil et supprime les plus anciens au-delà de PROFILING_MAX_FILES."""
+    PROFILING_DIR.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", view_name) or "vue"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = PROFILING_DIR / f"{stamp}-{time.time_ns() % 10**9:09d}-{slug}-{total * 1000:.0f}ms.prof"
+    profiler.dump_stats(path)
+    profiles = sorted(PROFILING_DIR.glob("*.prof"), key=lambda p: p.stat().st_mtime)
+    for old in profiles[:max(len(profiles) - PROFILING_MAX_FILES, 0)]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+class ProfilingMiddleware:
+    """
+    Mesure chaque requête (voir plus haut). À placer en tête de MIDDLEWARE pour que
+    le total couvre les autres middlewares. Retiré de la chaîne (MiddlewareNotUsed)
+    quand PROFILING_ENABLED est faux : aucun coût.
+    """
+
+    def __init__(self, get_response):
+        if not PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        DjangoTemplate.render = _timed_render
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        sampled = random.random() < PROFILING_SAMPLE_RATE
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with timings.queries.record():
+                profiler = start_profiler() if sampled or PROFILING_SLOW_MS is not None else None
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        stop_profiler(profiler)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+
+        match = request.resolver_match
+        view_name = match.view_name if match else "inconnue"
+        response["Server-Timing"] = server_timing(view_name, total, timings)
+        slow = PROFILING_SLOW_MS is not None and total * 1000 >= PROFILING_SLOW_MS
+        if profiler is not None and (sampled or slow):
+            dump_profile(profiler, view_name, total)
+        return response
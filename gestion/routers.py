@@ -0,0 +1,140 @@
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# --------- ROUTAGE LECTURE / ÉCRITURE (RÉPLIQUE EN LECTURE SEULE) ---------
+# Les lectures (listes, exports, agrégats du tableau de bord, recherche...) partent vers
+# l'alias DATABASE_READ_REPLICA, les écritures vers "default". En local, la réplique est
+# le même fichier SQLite ouvert en lecture seule (URI mode=ro, voir settings.py) ;
+# en production ce peut être une copie tenue à jour (Litestream, LiteFS...).
+# Lire ses propres écritures : une réplique peut avoir du retard, donc les lectures
+# restent sur "default"
+# - dans une transaction ouverte sur "default" ;
+# - pendant une requête non sûre (POST, PUT, PATCH, DELETE) ou après une écriture
+#   dans la requête ;
+# - pendant REPLICA_PIN_SECONDS après une requête qui a écrit (cookie posé par
+#   ReadYourWritesMiddleware) : la page affichée après une redirection voit la modification.
+# Une réplique qui pointe sur la même base que "default" (miroir de test) n'est pas utilisée.
+# Utilisateurs et sessions sont toujours lus sur "default" : ils sont mis en cache et
+# invalidés par les écritures (backends.py, SESSION_ENGINE cached_db). Relus sur une
+# réplique en retard, un ancien hash de mot de passe ou une session supprimée
+# reviendraient dans le cache jusqu'à expiration.
+
+READ_REPLICA_ALIAS = getattr(settings, "DATABASE_READ_REPLICA", None)
+REPLICA_PIN_SECONDS = getattr(settings, "REPLICA_PIN_SECONDS", 5)
+PIN_COOKIE_NAME = "intia_primary"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+# Applications lues uniquement sur "default", en plus du modèle utilisateur (voir plus haut)
+PRIMARY_ONLY_APPS = ("auth", "sessions")
+
+# État de la requête en cours : {"pinned": bool, "written": bool}, ou None hors requête.
+# Un dict (muable) : les écritures faites dans un thread (sync_to_async) restent visibles.
+_request_state = contextvars.ContextVar("gestion_request_db_state", default=None)
+
+
+def replica_alias():
+    """Alias de la réplique, ou None si elle n'est pas configurée ou n'est que "default"."""
+    databases = connections.settings
+    if READ_REPLICA_ALIAS not in databases:
+        return None
+    if databases[READ_REPLICA_ALIAS]["NAME"] == databases[DEFAULT_DB_ALIAS]["NAME"]:
+        return None
+    return READ_REPLICA_ALIAS
+
+
+def primary_only(model):
+    """Vrai pour les modèles mis en cache sous invalidation : jamais lus sur la réplique."""
+    return model._meta.app_label in PRIMARY_ONLY_APPS or model._meta.label == settings.AUTH_USER_MODEL
+
+
+def reads_pinned():
+    """Vrai si les lectures doivent aller sur "default" (voir plus haut)."""
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return True
+    state = _request_state.get()
+    return state is not None and (state["pinned"] or state["written"])
+
+
+class PrimaryReplicaRouter:
+    """Routeur (settings.DATABASE_ROUTERS) : lectures sur la réplique, écritures sur "default"."""
+
+    def db_for_read(self, model, **hints):
+        if reads_pinned() or primary_only(model):
+            return DEFAULT_DB_ALIAS
+        return replica_alias() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state["written"] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Même base : un objet lu sur la réplique peut référencer un objet de "default"
+        aliases = {DEFAULT_DB_ALIAS, READ_REPLICA_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplique reçoit le schéma de "default", on n'y migre rien
+        if db == READ_REPLICA_ALIAS:
+            return False
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """
+    Ouvre l'état de routage de chaque requête et pose le cookie PIN_COOKIE_NAME
+    (date d'expiration) après une écriture. À placer avant SessionMiddleware :
+    l'enregistrement de la session compte comme une écriture.
+    Compatible WSGI et ASGI (les vues async ne repassent pas par un thread).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request_state.set(self._initial_state(request))
+        try:
+            response = self.get_response(request)
+            return self._finish(response)
+        finally:
+            _request_state.reset(token)
+
+    async def __acall__(self, request):
+        token = _request_state.set(self._initial_state(request))
+        try:
+            response = await self.get_response(request)
+            return self._finish(response)
+        finally:
+            _request_state.reset(token)
+
+    def _initial_state(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE_NAME, 0))
+        except ValueError:
+            pinned_until = 0
+        pinned = request.method not in SAFE_METHODS or pinned_until > time.time()
+        return {"pinned": pinned, "written": False}
+
+    def _finish(self, response):
+        if _request_state.get()["written"]:
+            response.set_cookie(
+                PIN_COOKIE_NAME, str(time.time() + REPLICA_PIN_SECONDS),
+                max_age=REPLICA_PIN_SECONDS, httponly=True, samesite="Lax",
+            )
+        return response
@@ -0,0 +1,97 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Case, IntegerField, Q, When
+
+
+# --------- RECHERCHE PLEIN TEXTE DES CLIENTS (SQLite FTS5) ---------
+# Un `icontains` sur nom / prénom / email / téléphone / adresse parcourt toute la table
+# à chaque frappe. Sous SQLite on maintient à la place un index plein texte FTS5
+# ("external content" : il ne stocke que l'index, les données restent dans gestion_client).
+# Des triggers SQL le tiennent à jour à chaque INSERT / UPDATE / DELETE sur gestion_client,
+# y compris pour bulk_create, bulk_update et QuerySet.update() qui n'envoient pas de signaux.
+# Table et triggers sont créés par la migration 0003_client_fts. SQLite reconstruit
+# gestion_client pour certains changements de schéma (colonne NOT NULL, changement de
+# type...) et les triggers disparaissent avec l'ancienne table : une migration qui
+# reconstruit la table doit les recréer (voir 0007_horodatage).
+# Sur les autres bases (ou si FTS5 est absent), on se rabat sur une recherche par préfixe.
+
+FTS_TABLE = "gestion_client_fts"
+FTS_COLUMNS = ("nom", "prenom", "email", "telephone", "adresse")
+
+# Nombre maximal de résultats classés renvoyés par une recherche
+SEARCH_MAX_RESULTS = 500
+
+
+def fts_available(connection=None):
+    """
+    Renvoie True si la base est SQLite et que l'index FTS5 des clients existe.
+    Le résultat est mémorisé sur la connexion.
+    """
+    connection = connection or connections[DEFAULT_DB_ALIAS]
+    if connection.vendor != "sqlite":
+        return False
+    cached = getattr(connection, "_client_fts_available", None)
+    if cached is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            cached = cursor.fetchone() is not None
+        connection._client_fts_available = cached
+    return cached
+
+
+def search_terms(text):
+    """
+    Découpe la saisie en mots (lettres et chiffres uniquement).
+    La ponctuation est ignorée : l'utilisateur ne peut pas injecter de syntaxe FTS5.
+    """
+    return re.findall(r"\w+", text or "")
+
+
+def build_match_query(text):
+    """
+    Transforme la saisie en requête FTS5 : chaque mot est cherché par préfixe
+    ("dup" trouve "Dupont"), et tous les mots doivent être présents.
+    """
+    return " ".join(f'"{term}"*' for term in search_terms(text))
+
+
+def search_clients(queryset, text, limit=SEARCH_MAX_RESULTS):
+    """
+    Filtre `queryset` sur la recherche `text` et le trie par pertinence.
+    Avec FTS5 : une requête sur l'index (classement bm25, limité à `limit` résultats),
+    puis la requête principale filtrée sur ces ids.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+
+    connection = connections[queryset.db]
+    if not fts_available(connection):
+        # Repli : recherche par préfixe sur les colonnes courtes (nom, prénom, email, téléphone)
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(nom__istartswith=term) | Q(prenom__istartswith=term)
+                | Q(email__istartswith=term) | Q(telephone__startswith=term)
+            )
+        return queryset.filter(condition).order_by("nom", "prenom", "pk")
+
+    sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+    params = [build_match_query(text)]
+    if queryset.query.where:
+        # Queryset déjà filtré (ex. par branche) : le filtre est appliqué dans l'index,
+        # avant la limite, pour ne pas perdre les résultats de la branche
+        scope_sql, scope_params = queryset.order_by().values("pk").query.sql_with_params()
+        sql += f" AND rowid IN ({scope_sql})"
+        params.extend(scope_params)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} ORDER BY rank LIMIT %s", [*params, limit])
+        ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        return queryset.none()
+    ranking = Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ids).order_by(ranking)
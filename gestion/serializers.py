@@ -2,13 +2,16 @@ from rest_framework import serializers
 
 # On importe les modèles que l'on veut exposer via l'API
 from .models import Client, Assurance, Branche
+from .fieldsets import SparseFieldsetSerializerMixin
 
 
 # Un "serializer" transforme un objet Python/Django
 # (par ex. un modèle) en données JSON, et inversement.
+# SparseFieldsetSerializerMixin : l'API peut ne servir qu'une partie des champs
+# (?fields= / ?omit=, voir fieldsets.py).
 
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer pour le modèle Client.
     ModelSerializer permet de générer automatiquement
@@ -22,7 +25,7 @@ class ClientSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class AssuranceSerializer(serializers.ModelSerializer):
+class AssuranceSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer pour le modèle Assurance.
     Utilisé dans les vues API (ViewSet) pour créer/lire/modifier/supprimer
@@ -34,7 +37,7 @@ class AssuranceSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class BrancheSerializer(serializers.ModelSerializer):
+class BrancheSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer pour le modèle Branche.
     Permet d'exposer les branches de l'assurance via l'API REST.
@@ -0,0 +1,248 @@
+import contextlib
+import contextvars
+
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import backends, caching, dashboard, sync
+from .models import Branche, Client, Assurance, Utilisateur
+
+
+# --------- SIGNAUX DE L'APPLICATION ---------
+# Connectés dans GestionConfig.ready().
+
+# Envoyé par les écritures en masse (import, API bulk) après bulk_create / bulk_update,
+# qui n'envoient pas post_save. Arguments : sender (le modèle), instances et created
+# (True pour bulk_create).
+# Les instances modifiées gardent leur instantané d'avant la modification.
+bulk_saved = Signal()
+
+# Envoyé à la fin d'un bloc grouped_deletes(), une fois par modèle, à la place des
+# post_delete de chaque objet supprimé. Arguments : sender (le modèle) et instances
+# (objets supprimés, clé primaire encore renseignée comme pour post_delete).
+bulk_deleted = Signal()
+
+
+# --- Suppressions groupées ---
+# Une suppression en masse (API bulk, branche supprimée avec ses clients et contrats en
+# cascade) envoie un post_delete par objet : journal de synchronisation et tableau de bord
+# coûtaient alors plusieurs requêtes par ligne supprimée. Dans grouped_deletes(), les
+# post_delete de Branche / Client / Assurance sont seulement notés ; bulk_deleted est
+# envoyé à la fin du bloc, et ses receivers écrivent en quelques requêtes par lot.
+# Model.delete() et QuerySet.delete() de ces modèles ouvrent ce bloc (models.py).
+
+_GROUPED_MODELS = (Branche, Client, Assurance)
+# Objets supprimés du bloc en cours, par modèle, ou None hors bloc
+_grouped_deletes = contextvars.ContextVar("gestion_grouped_deletes", default=None)
+
+
+@contextlib.contextmanager
+def grouped_deletes():
+    if _grouped_deletes.get() is not None:
+        # Bloc imbriqué : les objets rejoignent le bloc englobant
+        yield
+        return
+    deleted = {}
+    token = _grouped_deletes.set(deleted)
+    try:
+        yield
+    finally:
+        _grouped_deletes.reset(token)
+    # Ordre de suppression (contrats, puis clients, puis branches en cascade)
+    for model, pairs in deleted.items():
+        # Le Collector remet pk à None après la suppression : clé primaire rendue aux
+        # receivers comme pour post_delete, le temps de l'envoi
+        instances = [instance for instance, _ in pairs]
+        for instance, pk in pairs:
+            instance.pk = pk
+        try:
+            bulk_deleted.send(sender=model, instances=instances)
+        finally:
+            for instance in instances:
+                instance.pk = None
+
+
+@receiver(post_delete, sender=Branche)
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Assurance)
+def collect_grouped_delete(sender, instance, **kwargs):
+    deleted = _grouped_deletes.get()
+    if deleted is not None:
+        deleted.setdefault(sender, []).append((instance, instance.pk))
+
+
+def _grouped(sender):
+    """Vrai si le post_delete de `sender` sera traité par bulk_deleted."""
+    return sender in _GROUPED_MODELS and _grouped_deletes.get() is not None
+
+
+# --- Instantané de l'état enregistré ---
+# Pris au chargement de chaque objet (post_init) et rafraîchi après chaque save
+# (dernier receiver du module) : les receivers comparent l'ancien et le nouvel état
+# sans relire la base.
+
+_SNAPSHOTS = {
+    Assurance: (dashboard.contract_snapshot, dashboard.contract_figures),
+    Client: (dashboard.client_snapshot, dashboard.client_figures),
+}
+
+
+@receiver(post_init, sender=Assurance)
+@receiver(post_init, sender=Client)
+def remember_saved_state(sender, instance, **kwargs):
+    snapshot, _ = _SNAPSHOTS[sender]
+    instance._saved_snapshot = snapshot(instance) if instance.pk is not None else None
+
+
+def _previous_branche_ids(instance):
+    """Branches de l'objet avant et après la modification."""
+    if isinstance(instance, Branche):
+        return {instance.pk}
+    ids = {instance.branche_id}
+    old = getattr(instance, "_saved_snapshot", None)
+    if old is not None:
+        ids.add(old[0])
+    return ids
+
+
+# --- Tableau de bord (voir dashboard.py) ---
+
+@receiver(post_save, sender=Assurance)
+@receiver(post_save, sender=Client)
+def update_dashboard_on_save(sender, instance, created, **kwargs):
+    snapshot, figures = _SNAPSHOTS[sender]
+    old = None if created else instance._saved_snapshot
+    new = snapshot(instance)
+    if new is None or (old is None and not created):
+        # Objet chargé partiellement : on ne connaît pas l'état précédent
+        dashboard.mark_stale()
+    else:
+        dashboard.apply_change(figures, old, new)
+
+
+@receiver(post_delete, sender=Assurance)
+@receiver(post_delete, sender=Client)
+def update_dashboard_on_delete(sender, instance, **kwargs):
+    if _grouped(sender):
+        return
+    update_dashboard_on_bulk_delete(sender, [instance])
+
+
+@receiver(bulk_deleted, sender=Assurance)
+@receiver(bulk_deleted, sender=Client)
+def update_dashboard_on_bulk_delete(sender, instances, **kwargs):
+    # Deltas additionnés par branche : une requête par branche, pas par objet
+    snapshot, figures = _SNAPSHOTS[sender]
+    changes, unknown = [], set()
+    for instance in instances:
+        old = instance._saved_snapshot or snapshot(instance)
+        if old is None:
+            unknown.add(instance.__dict__.get("branche_id"))
+        else:
+            changes.append((old, None))
+    dashboard.apply_changes(figures, changes)
+    if unknown:
+        # Objet chargé partiellement : état inconnu, branche inconnue si None
+        dashboard.mark_stale(None if None in unknown else unknown)
+
+
+@receiver(bulk_saved, sender=Assurance)
+@receiver(bulk_saved, sender=Client)
+def update_dashboard_on_bulk_save(sender, instances, **kwargs):
+    branche_ids = set()
+    for instance in instances:
+        branche_ids |= _previous_branche_ids(instance)
+    dashboard.mark_stale(branche_ids)
+
+
+# --- Cache des listes (voir caching.py) ---
+# Un objet déplacé vers une autre branche change aussi la liste de l'ancienne branche.
+
+@receiver(post_save, sender=Branche)
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Assurance)
+@receiver(post_delete, sender=Branche)
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Assurance)
+def invalidate_list_cache(sender, instance, signal, **kwargs):
+    if signal is post_delete and _grouped(sender):
+        return
+    caching.invalidate(sender._meta.model_name, _previous_branche_ids(instance))
+
+
+@receiver(bulk_saved, sender=Branche)
+@receiver(bulk_saved, sender=Client)
+@receiver(bulk_saved, sender=Assurance)
+@receiver(bulk_deleted, sender=Branche)
+@receiver(bulk_deleted, sender=Client)
+@receiver(bulk_deleted, sender=Assurance)
+def invalidate_list_cache_on_bulk_change(sender, instances, **kwargs):
+    branche_ids = set()
+    for instance in instances:
+        branche_ids |= _previous_branche_ids(instance)
+    caching.invalidate(sender._meta.model_name, branche_ids)
+
+
+# --- Journal de synchronisation (voir sync.py) ---
+
+@receiver(post_save, sender=Branche)
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Assurance)
+def journal_save(sender, instance, created, **kwargs):
+    sync.record_saved(sender, [instance], created)
+
+
+@receiver(bulk_saved, sender=Branche)
+@receiver(bulk_saved, sender=Client)
+@receiver(bulk_saved, sender=Assurance)
+def journal_bulk_save(sender, instances, created=False, **kwargs):
+    sync.record_saved(sender, instances, created)
+
+
+@receiver(post_delete, sender=Branche)
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Assurance)
+def journal_delete(sender, instance, **kwargs):
+    if _grouped(sender):
+        return
+    sync.record_deleted(sender, [instance])
+
+
+@receiver(bulk_deleted, sender=Branche)
+@receiver(bulk_deleted, sender=Client)
+@receiver(bulk_deleted, sender=Assurance)
+def journal_bulk_delete(sender, instances, **kwargs):
+    sync.record_deleted(sender, instances)
+
+
+# --- Cache des utilisateurs connectés (voir backends.py) ---
+
+@receiver(post_save, sender=Utilisateur)
+@receiver(post_delete, sender=Utilisateur)
+def invalidate_cached_user(sender, instance, **kwargs):
+    backends.invalidate_users([instance.pk])
+
+
+@receiver(post_save, sender=Branche)
+@receiver(pre_delete, sender=Branche)
+def invalidate_cached_branch_users(sender, instance, created=False, **kwargs):
+    # La branche est en cache avec ses utilisateurs. À la suppression, leur branche passe
+    # à NULL par un UPDATE sans signal : on les cherche avant (pre_delete)
+    if not created:
+        backends.invalidate_users(Utilisateur.objects.filter(branch_id=instance.pk).values_list("pk", flat=True))
+
+
+@receiver(bulk_saved, sender=Branche)
+def invalidate_cached_branch_users_on_bulk_save(sender, instances, created=False, **kwargs):
+    if not created:
+        ids = [instance.pk for instance in instances]
+        backends.invalidate_users(Utilisateur.objects.filter(branch_id__in=ids).values_list("pk", flat=True))
+
+
+# --- Fin du save : l'état enregistré devient la référence ---
+
+@receiver(post_save, sender=Assurance)
+@receiver(post_save, sender=Client)
+def refresh_saved_state(sender, instance, **kwargs):
+    snapshot, _ = _SNAPSHOTS[sender]
+    instance._saved_snapshot = snapshot(instance)
@@ -0,0 +1,176 @@
+import contextvars
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from . import database, profiling
+
+
+# --------- JOURNAL DES REQUÊTES LENTES ---------
+# Execute wrapper installé sur chaque connexion : toute requête plus lente que
+# SLOW_QUERY_MS est écrite dans SLOW_QUERY_LOG (une ligne JSON par requête) avec
+# - le SQL normalisé (valeurs remplacées par ?, listes IN repliées) et son empreinte ;
+# - l'appelant : première ligne du projet dans la pile (vue, viewset, commande...) ;
+# - la forme des paramètres (types, jamais les valeurs : données personnelles) ;
+# - la durée, la base, et pour les SELECT le plan SQLite (EXPLAIN QUERY PLAN).
+# Le plan est calculé une fois par requête distincte et par processus, la première
+# fois qu'elle est lente. Un parcours complet (SCAN) d'une table de
+# SLOW_QUERY_SCAN_TABLES est signalé dans "full_scans".
+# Rapport : python manage.py slow_queries --top 20
+# SLOW_QUERY_MS = None désactive le journal. Le fichier est renommé en .1 au-delà
+# de SLOW_QUERY_LOG_MAX_BYTES.
+
+SLOW_QUERY_MS = getattr(settings, "SLOW_QUERY_MS", 200)
+SLOW_QUERY_LOG = Path(getattr(settings, "SLOW_QUERY_LOG", Path(settings.BASE_DIR) / "slow_queries.log"))
+SLOW_QUERY_LOG_MAX_BYTES = getattr(settings, "SLOW_QUERY_LOG_MAX_BYTES", 10 * 1024 * 1024)
+SLOW_QUERY_SCAN_TABLES = tuple(getattr(settings, "SLOW_QUERY_SCAN_TABLES", ("gestion_client", "gestion_assurance")))
+# Nombre maximal de plans gardés en mémoire (requêtes distinctes)
+SLOW_QUERY_MAX_PLANS = 500
+
+# Modules des execute wrappers : ils ne sont jamais "l'appelant" d'une requête
+_WRAPPER_FILES = {__file__, database.__file__, profiling.__file__}
+
+_plans = {}
+_write_lock = threading.Lock()
+# Vrai pendant le EXPLAIN lancé par le journal : il n'est pas lui-même journalisé
+_explaining = contextvars.ContextVar("gestion_slow_query_explaining", default=False)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \(\?(?:, \?)*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"(\((?:\?, )*\?\))(?:, \1)+")
+_SPACES = re.compile(r"\s+")
+_ALIAS = re.compile(r'"(\w+)"(?: AS)? "?([A-Z]\d+)"?\b')
+_SCAN = re.compile(r"^SCAN (?:TABLE )?\"?(\w+)\"?")
+
+
+def normalize_sql(sql):
+    """SQL sans valeurs : deux requêtes qui ne diffèrent que par leurs paramètres sont regroupées."""
+    sql = _SPACES.sub(" ", sql.strip()).replace("%s", "?")
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _VALUES_LIST.sub(r"\1, ...", sql)
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def params_shape(params, many):
+    """'int, str×2' : types des paramètres, sans les valeurs."""
+    if many:
+        return f"executemany ×{len(params)}" if isinstance(params, (list, tuple)) else "executemany"
+    if not params:
+        return ""
+    if isinstance(params, dict):
+        params = list(params.values())
+    groups = []
+    for value in params:
+        name = type(value).__name__
+        if groups and groups[-1][0] == name:
+            groups[-1][1] += 1
+        else:
+            groups.append([name, 1])
+    return ", ".join(name if count == 1 else f"{name}×{count}" for name, count in groups)
+
+
+def call_site():
+    """Première ligne du projet (hors ce module et hors bibliothèques) dans la pile d'appels."""
+    base = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and filename not in _WRAPPER_FILES and "site-packages" not in filename:
+            return f"{os.path.relpath(filename, base)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def full_scans(plan, sql):
+    """Tables de SLOW_QUERY_SCAN_TABLES parcourues entièrement d'après le plan."""
+    aliases = {alias: table for table, alias in _ALIAS.findall(sql)}
+    scans = []
+    for detail in plan:
+        match = _SCAN.match(detail)
+        if match:
+            table = aliases.get(match.group(1), match.group(1))
+            if table in SLOW_QUERY_SCAN_TABLES and table not in scans:
+                scans.append(table)
+    return scans
+
+
+def explain(connection, sql, params, key):
+    """Plan SQLite de la requête (liste des lignes "detail"), calculé une fois par empreinte."""
+    if key in _plans:
+        return _plans[key]
+    if connection.vendor != "sqlite" or not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+    except DatabaseError:
+        plan = None
+    finally:
+        _explaining.reset(token)
+    if len(_plans) < SLOW_QUERY_MAX_PLANS:
+        _plans[key] = plan
+    return plan
+
+
+def write_entry(entry):
+    line = json.dumps(entry, ensure_ascii=False) + "\n"
+    with _write_lock:
+        SLOW_QUERY_LOG.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if SLOW_QUERY_LOG.stat().st_size > SLOW_QUERY_LOG_MAX_BYTES:
+                os.replace(SLOW_QUERY_LOG, SLOW_QUERY_LOG.with_name(SLOW_QUERY_LOG.name + ".1"))
+        except FileNotFoundError:
+            pass
+        with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as stream:
+            stream.write(line)
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """Execute wrapper : journalise la requête si elle dépasse SLOW_QUERY_MS (voir plus haut)."""
+    if _explaining.get():
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - start) * 1000
+    if duration_ms < SLOW_QUERY_MS:
+        return result
+
+    connection = context["connection"]
+    normalized = normalize_sql(sql)
+    key = fingerprint(normalized)
+    plan = None if many else explain(connection, sql, params, key)
+    write_entry({
+        "time": timezone.now().isoformat(timespec="seconds"),
+        "database": connection.alias,
+        "duration_ms": round(duration_ms, 3),
+        "fingerprint": key,
+        "sql": normalized,
+        "params": params_shape(params, many),
+        "caller": call_site(),
+        "plan": plan,
+        "full_scans": full_scans(plan or [], sql),
+    })
+    return result
+
+
+def install_slow_query_log(sender, connection, **kwargs):
+    """Receiver de connection_created : ajoute log_slow_query à la connexion."""
+    if SLOW_QUERY_MS is not None and log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_query)
@@ -0,0 +1,61 @@
+// Autocomplétion des champs AutocompleteSelect (voir gestion/widgets.py).
+// À chaque frappe (avec un délai), on interroge l'endpoint JSON et on affiche
+// au plus quelques propositions ; un clic renseigne le champ caché avec l'id choisi.
+document.addEventListener("DOMContentLoaded", function () {
+    document.querySelectorAll(".autocomplete").forEach(function (container) {
+        var url = container.dataset.autocompleteUrl;
+        var hidden = container.querySelector("input[type=hidden]");
+        var input = container.querySelector(".autocomplete-input");
+        var results = container.querySelector(".autocomplete-results");
+        var timer = null;
+        var controller = null;
+
+        function clear() {
+            results.innerHTML = "";
+        }
+
+        function show(items) {
+            clear();
+            items.forEach(function (item) {
+                var button = document.createElement("button");
+                button.type = "button";
+                button.className = "list-group-item list-group-item-action";
+                button.textContent = item.text;
+                button.addEventListener("click", function () {
+                    hidden.value = item.id;
+                    input.value = item.text;
+                    clear();
+                });
+                results.appendChild(button);
+            });
+        }
+
+        input.addEventListener("input", function () {
+            // Le texte a changé : l'ancienne sélection n'est plus valable
+            hidden.value = "";
+            clearTimeout(timer);
+            var query = input.value.trim();
+            if (!query) {
+                clear();
+                return;
+            }
+            timer = setTimeout(function () {
+                // On annule la requête précédente si elle n'est pas terminée
+                if (controller) {
+                    controller.abort();
+                }
+                controller = new AbortController();
+                fetch(url + "?q=" + encodeURIComponent(query), {signal: controller.signal})
+                    .then(function (response) { return response.json(); })
+                    .then(function (data) { show(data.results); })
+                    .catch(function () {});
+            }, 250);
+        });
+
+        document.addEventListener("click", function (event) {
+            if (!container.contains(event.target)) {
+                clear();
+            }
+        });
+    });
+});
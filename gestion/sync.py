@@ -0,0 +1,135 @@
+from django.conf import settings
+
+from .caching import user_scope
+from .models import Branche, Client, Assurance, Changement
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+from .serializers import ClientSerializer, AssuranceSerializer, BrancheSerializer
+
+
+# --------- SYNCHRONISATION DIFFÉRENTIELLE (agents hors ligne) ---------
+# Au lieu de recharger /api/clients/ et /api/assurances/ en entier, l'application envoie
+# le jeton reçu lors de la synchronisation précédente et ne reçoit que ce qui a changé :
+#   GET /api/sync/?since=<jeton>&limit=500
+# Le journal (modèle Changement) est tenu par les signaux post_save / post_delete / bulk_saved
+# (signals.py). Il ne garde que le dernier changement de chaque objet dans chaque branche :
+# une synchronisation coûte le nombre d'objets modifiés, pas la taille du portefeuille.
+# Un objet déplacé vers une autre branche laisse une suppression dans l'ancienne branche.
+# Les changements sont renvoyés dans l'ordre de la séquence : les appliquer dans cet ordre
+# donne l'état courant. SQLite sérialise les écritures, donc les ids sont attribués
+# dans l'ordre des commits et un jeton ne "saute" jamais un changement.
+
+SYNC_PAGE_SIZE = getattr(settings, "SYNC_PAGE_SIZE", 500)
+SYNC_MAX_PAGE_SIZE = getattr(settings, "API_MAX_PAGE_SIZE", 500)
+
+# Nom dans le journal -> (modèle, serializer)
+SYNC_MODELS = {
+    "branche": (Branche, BrancheSerializer),
+    "client": (Client, ClientSerializer),
+    "assurance": (Assurance, AssuranceSerializer),
+}
+
+
+class ResyncRequired(Exception):
+    """Le jeton ne correspond pas au périmètre de l'utilisateur : resynchronisation complète."""
+
+
+def _branche_id(instance):
+    return instance.pk if isinstance(instance, Branche) else instance.branche_id
+
+
+# --- Écriture du journal ---
+
+def _write(modele, entries, created=False):
+    """
+    Remplace, pour chaque (objet, branche), la ligne précédente du journal par une nouvelle.
+    `entries` : liste de tuples (objet_id, branche_id, supprime), dans l'ordre d'application.
+    Pour des objets qui viennent d'être créés (`created`), il n'y a rien à remplacer.
+    """
+    if not created:
+        by_branche = {}
+        for objet_id, branche_id, _ in entries:
+            by_branche.setdefault(branche_id, set()).add(objet_id)
+        for branche_id, ids in by_branche.items():
+            Changement.objects.filter(modele=modele, branche_id=branche_id, objet_id__in=ids).delete()
+    Changement.objects.bulk_create([
+        Changement(modele=modele, objet_id=objet_id, branche_id=branche_id, supprime=supprime)
+        for objet_id, branche_id, supprime in entries
+    ])
+
+
+def record_saved(model, instances, created=False):
+    """
+    Journalise la création ou la modification des `instances`. Si un objet a changé
+    de branche (instantané pris au chargement), l'ancienne branche reçoit une suppression,
+    écrite avant : elle a une séquence plus petite.
+    """
+    entries = []
+    for instance in instances:
+        branche_id = _branche_id(instance)
+        old = getattr(instance, "_saved_snapshot", None)
+        if old is not None and old[0] not in (None, branche_id):
+            entries.append((instance.pk, old[0], True))
+        entries.append((instance.pk, branche_id, False))
+    if entries:
+        _write(model._meta.model_name, entries, created)
+
+
+def record_deleted(model, instances):
+    """Journalise la suppression des `instances` (une suppression par branche d'origine)."""
+    entries = []
+    for instance in instances:
+        old = getattr(instance, "_saved_snapshot", None)
+        branche_id = old[0] if old is not None else _branche_id(instance)
+        entries.append((instance.pk, branche_id, True))
+    if entries:
+        _write(model._meta.model_name, entries)
+
+
+# --- Lecture ---
+
+def changes_since(user, token=None, limit=SYNC_PAGE_SIZE):
+    """
+    Renvoie (changements, nouveau jeton, has_more) pour les branches visibles par `user`.
+    Chaque changement : {"seq", "type", "id", "action": "upsert" | "delete", "data"}.
+    Lève ResyncRequired si le jeton est illisible ou a été émis pour un autre périmètre
+    (ex. l'agent a changé de branche).
+    """
+    scope = user_scope(user)
+    since = 0
+    if token:
+        try:
+            token_scope, since, _ = decode_cursor(token)
+        except InvalidCursor:
+            raise ResyncRequired()
+        if token_scope != scope:
+            raise ResyncRequired()
+
+    entries = list(
+        Changement.objects.for_user(user).filter(pk__gt=since).order_by("pk")[: limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Une requête par type d'objet modifié, dans le périmètre de l'utilisateur
+    objects = {}
+    for modele, (model, _) in SYNC_MODELS.items():
+        ids = [entry.objet_id for entry in entries if entry.modele == modele and not entry.supprime]
+        if ids:
+            objects[modele] = model.objects.for_user(user).in_bulk(ids)
+
+    changes = []
+    for entry in entries:
+        change = {"seq": entry.pk, "type": entry.modele, "id": entry.objet_id}
+        if entry.supprime:
+            change.update(action="delete", data=None)
+        else:
+            obj = objects.get(entry.modele, {}).get(entry.objet_id)
+            if obj is None:
+                # Supprimé depuis : la suppression suit plus loin dans le journal
+                continue
+            serializer_class = SYNC_MODELS[entry.modele][1]
+            change.update(action="upsert", data=serializer_class(obj).data)
+        changes.append(change)
+
+    last = entries[-1].pk if entries else since
+    return changes, encode_cursor(scope, last), has_more
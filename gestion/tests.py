@@ -1,11 +1,74 @@
-from django.test import TestCase, Client as DjangoClient
+import datetime
+import io
+import json
+from decimal import Decimal
+import os
+import pstats
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, Client as DjangoClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import run_checks
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.db import OperationalError, connection, connections
+from django.db.utils import load_backend
 from django.urls import reverse
+from django.utils import timezone
 
 # On importe les modèles que l'on veut tester
-from .models import Client, Assurance, Branche
+from .models import Client, Assurance, Branche, Changement, StatistiqueBranche, Utilisateur
 
 # On importe les formulaires pour vérifier leur validation
 from .forms import ClientForm, AssuranceForm, BrancheForm
+from .pagination import KeysetPaginator, ApiCursorPagination
+from . import backends, caching, dashboard, database, metrics, profiling, routers, search, slow_queries, sync
+from .importers import AssuranceImporter
+
+
+# --------- OUTILS DE TEST ---------
+# Caches partagés (fichiers) dans un dossier temporaire : les tests ne lisent pas
+# les entrées laissées par le serveur de développement (mêmes pk, autres données)
+_TEST_CACHE_DIR = tempfile.mkdtemp(prefix="intia-cache-")
+override_settings(CACHES={
+    alias: {**config, "LOCATION": os.path.join(_TEST_CACHE_DIR, alias)}
+    if config["BACKEND"].endswith("FileBasedCache") else config
+    for alias, config in settings.CACHES.items()
+}).enable()
+
+
+class QueryBudgetMixin:
+    """
+    Mixin pour les TestCase : vérifie qu'une URL ne dépasse pas
+    un nombre maximal de requêtes SQL (son "budget").
+    Contrairement à assertNumQueries, le budget est une borne supérieure.
+    """
+
+    def assertQueryBudget(self, budget, url, http_client=None):
+        """
+        Appelle l'URL en GET et échoue si plus de `budget` requêtes SQL
+        ont été exécutées. Renvoie la réponse pour d'autres vérifications.
+        """
+        http_client = http_client or self.client_http
+        with CaptureQueriesContext(connection) as ctx:
+            response = http_client.get(url)
+        executed = len(ctx.captured_queries)
+        if executed > budget:
+            details = "\n".join(q["sql"] for q in ctx.captured_queries)
+            self.fail(
+                f"{url} a exécuté {executed} requêtes (budget : {budget}) :\n{details}"
+            )
+        return response
 
 
 # --------- TESTS DES MODÈLES ---------
@@ -154,6 +217,10 @@ class ViewTests(TestCase):
         # Client HTTP de test fourni par Django (simule un navigateur)
         self.client_http = DjangoClient()
 
+        # Les vues de liste sont protégées : on connecte un utilisateur
+        self.user = Utilisateur.objects.create_user(username="agent", password="motdepasse123")
+        self.client_http.force_login(self.user)
+
         # On crée des objets pour que les listes ne soient pas vides
         self.branche = Branche.objects.create(nom="Branche Vue", ville="Ville Vue")
 
@@ -212,3 +279,2044 @@ class ViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Liste des Branches")
 
+
+
+
+# --------- TESTS DU NOMBRE DE REQUÊTES SQL ---------
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Vérifie que les listes exécutent un nombre fixe de requêtes,
+    quel que soit le nombre de lignes affichées (pas de problème N+1).
+    """
+
+    # Budget par URL : session + utilisateur + COUNT de pagination (web)
+    # ou validateur ETag MAX(updated_at) / COUNT (API) + la liste
+    budgets = {
+        "client_list": 4,
+        "assurance_list": 4,
+        "branche_list": 4,
+        "client-list": 4,
+        "assurance-list": 4,
+        "branche-list": 4,
+    }
+
+    def setUp(self):
+        self.client_http = DjangoClient()
+        self.user = Utilisateur.objects.create_user(
+            username="budget", password="motdepasse123", role="SuperAdmin"
+        )
+        self.client_http.force_login(self.user)
+
+        # Plusieurs branches et clients pour qu'un N+1 soit visible
+        for i in range(5):
+            branche = Branche.objects.create(nom=f"Branche {i}", ville="Ville")
+            client = Client.objects.create(
+                nom=f"Nom{i}",
+                prenom="Prenom",
+                adresse="Adresse",
+                email=f"client{i}@example.com",
+                telephone="0102030405",
+                branche=branche,
+                date_inscription="2025-01-01",
+            )
+            Assurance.objects.create(
+                type_assurance="Auto",
+                date_debut="2025-01-01",
+                date_fin="2025-12-31",
+                montant="100.00",
+                client=client,
+                branche=branche,
+            )
+
+    def test_list_views_within_budget(self):
+        """
+        Chaque liste web et API doit respecter son budget de requêtes.
+        """
+        for url_name, budget in self.budgets.items():
+            with self.subTest(url=url_name):
+                response = self.assertQueryBudget(budget, reverse(url_name))
+                self.assertEqual(response.status_code, 200)
+
+    def test_budget_helper_fails_when_exceeded(self):
+        """
+        Le helper doit échouer si le budget est dépassé.
+        """
+        with self.assertRaises(AssertionError):
+            self.assertQueryBudget(1, reverse("assurance_list"))
+
+
+# --------- TESTS DE LA PAGINATION KEYSET ---------
+class KeysetPaginationTests(QueryBudgetMixin, TestCase):
+    """
+    Vérifie la pagination par curseur : parcours complet dans les deux sens,
+    ordre stable avec des valeurs de tri en double, et absence de COUNT(*).
+    """
+
+    def setUp(self):
+        self.client_http = DjangoClient()
+        self.user = Utilisateur.objects.create_user(
+            username="keyset", password="motdepasse123", role="SuperAdmin"
+        )
+        self.client_http.force_login(self.user)
+        # 7 branches dont plusieurs portent le même nom (départage par pk)
+        for nom in ["A", "B", "B", "B", "C", "D", "D"]:
+            Branche.objects.create(nom=nom, ville="Ville")
+
+    def test_forward_and_backward_walk(self):
+        """
+        En avançant puis en reculant page par page, on retrouve toutes les lignes,
+        dans l'ordre (nom, pk), sans doublon.
+        """
+        queryset = Branche.objects.all()
+        paginator = KeysetPaginator(queryset, 3, "nom")
+        expected = list(queryset.order_by("nom", "pk"))
+
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        seen = [obj for page in pages for obj in page]
+        self.assertEqual(seen, expected)
+        self.assertFalse(pages[0].has_previous())
+
+        # Retour en arrière depuis la dernière page
+        page = pages[-1]
+        for previous in reversed(pages[:-1]):
+            page = paginator.page(page.previous_cursor)
+            self.assertEqual(list(page), list(previous))
+
+    def test_descending_ordering(self):
+        """
+        Un tri décroissant ('-nom') parcourt les lignes dans l'ordre inverse.
+        """
+        paginator = KeysetPaginator(Branche.objects.all(), 4, "-nom")
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        expected = list(Branche.objects.order_by("-nom", "-pk"))
+        self.assertEqual(list(first) + list(second), expected)
+
+    def test_list_view_keyset_mode_without_count(self):
+        """
+        En mode keyset, la vue n'exécute aucun COUNT(*) et affiche les liens de curseur.
+        """
+        # Plus de lignes que paginate_by (10) pour avoir une page suivante
+        for i in range(5):
+            Branche.objects.create(nom=f"E{i}", ville="Ville")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client_http.get(reverse("branche_list") + "?pagination=keyset")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries))
+        self.assertContains(response, "cursor=")
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client_http.get(reverse("branche_list") + "?cursor=invalide")
+        self.assertEqual(response.status_code, 404)
+
+
+# --------- TESTS DE LA PAGINATION DE L'API ---------
+class ApiPaginationTests(TestCase):
+    """
+    Vérifie que les listes de l'API sont paginées et bornées.
+    """
+
+    def setUp(self):
+        self.client_http = DjangoClient()
+        self.user = Utilisateur.objects.create_user(
+            username="api", password="motdepasse123", role="SuperAdmin"
+        )
+        self.client_http.force_login(self.user)
+        Branche.objects.bulk_create(
+            [Branche(nom=f"Branche {i}", ville="Ville") for i in range(60)]
+        )
+
+    def test_default_cursor_pagination(self):
+        """
+        Par défaut : page de 50 lignes, lien "next" par curseur, pas de "count".
+        """
+        response = self.client_http.get(reverse("branche-list"))
+        data = response.json()
+        self.assertEqual(len(data["results"]), 50)
+        self.assertIn("cursor=", data["next"])
+        self.assertNotIn("count", data)
+
+        # La page suivante contient le reste des lignes
+        data = self.client_http.get(data["next"]).json()
+        self.assertEqual(len(data["results"]), 10)
+        self.assertIsNone(data["next"])
+
+    def test_page_size_is_capped(self):
+        """
+        ?page_size= est accepté mais ne peut pas dépasser API_MAX_PAGE_SIZE.
+        """
+        url = reverse("branche-list")
+        data = self.client_http.get(url + "?page_size=5").json()
+        self.assertEqual(len(data["results"]), 5)
+        with mock.patch.object(ApiCursorPagination, "max_page_size", 20):
+            data = self.client_http.get(url + "?page_size=1000").json()
+        self.assertEqual(len(data["results"]), 20)
+
+    def test_offset_pagination_opt_in(self):
+        """
+        ?pagination=offset renvoie la pagination limit/offset avec le total.
+        """
+        url = reverse("branche-list") + "?pagination=offset&limit=10&offset=55"
+        data = self.client_http.get(url).json()
+        self.assertEqual(data["count"], 60)
+        self.assertEqual(len(data["results"]), 5)
+
+
+# --------- TESTS DES EXPORTS ---------
+class ExportTests(TestCase):
+    """
+    Vérifie les exports en streaming : contenu, filtres et nombre de requêtes constant.
+    """
+
+    def setUp(self):
+        self.client_http = DjangoClient()
+        self.user = Utilisateur.objects.create_user(
+            username="finance", password="motdepasse123", role="SuperAdmin"
+        )
+        self.client_http.force_login(self.user)
+        self.branche_a = Branche.objects.create(nom="Douala", ville="Douala")
+        self.branche_b = Branche.objects.create(nom="Yaounde", ville="Yaounde")
+        for i, branche in enumerate([self.branche_a, self.branche_a, self.branche_b]):
+            client = Client.objects.create(
+                nom=f"Nom{i}",
+                prenom="Prenom",
+                adresse="Adresse",
+                email=f"export{i}@example.com",
+                telephone="0102030405",
+                branche=branche,
+                date_inscription=f"2025-0{i + 1}-01",
+            )
+            Assurance.objects.create(
+                type_assurance="Auto",
+                date_debut=f"2025-0{i + 1}-01",
+                date_fin="2025-12-31",
+                montant="100.00",
+                client=client,
+                branche=branche,
+            )
+
+    def _content(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_export_with_joined_names(self):
+        response = self.client_http.get(reverse("export_assurances"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = self._content(response).splitlines()
+        self.assertTrue(lines[0].startswith("id,type_assurance"))
+        self.assertEqual(len(lines), 4)
+        self.assertIn("Nom0,Prenom", lines[1])
+        self.assertIn("Douala", lines[1])
+
+    def test_ndjson_export_with_filters(self):
+        url = reverse("export_clients") + f"?format=ndjson&branche={self.branche_a.pk}&date_min=2025-02-01"
+        response = self.client_http.get(url)
+        rows = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual([row["nom"] for row in rows], ["Nom1"])
+        self.assertEqual(rows[0]["branche_nom"], "Douala")
+
+    def test_invalid_parameters(self):
+        url = reverse("export_clients")
+        self.assertEqual(self.client_http.get(url + "?format=xml").status_code, 400)
+        self.assertEqual(self.client_http.get(url + "?date_max=demain").status_code, 400)
+
+    def test_constant_query_count(self):
+        """
+        L'export lit toutes les lignes avec une seule requête (jointure), pas une par ligne.
+        """
+        response = self.client_http.get(reverse("export_assurances"))
+        with CaptureQueriesContext(connection) as ctx:
+            self._content(response)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+# --------- TESTS DE L'IMPORT EN MASSE ---------
+class ImportTests(TestCase):
+    """
+    Vérifie l'import en masse : validation avec les règles des formulaires,
+    erreurs par ligne sans interruption, et nombre de requêtes par lot.
+    """
+
+    def setUp(self):
+        self.client_http = DjangoClient()
+        self.user = Utilisateur.objects.create_user(
+            username="import", password="motdepasse123", role="SuperAdmin"
+        )
+        self.client_http.force_login(self.user)
+        self.branche = Branche.objects.create(nom="Douala", ville="Douala")
+
+    def _clients_csv(self):
+        return (
+            "nom,prenom,adresse,email,telephone,date_inscription,branche_nom\n"
+            "Doe,John,Rue 1,john@example.com,0102,2025-01-01,Douala\n"
+            "Doe,Jane,Rue 2,pas-un-email,0103,2025-01-02,Douala\n"
+            "Smith,Ann,Rue 3,ann@example.com,0104,2025-01-03,Inconnue\n"
+            "Roe,Max,Rue 4,max@example.com,0105,2025-01-04,douala\n"
+        )
+
+    def test_management_command_reports_row_errors(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as handle:
+            handle.write(self._clients_csv())
+        self.addCleanup(os.remove, handle.name)
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_portfolio", "clients", handle.name, "--batch-size", "2", stdout=out, stderr=err)
+
+        self.assertEqual(Client.objects.count(), 2)
+        self.assertIn("2 lignes importées, 2 en erreur", out.getvalue())
+        self.assertIn("Ligne 3", err.getvalue())
+        self.assertIn("email", err.getvalue())
+        self.assertIn("Ligne 4", err.getvalue())
+
+    def test_encoding(self):
+        # CSV enregistré par Excel (cp1252) : accent en ligne 5
+        content = self._clients_csv().replace("Rue 4", "Rue Émile").encode("cp1252")
+        with tempfile.NamedTemporaryFile("wb", suffix=".csv", delete=False) as handle:
+            handle.write(content)
+        self.addCleanup(os.remove, handle.name)
+
+        with self.assertRaisesMessage(CommandError, "Ligne 5 : caractères illisibles en utf-8-sig"):
+            call_command("import_portfolio", "clients", handle.name, "--batch-size", "1", stdout=io.StringIO())
+        # Lots précédents déjà écrits (ligne 2 ; lignes 3 et 4 en erreur)
+        self.assertEqual(Client.objects.count(), 1)
+        Client.objects.all().delete()
+
+        response = self.client_http.post(
+            reverse("client-bulk-import"), {"file": SimpleUploadedFile("clients.csv", content)},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Ligne 5", response.json()["detail"])
+        self.assertEqual(response.json()["created"], 0)
+
+        response = self.client_http.post(
+            reverse("client-bulk-import"), {"file": SimpleUploadedFile("clients.csv", content), "encoding": "latin-9000"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client_http.post(
+            reverse("client-bulk-import"), {"file": SimpleUploadedFile("clients.csv", content), "encoding": "cp1252"},
+        )
+        self.assertEqual(response.json()["created"], 2)
+        call_command("import_portfolio", "clients", handle.name, "--encoding", "cp1252", stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Client.objects.filter(adresse="Rue Émile").count(), 2)
+
+    def test_api_import_assurances_ndjson(self):
+        client = Client.objects.create(
+            nom="Doe", prenom="John", adresse="Rue", email="john@example.com",
+            telephone="0102", branche=self.branche, date_inscription="2025-01-01",
+        )
+        lines = [
+            {"type_assurance": "Auto", "date_debut": "2025-01-01", "date_fin": "2025-12-31",
+             "montant": "100.00", "client_email": "john@example.com"},
+            {"type_assurance": "Vie", "date_debut": "2025-01-01", "date_fin": "2025-12-31",
+             "montant": "abc", "client": client.pk},
+            {"type_assurance": "Santé", "date_debut": "2025-01-01", "date_fin": "2025-12-31",
+             "montant": "50.00", "client": 9999},
+        ]
+        payload = "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+        upload = SimpleUploadedFile("contrats.ndjson", payload.encode())
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client_http.post(reverse("assurance-bulk-import"), {"file": upload})
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["created"], 1)
+        self.assertEqual([e["line"] for e in data["errors"]], [2, 3, 4])
+        self.assertIn("montant", data["errors"][0]["errors"])
+        self.assertIn("client", data["errors"][1]["errors"])
+        # La branche de l'assurance est celle du client par défaut
+        self.assertEqual(Assurance.objects.get().branche, self.branche)
+        # Requêtes constantes : session, utilisateur, branches, clients du lot, transaction + insertion
+        # + 1 : marquage des statistiques du tableau de bord à recalculer
+        # + 1 : journal de synchronisation
+        self.assertLessEqual(len(ctx.captured_queries), 9)
+
+
+# --------- TESTS DES OPÉRATIONS EN MASSE DE L'API ---------
+class BulkApiTests(TestCase):
+    """
+    Vérifie la création, la modification et la suppression en masse via l'API.
+    """
+
+    def setUp(self):
+        self.client_http = DjangoClient()
+        self.user = Utilisateur.objects.create_user(
+            username="integration", password="motdepasse123", role="SuperAdmin"
+        )
+        self.client_http.force_login(self.user)
+        self.branche = Branche.objects.create(nom="Douala", ville="Douala")
+        self.client_obj = Client.objects.create(
+            nom="Doe", prenom="John", adresse="Rue", email="john@example.com",
+            telephone="0102", branche=self.branche, date_inscription="2025-01-01",
+        )
+
+    def _contrat(self, **extra):
+        data = {
+            "type_assurance": "Auto", "date_debut": "2025-01-01", "date_fin": "2025-12-31",
+            "montant": "100.00", "client": self.client_obj.pk, "branche": self.branche.pk,
+        }
+        data.update(extra)
+        return data
+
+    def _send(self, method, url, payload):
+        return getattr(self.client_http, method)(url, json.dumps(payload), content_type="application/json")
+
+    def test_bulk_create_constant_queries(self):
+        payload = [self._contrat(type_assurance=f"Type {i}") for i in range(20)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._send("post", reverse("assurance-list"), payload)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(response.json()), 20)
+        self.assertEqual(Assurance.objects.count(), 20)
+        # session + utilisateur + 2 relations préchargées + transaction/insertion
+        # + marquage des statistiques du tableau de bord à recalculer + journal de synchronisation
+        self.assertLessEqual(len(ctx.captured_queries), 9)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        payload = [self._contrat(), self._contrat(montant="abc"), self._contrat(client=9999)]
+        response = self._send("post", reverse("assurance-list"), payload)
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn("montant", errors[1])
+        self.assertIn("client", errors[2])
+        # Tout ou rien : aucune ligne écrite
+        self.assertEqual(Assurance.objects.count(), 0)
+
+    def test_single_create_still_works(self):
+        response = self._send("post", reverse("assurance-list"), self._contrat())
+        self.assertEqual(response.status_code, 201)
+
+    def test_bulk_partial_update_and_delete(self):
+        first = Assurance.objects.create(**self._contrat(client=self.client_obj, branche=self.branche))
+        second = Assurance.objects.create(**self._contrat(client=self.client_obj, branche=self.branche))
+        url = reverse("assurance-bulk")
+
+        response = self._send("patch", url, [{"id": first.pk, "montant": "250.00"}, {"id": second.pk, "type_assurance": "Vie"}])
+        self.assertEqual(response.status_code, 200, response.content)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(str(first.montant), "250.00")
+        self.assertEqual(second.type_assurance, "Vie")
+
+        response = self._send("patch", url, [{"id": 9999, "montant": "1.00"}])
+        self.assertEqual(response.status_code, 400)
+
+        response = self._send("delete", url, [first.pk, {"id": second.pk}])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(Assurance.objects.count(), 0)
+
+    def test_bulk_delete_constant_queries(self):
+        dashboard.rebuild()
+        url = reverse("assurance-bulk")
+
+        def delete(count):
+            contrats = [Assurance.objects.create(**self._contrat(client=self.client_obj, branche=self.branche)) for _ in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self._send("delete", url, [c.pk for c in contrats])
+            self.assertEqual(response.status_code, 204, response.content)
+            return [c.pk for c in contrats], len(ctx.captured_queries)
+
+        delete(1)  # session et utilisateur mis en cache
+        _, few = delete(2)
+        ids, many = delete(40)
+        # Journal écrit par lot, pas par contrat supprimé
+        self.assertEqual(many, few)
+        tombstones = Changement.objects.filter(modele="assurance", objet_id__in=ids, supprime=True)
+        self.assertEqual(tombstones.count(), 40)
+
+
+# --------- TESTS DES INDEX ---------
+class IndexBenchmarkTests(TestCase):
+    """
+    Vérifie que les chemins d'accès utilisent les index et que le benchmark
+    ne laisse aucune trace (données et index restaurés).
+    """
+
+    def test_benchmark_compares_plans_and_rolls_back(self):
+        out = io.StringIO()
+        call_command("benchmark_indexes", "--seed", "50", "--repeat", "1", stdout=out)
+        output = out.getvalue()
+        self.assertIn("SCAN gestion_client", output)
+        self.assertIn("client_email_idx", output)
+        self.assertIn("assurance_branche_fin_idx", output)
+        # Les données générées sont annulées et les index toujours présents
+        self.assertEqual(Assurance.objects.count(), 0)
+        plan = Client.objects.filter(email="x@example.com").explain()
+        self.assertIn("client_email_idx", plan)
+
+
+# --------- TESTS DE LA RECHERCHE PLEIN TEXTE ---------
+class ClientSearchTests(TestCase):
+    """
+    Vérifie la recherche de clients (?q=) : index FTS5 tenu à jour par les triggers,
+    classement, et repli par préfixe si FTS5 n'est pas disponible.
+    """
+
+    def setUp(self):
+        self.client_http = DjangoClient()
+        self.user = Utilisateur.objects.create_user(
+            username="recherche", password="motdepasse123", role="SuperAdmin"
+        )
+        self.client_http.force_login(self.user)
+        self.branche = Branche.objects.create(nom="Douala", ville="Douala")
+        self.dupont = self._client("Dupont", "Marie", "marie.dupont@example.com")
+        self.durand = self._client("Durand", "Paul", "paul@example.com")
+
+    def _client(self, nom, prenom, email):
+        return Client.objects.create(
+            nom=nom, prenom=prenom, adresse="12 rue de la Gare", email=email,
+            telephone="699000000", branche=self.branche, date_inscription="2025-01-01",
+        )
+
+    def _search(self, text):
+        return list(search.search_clients(Client.objects.all(), text))
+
+    def test_prefix_search_and_index_sync(self):
+        self.assertEqual(self._search("dup"), [self.dupont])
+        self.assertEqual(self._search("marie dup"), [self.dupont])
+        self.assertEqual(set(self._search("du")), {self.dupont, self.durand})
+
+        # Modification, suppression et bulk_create sont répercutés par les triggers
+        self.durand.nom = "Martin"
+        self.durand.save()
+        self.assertEqual(self._search("durand"), [])
+        self.assertEqual(self._search("martin"), [self.durand])
+        self.dupont.delete()
+        self.assertEqual(self._search("dupont"), [])
+        Client.objects.bulk_create([Client(
+            nom="Nouveau", prenom="Client", adresse="Rue", email="n@example.com",
+            telephone="6", branche=self.branche, date_inscription="2025-01-01",
+        )])
+        self.assertEqual(len(self._search("nouveau")), 1)
+
+    def test_fts_syntax_is_neutralised(self):
+        self.assertEqual(search.build_match_query('dup" OR nom:*'), '"dup"* "OR"* "nom"*')
+        # Aucun mot exploitable : pas de filtre
+        self.assertEqual(len(self._search('"*')), 2)
+
+    def test_fallback_without_fts(self):
+        with mock.patch.object(search, "fts_available", return_value=False):
+            self.assertEqual(self._search("dup"), [self.dupont])
+
+    def test_list_view_and_api_search(self):
+        response = self.client_http.get(reverse("client_list") + "?q=durand")
+        self.assertContains(response, "Durand")
+        self.assertNotContains(response, "Dupont")
+
+        data = self.client_http.get(reverse("client-list") + "?q=marie").json()
+        self.assertEqual([row["id"] for row in data["results"]], [self.dupont.pk])
+
+
+# --------- TESTS DE L'AUTOCOMPLÉTION ---------
+class AutocompleteTests(TestCase):
+    """
+    Vérifie que le formulaire Assurance ne charge plus toute la table des clients
+    et que les endpoints JSON renvoient un nombre limité de propositions.
+    """
+
+    def setUp(self):
+        self.client_http = DjangoClient()
+        self.user = Utilisateur.objects.create_user(
+            username="auto", password="motdepasse123", role="SuperAdmin"
+        )
+        self.client_http.force_login(self.user)
+        self.branche = Branche.objects.create(nom="Douala", ville="Douala")
+        Client.objects.bulk_create([
+            Client(
+                nom=f"Dupont{i}", prenom="Jean", adresse="Rue", email=f"jean{i}@example.com",
+                telephone="6", branche=self.branche, date_inscription="2025-01-01",
+            )
+            for i in range(30)
+        ])
+
+    def test_form_page_does_not_load_all_clients(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client_http.get(reverse("assurance_add"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "<option")
+        self.assertContains(response, reverse("autocomplete_clients"))
+        # session + utilisateur : aucune lecture des tables client / branche
+        self.assertFalse(any("gestion_client" in q["sql"] for q in ctx.captured_queries))
+
+    def test_edit_form_shows_selected_label(self):
+        client = Client.objects.order_by("pk").first()
+        assurance = Assurance.objects.create(
+            type_assurance="Auto", date_debut="2025-01-01", date_fin="2025-12-31",
+            montant="100.00", client=client, branche=self.branche,
+        )
+        response = self.client_http.get(reverse("assurance_edit", args=[assurance.pk]))
+        self.assertContains(response, str(client))
+
+    def test_autocomplete_endpoints_are_limited(self):
+        data = self.client_http.get(reverse("autocomplete_clients") + "?q=dupont").json()
+        self.assertEqual(len(data["results"]), 20)
+        self.assertIn("Dupont", data["results"][0]["text"])
+
+        data = self.client_http.get(reverse("autocomplete_branches") + "?q=dou").json()
+        self.assertEqual(data["results"], [{"id": self.branche.pk, "text": "Douala - Douala"}])
+        self.assertEqual(self.client_http.get(reverse("autocomplete_branches")).json(), {"results": []})
+
+
+# --------- TESTS DU FILTRAGE PAR BRANCHE ---------
+class BrancheScopeTests(TestCase):
+    """
+    Vérifie qu'un agent ne voit et ne modifie que les données de sa branche.
+    """
+
+    def setUp(self):
+        self.douala = Branche.objects.create(nom="Douala", ville="Douala")
+        self.yaounde = Branche.objects.create(nom="Yaounde", ville="Yaounde")
+        self.client_douala = self._client("Dupont", self.douala)
+        self.client_yaounde = self._client("Durand", self.yaounde)
+        self.agent = Utilisateur.objects.create_user(username="agent_douala", password="motdepasse123", branch=self.douala)
+        self.admin = Utilisateur.objects.create_user(username="siege", password="motdepasse123", role="SuperAdmin")
+        self.client_http = DjangoClient()
+        self.client_http.force_login(self.agent)
+
+    def _client(self, nom, branche):
+        return Client.objects.create(
+            nom=nom, prenom="Jean", adresse="Rue", email=f"{nom.lower()}@example.com",
+            telephone="6", branche=branche, date_inscription="2025-01-01",
+        )
+
+    def test_queryset_for_user(self):
+        self.assertEqual(list(Client.objects.for_user(self.agent)), [self.client_douala])
+        self.assertEqual(Client.objects.for_user(self.admin).count(), 2)
+        self.assertEqual(list(Branche.objects.for_user(self.agent)), [self.douala])
+        sans_branche = Utilisateur.objects.create_user(username="sans", password="motdepasse123")
+        self.assertEqual(Client.objects.for_user(sans_branche).count(), 0)
+        # Le filtre est fait en SQL, sur la branche
+        sql = str(Client.objects.for_user(self.agent).query)
+        self.assertIn("branche_id", sql)
+
+    def test_views_and_api_are_scoped(self):
+        response = self.client_http.get(reverse("client_list"))
+        self.assertContains(response, "Dupont")
+        self.assertNotContains(response, "Durand")
+
+        data = self.client_http.get(reverse("client-list")).json()
+        self.assertEqual([row["id"] for row in data["results"]], [self.client_douala.pk])
+
+        # Les objets d'une autre branche sont introuvables
+        self.assertEqual(self.client_http.get(reverse("client_edit", args=[self.client_yaounde.pk])).status_code, 404)
+        self.assertEqual(self.client_http.get(reverse("client-detail", args=[self.client_yaounde.pk])).status_code, 404)
+
+        # Recherche et autocomplétion restent dans la branche
+        data = self.client_http.get(reverse("autocomplete_clients") + "?q=du").json()
+        self.assertEqual([row["id"] for row in data["results"]], [self.client_douala.pk])
+
+    def test_employee_list_is_scoped(self):
+        chef = Utilisateur.objects.create_user(
+            username="chef_douala", password="motdepasse123", role="BranchAdmin", branch=self.douala,
+        )
+        Utilisateur.objects.create_user(username="agent_yaounde", password="motdepasse123", branch=self.yaounde)
+        self.client_http.force_login(chef)
+        response = self.client_http.get(reverse("employee_list"))
+        self.assertEqual(
+            [user.username for user in response.context["employees"]], ["agent_douala", "chef_douala"],
+        )
+
+        self.client_http.force_login(self.admin)
+        response = self.client_http.get(reverse("employee_list"))
+        self.assertEqual(len(response.context["employees"]), 4)
+
+    def test_forms_and_serializers_limit_choices(self):
+        form = ClientForm(user=self.agent)
+        self.assertEqual(list(form.fields["branche"].queryset), [self.douala])
+
+        payload = {
+            "nom": "Nouveau", "prenom": "Client", "adresse": "Rue", "email": "n@example.com",
+            "telephone": "6", "branche": self.yaounde.pk, "date_inscription": "2025-01-01",
+        }
+        response = self.client_http.post(reverse("client-list"), json.dumps(payload), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("branche", response.json())
+
+
+# --------- TESTS DU TABLEAU DE BORD ---------
+class DashboardTests(TestCase):
+    """
+    Vérifie que les statistiques du tableau de bord, tenues à jour par les signaux,
+    restent égales à un recalcul complet.
+    """
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.douala = Branche.objects.create(nom="Douala", ville="Douala")
+        self.yaounde = Branche.objects.create(nom="Yaounde", ville="Yaounde")
+        self.client_obj = Client.objects.create(
+            nom="Dupont", prenom="Jean", adresse="Rue", email="dupont@example.com",
+            telephone="6", branche=self.douala, date_inscription=self.today,
+        )
+        self.admin = Utilisateur.objects.create_user(username="siege", password="motdepasse123", role="SuperAdmin")
+
+    def _contract(self, days_left, montant="1000.00", branche=None):
+        return Assurance.objects.create(
+            type_assurance="Auto", date_debut=self.today - datetime.timedelta(days=10),
+            date_fin=self.today + datetime.timedelta(days=days_left), montant=montant,
+            client=self.client_obj, branche=branche or self.douala,
+        )
+
+    def _figures(self, branche):
+        stat = StatistiqueBranche.objects.get(branche=branche, periode=dashboard.current_period(self.today))
+        return {name: getattr(stat, name) for name in dashboard.FIGURES}, stat.calcule_le
+
+    def assertMatchesRebuild(self):
+        incremental = {b.pk: self._figures(b) for b in (self.douala, self.yaounde)}
+        dashboard.rebuild(self.today)
+        for branche in (self.douala, self.yaounde):
+            self.assertEqual(incremental[branche.pk], self._figures(branche))
+
+    def test_incremental_updates(self):
+        dashboard.rebuild(self.today)
+        contrat = self._contract(10)
+        self._contract(200, montant="500.00")
+        self._contract(-5)  # déjà expiré : non compté
+        figures, _ = self._figures(self.douala)
+        self.assertEqual(figures["contrats_actifs"], 2)
+        self.assertEqual(figures["montant_actif"], Decimal("1500.00"))
+        self.assertEqual(figures["contrats_expirant_30j"], 1)
+        self.assertEqual(figures["nouveaux_clients"], 1)
+
+        # Changement de branche, de montant et d'échéance, puis suppression
+        contrat = Assurance.objects.get(pk=contrat.pk)
+        contrat.branche = self.yaounde
+        contrat.montant = Decimal("300.00")
+        contrat.date_fin = self.today + datetime.timedelta(days=100)
+        contrat.save()
+        self.assertMatchesRebuild()
+        Assurance.objects.get(pk=contrat.pk).delete()
+        self.assertMatchesRebuild()
+
+        # Suppression d'un client : ses contrats sont supprimés en cascade
+        self.client_obj.delete()
+        figures, _ = self._figures(self.douala)
+        self.assertEqual(figures["contrats_actifs"], 0)
+        self.assertEqual(figures["nouveaux_clients"], 0)
+        self.assertMatchesRebuild()
+
+    def test_bulk_writes_mark_statistics_stale(self):
+        dashboard.rebuild(self.today)
+        AssuranceImporter().run([(2, {
+            "type_assurance": "Auto", "date_debut": str(self.today),
+            "date_fin": str(self.today + datetime.timedelta(days=5)), "montant": "100",
+            "client": str(self.client_obj.pk),
+        })])
+        self.assertIsNone(self._figures(self.douala)[1])
+        self.assertIsNotNone(self._figures(self.yaounde)[1])
+
+        # Recalculé à la lecture
+        stats = dict(dashboard.branch_statistics(self.admin, self.today))
+        self.assertEqual(stats[self.douala].contrats_actifs, 1)
+        self.assertEqual(stats[self.douala].contrats_expirant_30j, 1)
+
+    def test_bulk_delete_updates_each_branch_once(self):
+        dashboard.rebuild(self.today)
+        for days_left in (10, 50, 200):
+            self._contract(days_left)
+            self._contract(days_left, montant="300.00", branche=self.yaounde)
+        with CaptureQueriesContext(connection) as queries:
+            Assurance.objects.filter(client=self.client_obj).delete()
+        updates = [q for q in queries.captured_queries if q["sql"].startswith('UPDATE "gestion_statistiquebranche"')]
+        self.assertEqual(len(updates), 2)
+        self.assertMatchesRebuild()
+
+    def test_statistics_are_refreshed_each_day(self):
+        self._contract(1)
+        dashboard.rebuild(self.today)
+        tomorrow = self.today + datetime.timedelta(days=2)
+        stats = dict(dashboard.branch_statistics(self.admin, tomorrow))
+        self.assertEqual(stats[self.douala].contrats_actifs, 0)
+        self.assertEqual(stats[self.douala].calcule_le, tomorrow)
+
+    def test_home_view_reads_one_row_per_branch(self):
+        self._contract(10)
+        agent = Utilisateur.objects.create_user(username="agent", password="motdepasse123", branch=self.yaounde)
+        http = DjangoClient()
+        http.force_login(agent)
+        response = http.get(reverse("home"))
+        self.assertEqual([b for b, _ in response.context["statistiques"]], [self.yaounde])
+
+        http.force_login(self.admin)
+        http.get(reverse("home"))  # calcul initial
+        with CaptureQueriesContext(connection) as queries:
+            response = http.get(reverse("home"))
+        self.assertContains(response, "Tableau de bord")
+        self.assertEqual(response.context["totaux"]["contrats_actifs"], 1)
+        # Aucun GROUP BY sur les contrats une fois les statistiques calculées
+        self.assertFalse(any("gestion_assurance" in q["sql"] for q in queries.captured_queries))
+
+    @mock.patch.object(routers, "replica_alias", return_value="replica")
+    @mock.patch.object(routers, "reads_pinned", return_value=False)
+    def test_compute_reads_primary(self, *_):
+        self._contract(10)
+        # Requête GET non épinglée : les lectures iraient sur la réplique (qui peut être en retard)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(routers.PrimaryReplicaRouter().db_for_read(Assurance), "replica")
+            stats = dashboard.compute([self.douala.pk], self.today)
+        self.assertEqual(stats[self.douala.pk].contrats_actifs, 1)
+        # Deux GROUP BY et l'enregistrement, tous sur "default"
+        self.assertEqual(len(queries.captured_queries), 3)
+
+    def test_rebuild_command(self):
+        self._contract(10)
+        out = io.StringIO()
+        call_command("rebuild_dashboard", stdout=out)
+        self.assertIn("2 branche(s)", out.getvalue())
+        self.assertEqual(self._figures(self.douala)[0]["contrats_actifs"], 1)
+
+
+# --------- TESTS DES ÉCHÉANCES ---------
+class ExpiringContractsTests(TestCase):
+    """
+    Vérifie la liste des échéances (vue et API) : filtres, périmètre de l'agent,
+    compteurs précalculés et utilisation de l'index (branche, date_fin).
+    """
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.douala = Branche.objects.create(nom="Douala", ville="Douala")
+        self.yaounde = Branche.objects.create(nom="Yaounde", ville="Yaounde")
+        client_obj = Client.objects.create(
+            nom="Dupont", prenom="Jean", adresse="Rue", email="dupont@example.com",
+            telephone="6", branche=self.douala, date_inscription="2025-01-01",
+        )
+        self.contracts = {}
+        for branche in (self.douala, self.yaounde):
+            for days in (3, 20, 60, 200, -1):
+                self.contracts[branche.nom, days] = Assurance.objects.create(
+                    type_assurance=f"Auto {days}", date_debut=self.today - datetime.timedelta(days=30),
+                    date_fin=self.today + datetime.timedelta(days=days), montant="100.00",
+                    client=client_obj, branche=branche,
+                )
+        self.agent = Utilisateur.objects.create_user(username="agent", password="motdepasse123", branch=self.douala)
+        self.admin = Utilisateur.objects.create_user(username="siege", password="motdepasse123", role="SuperAdmin")
+        self.client_http = DjangoClient()
+
+    def test_view_filters_by_horizon_and_scope(self):
+        self.client_http.force_login(self.agent)
+        response = self.client_http.get(reverse("assurance_expiring"), {"horizon": "30"})
+        self.assertEqual(
+            [a.pk for a in response.context["assurances"]],
+            [self.contracts["Douala", 3].pk, self.contracts["Douala", 20].pk],
+        )
+        self.assertEqual(response.context["horizons"], [(7, 1), (30, 2), (90, 3)])
+
+        response = self.client_http.get(reverse("assurance_expiring"), {"horizon": "90"})
+        self.assertEqual(len(response.context["assurances"]), 3)
+        self.assertEqual(self.client_http.get(reverse("assurance_expiring"), {"horizon": "15"}).status_code, 400)
+
+    def test_view_branch_filter_and_counts_do_not_scan_contracts(self):
+        self.client_http.force_login(self.admin)
+        self.client_http.get(reverse("assurance_expiring"))  # calcul initial des statistiques
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_http.get(
+                reverse("assurance_expiring"), {"horizon": "7", "branche": self.yaounde.pk}
+            )
+        self.assertEqual([a.pk for a in response.context["assurances"]], [self.contracts["Yaounde", 3].pk])
+        self.assertEqual(response.context["horizons"], [(7, 1), (30, 2), (90, 3)])
+        # Une seule requête sur les contrats : la page elle-même (pas de COUNT)
+        contract_queries = [q["sql"] for q in queries.captured_queries if "gestion_assurance" in q["sql"]]
+        self.assertEqual(len(contract_queries), 1)
+        self.assertNotIn("COUNT", contract_queries[0])
+
+    def test_range_scan_uses_branche_date_fin_index(self):
+        queryset = dashboard.expiring_contracts(Assurance.objects.all(), 30, self.douala.pk, self.today)
+        self.assertIn("assurance_branche_fin_idx", queryset.order_by("date_fin", "pk").explain())
+
+    def test_api_expiring_and_summary(self):
+        self.client_http.force_login(self.agent)
+        data = self.client_http.get(reverse("assurance-expiring"), {"horizon": "90", "page_size": "2"}).json()
+        self.assertEqual(
+            [row["id"] for row in data["results"]],
+            [self.contracts["Douala", 3].pk, self.contracts["Douala", 20].pk],
+        )
+        data = self.client_http.get(data["next"]).json()
+        self.assertEqual([row["id"] for row in data["results"]], [self.contracts["Douala", 60].pk])
+        self.assertEqual(self.client_http.get(reverse("assurance-expiring"), {"horizon": "x"}).status_code, 400)
+
+        summary = self.client_http.get(reverse("assurance-expiring-summary")).json()
+        self.assertEqual(summary["horizons"], [7, 30, 90])
+        self.assertEqual(summary["branches"], [
+            {"branche": self.douala.pk, "nom": "Douala", "expirant": {"7": 1, "30": 2, "90": 3}},
+        ])
+        self.assertEqual(summary["total"], {"7": 1, "30": 2, "90": 3})
+
+
+# --------- TESTS DU CACHE DES LISTES ---------
+class ListCacheTests(TestCase):
+    """
+    Vérifie le cache des listes : clé par branche, invalidation par les signaux
+    (y compris les écritures en masse) et compteurs.
+    """
+
+    def setUp(self):
+        caching.list_cache().clear()
+        self.douala = Branche.objects.create(nom="Douala", ville="Douala")
+        self.yaounde = Branche.objects.create(nom="Yaounde", ville="Yaounde")
+        self.dupont = self._client("Dupont", self.douala)
+        self._client("Durand", self.yaounde)
+        self.agent = Utilisateur.objects.create_user(username="agent", password="motdepasse123", branch=self.douala)
+        self.admin = Utilisateur.objects.create_user(username="siege", password="motdepasse123", role="SuperAdmin")
+        self.client_http = DjangoClient()
+        self.client_http.force_login(self.agent)
+
+    def _client(self, nom, branche):
+        return Client.objects.create(
+            nom=nom, prenom="Jean", adresse="Rue", email=f"{nom.lower()}@example.com",
+            telephone="6", branche=branche, date_inscription="2025-01-01",
+        )
+
+    def test_list_view_is_cached_until_a_write(self):
+        url = reverse("client_list")
+        self.assertEqual(self.client_http.get(url)["X-Cache"], "MISS")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_http.get(url)
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertContains(response, "Dupont")
+        self.assertFalse(any("gestion_client" in q["sql"] for q in queries.captured_queries))
+
+        # Un client d'une autre branche n'invalide pas la liste de l'agent
+        self._client("Martin", self.yaounde)
+        self.assertEqual(self.client_http.get(url)["X-Cache"], "HIT")
+
+        self._client("Bernard", self.douala)
+        response = self.client_http.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertContains(response, "Bernard")
+
+    def test_invalidation_seen_by_other_workers(self):
+        # Autre worker : autre instance du backend, mêmes fichiers
+        other_worker = caches.create_connection(caching.LIST_CACHE_ALIAS)
+        key = caching._version_key("client", f"b{self.douala.pk}")
+        version = caching.get_version("client", f"b{self.douala.pk}")
+        self.assertEqual(other_worker.get(key), version)
+        self._client("Bernard", self.douala)
+        self.assertNotEqual(other_worker.get(key), version)
+        self.assertEqual([e.id for e in run_checks(tags=["caches"]) if e.id == "gestion.W001"], [])
+
+    def test_offset_page_restored_without_count(self):
+        url = reverse("assurance_list")
+        self.client_http.get(url, {"page": "1"})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_http.get(url, {"page": "1"})
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertFalse(any("COUNT" in q["sql"] for q in queries.captured_queries))
+
+    def test_cache_is_keyed_by_branch(self):
+        url = reverse("client_list")
+        self.client_http.get(url)
+        other = Utilisateur.objects.create_user(username="agent2", password="motdepasse123", branch=self.yaounde)
+        self.client_http.force_login(other)
+        response = self.client_http.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertContains(response, "Durand")
+        self.assertNotContains(response, "Dupont")
+
+    def test_moving_an_object_invalidates_the_old_branch(self):
+        url = reverse("client-list")
+        self.assertEqual(len(self.client_http.get(url).json()["results"]), 1)
+        client_obj = Client.objects.get(pk=self.dupont.pk)
+        client_obj.branche = self.yaounde
+        client_obj.save()
+        response = self.client_http.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["results"], [])
+
+    def test_bulk_writes_invalidate_api_lists(self):
+        self.client_http.force_login(self.admin)
+        url = reverse("client-list")
+        self.client_http.get(url)
+        self.assertEqual(self.client_http.get(url)["X-Cache"], "HIT")
+        payload = [{
+            "nom": "Leroy", "prenom": "Paul", "adresse": "Rue", "email": "leroy@example.com",
+            "telephone": "6", "branche": self.douala.pk, "date_inscription": "2025-01-01",
+        }]
+        response = self.client_http.post(url, json.dumps(payload), content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.client_http.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()["results"]), 3)
+
+    def test_stats_endpoint(self):
+        patcher = mock.patch.object(metrics, "store", metrics.MetricsStore(tempfile.mkdtemp()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        url = reverse("client_list")
+        self.client_http.get(url)
+        self.client_http.get(url)
+        self.assertEqual(self.client_http.get(reverse("cache_stats")).status_code, 403)
+        self.client_http.force_login(self.admin)
+        data = self.client_http.get(reverse("cache_stats")).json()
+        self.assertEqual((data["hits"], data["misses"]), (1, 1))
+        self.assertEqual(data["hit_ratio"], 0.5)
+
+
+# --------- TESTS DES REQUÊTES CONDITIONNELLES (ETag) ---------
+class ConditionalRequestTests(TestCase):
+    """
+    Vérifie les ETag / Last-Modified de l'API : 304 sans charger les objets,
+    nouvel ETag après une modification, une création ou une suppression.
+    """
+
+    def setUp(self):
+        caching.list_cache().clear()
+        self.branche = Branche.objects.create(nom="Douala", ville="Douala")
+        self.client_obj = self._client("Dupont")
+        self._client("Durand")
+        self.user = Utilisateur.objects.create_user(username="mobile", password="motdepasse123", role="SuperAdmin")
+        self.client_http = DjangoClient()
+        self.client_http.force_login(self.user)
+
+    def _client(self, nom):
+        return Client.objects.create(
+            nom=nom, prenom="Jean", adresse="Rue", email=f"{nom.lower()}@example.com",
+            telephone="6", branche=self.branche, date_inscription="2025-01-01",
+        )
+
+    def test_timestamps_are_maintained(self):
+        created = self.client_obj.created_at
+        self.assertIsNotNone(created)
+        self.client_obj.nom = "Dupond"
+        self.client_obj.save()
+        self.client_obj.refresh_from_db()
+        self.assertEqual(self.client_obj.created_at, created)
+        self.assertGreater(self.client_obj.updated_at, created)
+
+        # L'API bulk met aussi updated_at à jour
+        before = self.client_obj.updated_at
+        response = self.client_http.patch(
+            reverse("client-bulk"), json.dumps([{"id": self.client_obj.pk, "nom": "Dupont"}]),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.client_obj.refresh_from_db()
+        self.assertGreater(self.client_obj.updated_at, before)
+
+    def test_detail_not_modified_without_loading_object(self):
+        url = reverse("client-detail", args=[self.client_obj.pk])
+        response = self.client_http.get(url)
+        etag = response["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        self.assertIn("Last-Modified", response)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_http.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        # Seule la validation (pk, updated_at) est lue, pas l'objet complet
+        self.assertFalse(any('"gestion_client"."nom"' in q["sql"] for q in queries.captured_queries))
+
+        response = self.client_http.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+        self.client_obj.nom = "Dupond"
+        self.client_obj.save()
+        response = self.client_http.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_validator_sees_changes_and_deletions(self):
+        url = reverse("client-list")
+        etag = self.client_http.get(url)["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client_http.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Résumé (MAX / COUNT) lu dans le cache des listes jusqu'à la prochaine écriture
+        self.assertFalse(any("MAX(" in q["sql"] for q in queries.captured_queries))
+        # Autre page ou autres filtres : autre ETag
+        self.assertNotEqual(self.client_http.get(url, {"page_size": 1})["ETag"], etag)
+
+        Client.objects.filter(nom="Durand").delete()
+        response = self.client_http.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        self._client("Martin")
+        self.assertEqual(self.client_http.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_object_still_404(self):
+        self.assertEqual(self.client_http.get(reverse("client-detail", args=[999])).status_code, 404)
+
+
+# --------- TESTS DE LA SYNCHRONISATION DIFFÉRENTIELLE ---------
+class SyncTests(TestCase):
+    """
+    Vérifie la synchronisation différentielle : seuls les changements depuis le jeton
+    sont renvoyés, suppressions comprises, dans le périmètre de l'agent.
+    """
+
+    def setUp(self):
+        self.douala = Branche.objects.create(nom="Douala", ville="Douala")
+        self.yaounde = Branche.objects.create(nom="Yaounde", ville="Yaounde")
+        self.dupont = self._client("Dupont", self.douala)
+        self.durand = self._client("Durand", self.yaounde)
+        self.agent = Utilisateur.objects.create_user(username="agent", password="motdepasse123", branch=self.douala)
+        self.client_http = DjangoClient()
+        self.client_http.force_login(self.agent)
+
+    def _client(self, nom, branche):
+        return Client.objects.create(
+            nom=nom, prenom="Jean", adresse="Rue", email=f"{nom.lower()}@example.com",
+            telephone="6", branche=branche, date_inscription="2025-01-01",
+        )
+
+    def _sync(self, token=None, **params):
+        if token:
+            params["since"] = token
+        response = self.client_http.get(reverse("sync-list"), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def _summary(self, data):
+        return [(c["type"], c["id"], c["action"]) for c in data["changes"]]
+
+    def test_initial_then_incremental_sync(self):
+        data = self._sync()
+        self.assertEqual(self._summary(data), [
+            ("branche", self.douala.pk, "upsert"), ("client", self.dupont.pk, "upsert"),
+        ])
+        self.assertEqual(data["changes"][1]["data"]["nom"], "Dupont")
+        token = data["token"]
+        self.assertEqual(self._sync(token)["changes"], [])
+
+        # Les changements d'une autre branche ne sont pas visibles
+        self._client("Martin", self.yaounde)
+        self.assertEqual(self._sync(token)["changes"], [])
+
+        client_obj = Client.objects.get(pk=self.dupont.pk)
+        client_obj.nom = "Dupond"
+        client_obj.save()
+        bernard = self._client("Bernard", self.douala)
+        data = self._sync(token)
+        self.assertEqual(self._summary(data), [
+            ("client", self.dupont.pk, "upsert"), ("client", bernard.pk, "upsert"),
+        ])
+        token = data["token"]
+
+        bernard_id = bernard.pk
+        bernard.delete()
+        data = self._sync(token)
+        self.assertEqual(self._summary(data), [("client", bernard_id, "delete")])
+
+    def test_journal_keeps_one_entry_per_object(self):
+        token = self._sync()["token"]
+        for i in range(5):
+            self.dupont.nom = f"Nom {i}"
+            self.dupont.save()
+        data = self._sync(token)
+        self.assertEqual(self._summary(data), [("client", self.dupont.pk, "upsert")])
+        self.assertEqual(Changement.objects.filter(modele="client", objet_id=self.dupont.pk).count(), 1)
+
+    def test_moved_object_is_deleted_from_old_branch(self):
+        token = self._sync()["token"]
+        client_obj = Client.objects.get(pk=self.dupont.pk)
+        client_obj.branche = self.yaounde
+        client_obj.save()
+        self.assertEqual(self._summary(self._sync(token)), [("client", self.dupont.pk, "delete")])
+
+    def test_cascade_delete_is_journaled_in_batch(self):
+        token = self._sync()["token"]
+        contrat = Assurance.objects.create(
+            type_assurance="Auto", date_debut="2025-01-01", date_fin="2025-12-31", montant="100",
+            client=self.dupont, branche=self.douala,
+        )
+        others = [self._client(f"Nom{i}", self.douala) for i in range(10)]
+        token = self._sync(token)["token"]
+
+        with CaptureQueriesContext(connection) as queries:
+            Branche.objects.get(pk=self.douala.pk).delete()
+        # Journal : un effacement et une insertion par modèle, quel que soit le nombre d'objets
+        journal = [q for q in queries.captured_queries if "gestion_changement" in q["sql"]]
+        self.assertEqual(len(journal), 6)
+        self.assertEqual(
+            set(Changement.objects.filter(branche_id=self.douala.pk, supprime=True).values_list("modele", "objet_id")),
+            {("branche", self.douala.pk), ("assurance", contrat.pk), ("client", self.dupont.pk)}
+            | {("client", c.pk) for c in others},
+        )
+
+    def test_failed_journal_rolls_back_delete(self):
+        with mock.patch.object(sync, "record_deleted", side_effect=RuntimeError("journal")):
+            with self.assertRaises(RuntimeError):
+                Client.objects.filter(pk=self.dupont.pk).delete()
+            with self.assertRaises(RuntimeError):
+                Branche.objects.get(pk=self.douala.pk).delete()
+        # Rien n'est supprimé sans son effacement dans le journal
+        self.assertTrue(Client.objects.filter(pk=self.dupont.pk).exists())
+        self.assertTrue(Branche.objects.filter(pk=self.douala.pk).exists())
+
+    def test_pagination_and_bulk_writes(self):
+        token = self._sync()["token"]
+        AssuranceImporter().run([
+            (line, {
+                "type_assurance": f"Auto {line}", "date_debut": "2025-01-01", "date_fin": "2025-12-31",
+                "montant": "100", "client": str(self.dupont.pk),
+            })
+            for line in range(2, 7)
+        ])
+        seen = []
+        while True:
+            data = self._sync(token, limit=2)
+            seen += self._summary(data)
+            token = data["token"]
+            if not data["has_more"]:
+                break
+        self.assertEqual(len(seen), 5)
+        self.assertTrue(all(kind == "assurance" and action == "upsert" for kind, _, action in seen))
+
+    def test_constant_queries_and_token_scope(self):
+        token = self._sync()["token"]
+        for i in range(20):
+            self._client(f"Nom{i}", self.yaounde)
+        self.dupont.save()
+        with CaptureQueriesContext(connection) as queries:
+            data = self._sync(token)
+        self.assertEqual(len(data["changes"]), 1)
+        # journal + clients modifiés (session et utilisateur viennent du cache)
+        self.assertEqual(len(queries.captured_queries), 2)
+
+        # Jeton émis pour une autre branche ou illisible : resynchronisation complète
+        self.agent.branch = self.yaounde
+        self.agent.save()
+        self.assertEqual(self.client_http.get(reverse("sync-list"), {"since": token}).status_code, 410)
+        self.assertEqual(self.client_http.get(reverse("sync-list"), {"since": "xyz"}).status_code, 410)
+
+
+# --------- TESTS DES VUES ASYNCHRONES ---------
+class AsyncReadViewTests(TestCase):
+    """
+    Vérifie les vues de lecture asynchrones (/async/...) : authentification, périmètre
+    de la branche, pagination par curseur, recherche et tableau de bord.
+    """
+
+    def setUp(self):
+        self.douala = Branche.objects.create(nom="Douala", ville="Douala")
+        self.yaounde = Branche.objects.create(nom="Yaounde", ville="Yaounde")
+        self.clients = [self._client(f"Nom{i:02d}", self.douala) for i in range(5)]
+        self.autre = self._client("Autre", self.yaounde)
+        today = timezone.localdate()
+        self.assurance = Assurance.objects.create(
+            type_assurance="Auto", date_debut=today - datetime.timedelta(days=10),
+            date_fin=today + datetime.timedelta(days=100),
+            montant=Decimal("100"), client=self.clients[0], branche=self.douala,
+        )
+        self.agent = Utilisateur.objects.create_user(username="agent", password="motdepasse123", branch=self.douala)
+        self.async_client = AsyncClient()
+        self.async_client.force_login(self.agent)
+
+    def _client(self, nom, branche):
+        return Client.objects.create(
+            nom=nom, prenom="Jean", adresse="Rue", email=f"{nom.lower()}@example.com",
+            telephone="6", branche=branche, date_inscription="2025-01-01",
+        )
+
+    async def test_login_required(self):
+        response = await AsyncClient().get(reverse("async_client_list"))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_client_list_is_scoped_and_paginated(self):
+        response = await self.async_client.get(reverse("async_client_list"), {"page_size": 3})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([c["nom"] for c in data["results"]], ["Nom00", "Nom01", "Nom02"])
+        self.assertIsNone(data["previous"])
+
+        response = await self.async_client.get(reverse("async_client_list"), {"page_size": 3, "cursor": data["next"]})
+        data = response.json()
+        self.assertEqual([c["nom"] for c in data["results"]], ["Nom03", "Nom04"])
+        self.assertIsNone(data["next"])
+
+        response = await self.async_client.get(reverse("async_client_list"), {"cursor": "xyz"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_search(self):
+        response = await self.async_client.get(reverse("async_client_list"), {"q": "Nom03"})
+        self.assertEqual([c["nom"] for c in response.json()["results"]], ["Nom03"])
+        response = await self.async_client.get(reverse("async_client_list"), {"q": "Autre"})
+        self.assertEqual(response.json()["results"], [])
+
+    async def test_detail_views(self):
+        response = await self.async_client.get(reverse("async_client_detail", args=[self.clients[1].pk]))
+        self.assertEqual(response.json()["nom"], "Nom01")
+        response = await self.async_client.get(reverse("async_client_detail", args=[self.autre.pk]))
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(reverse("async_assurance_detail", args=[self.assurance.pk]))
+        self.assertEqual(response.json()["type_assurance"], "Auto")
+        response = await self.async_client.get(reverse("async_assurance_list"))
+        self.assertEqual([a["id"] for a in response.json()["results"]], [self.assurance.pk])
+
+    async def test_dashboard(self):
+        response = await self.async_client.get(reverse("async_dashboard"))
+        self.assertEqual(response.status_code, 200)
+        branches = response.json()["branches"]
+        self.assertEqual([b["nom"] for b in branches], ["Douala"])
+        self.assertEqual(branches[0]["contrats_actifs"], 1)
+        # Pendant synchrone (benchmark_asgi) : même JSON
+        response = await self.async_client.get(reverse("dashboard_stats"))
+        self.assertEqual(response.json()["branches"], branches)
+
+
+# --------- TESTS DU BENCHMARK WSGI / ASGI ---------
+class BenchmarkAsgiCommandTests(TransactionTestCase):
+    """
+    La commande benchmark_asgi lance des requêtes depuis d'autres threads :
+    les données doivent être validées (TransactionTestCase).
+    """
+
+    def test_benchmark_command(self):
+        branche = Branche.objects.create(nom="Douala", ville="Douala")
+        Client.objects.create(
+            nom="Dupont", prenom="Jean", adresse="Rue", email="dupont@example.com",
+            telephone="6", branche=branche, date_inscription="2025-01-01",
+        )
+        Utilisateur.objects.create_superuser(username="admin", password="motdepasse123", email="a@example.com")
+        out = io.StringIO()
+        call_command("benchmark_asgi", requests=2, concurrency=2, host="testserver", stdout=out)
+        output = out.getvalue()
+        self.assertIn("ASGI, vue async", output)
+        self.assertNotIn("erreurs HTTP", output)
+
+
+# --------- TESTS DU PROFIL SQLITE ---------
+class SqliteProfileTests(TestCase):
+    """
+    Vérifie le profil SQLite (pragmas, transactions IMMEDIATE) et la relance
+    des instructions bloquées ("database is locked").
+    """
+
+    def _pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_and_transaction_mode(self):
+        self.assertEqual(self._pragma("busy_timeout"), 5000)
+        self.assertEqual(self._pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(self._pragma("cache_size"), -20000)
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+        self.assertIn(database.retry_on_lock, connection.execute_wrappers)
+
+    def _failing_executor(self, failures, message="database is locked"):
+        calls = []
+
+        def execute(sql, params, many, context):
+            calls.append(sql)
+            if len(calls) <= failures:
+                raise OperationalError(message)
+            return "ok"
+        return execute, calls
+
+    @mock.patch.object(database.time, "sleep")
+    def test_retries_with_backoff_outside_transaction(self, sleep):
+        context = {"connection": mock.Mock(in_atomic_block=False, get_autocommit=lambda: True)}
+        execute, calls = self._failing_executor(2)
+        self.assertEqual(database.retry_on_lock(execute, "INSERT ...", [], False, context), "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+        # BEGIN IMMEDIATE est relancé même si l'on entre dans un bloc atomique
+        context = {"connection": mock.Mock(in_atomic_block=True)}
+        execute, calls = self._failing_executor(1)
+        self.assertEqual(database.retry_on_lock(execute, "BEGIN IMMEDIATE", None, False, context), "ok")
+
+        # Abandon après DB_LOCK_RETRY_ATTEMPTS relances
+        context = {"connection": mock.Mock(in_atomic_block=False, get_autocommit=lambda: True)}
+        execute, calls = self._failing_executor(100)
+        with self.assertRaises(OperationalError):
+            database.retry_on_lock(execute, "UPDATE ...", [], False, context)
+        self.assertEqual(len(calls), database.LOCK_RETRY_ATTEMPTS + 1)
+
+    @mock.patch.object(database.time, "sleep")
+    def test_no_retry_inside_transaction_or_other_errors(self, sleep):
+        context = {"connection": mock.Mock(in_atomic_block=True)}
+        execute, calls = self._failing_executor(1)
+        with self.assertRaises(OperationalError):
+            database.retry_on_lock(execute, "UPDATE ...", [], False, context)
+        self.assertEqual(len(calls), 1)
+
+        context = {"connection": mock.Mock(in_atomic_block=False, get_autocommit=lambda: True)}
+        execute, calls = self._failing_executor(1, "no such table: x")
+        with self.assertRaises(OperationalError):
+            database.retry_on_lock(execute, "SELECT ...", [], False, context)
+        self.assertEqual(len(calls), 1)
+        sleep.assert_not_called()
+
+    def test_stress_command(self):
+        out = io.StringIO()
+        call_command("stress_sqlite", writers=4, readers=2, transactions=20, stdout=out)
+        production = out.getvalue().split("Profil de production")[1]
+        self.assertIn("80 réussies, 0 en erreur", production)
+
+
+# --------- TESTS DU ROUTAGE VERS LA RÉPLIQUE ---------
+class ReplicaRoutingTests(TestCase):
+    """
+    Vérifie le routage lecture / écriture : lectures sur la réplique, sauf dans une
+    transaction, pendant une requête non sûre, après une écriture ou sous le cookie
+    posé après une écriture (lire ses propres écritures).
+    """
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_mirror_replica_is_not_used(self):
+        # Pendant les tests, la réplique est un miroir de "default"
+        self.assertIsNone(routers.replica_alias())
+        self.assertEqual(Client.objects.all().db, "default")
+
+    @mock.patch.object(routers, "replica_alias", return_value="replica")
+    def test_reads_go_to_replica_until_a_write(self, _):
+        with mock.patch.object(connection, "in_atomic_block", False):
+            self.assertEqual(self.router.db_for_read(Client), "replica")
+            token = routers._request_state.set({"pinned": False, "written": False})
+            try:
+                self.assertEqual(self.router.db_for_read(Client), "replica")
+                self.assertEqual(self.router.db_for_write(Client), "default")
+                self.assertEqual(self.router.db_for_read(Client), "default")
+            finally:
+                routers._request_state.reset(token)
+        # Dans une transaction, on lit ce qu'on vient d'écrire
+        self.assertEqual(self.router.db_for_read(Client), "default")
+        self.assertFalse(self.router.allow_migrate("replica", "gestion"))
+
+    def _run(self, request, write=False):
+        seen = {}
+
+        def view(request):
+            seen.update(routers._request_state.get())
+            if write:
+                self.router.db_for_write(Client)
+            return HttpResponse()
+        response = routers.ReadYourWritesMiddleware(view)(request)
+        return seen["pinned"], response
+
+    def test_middleware_pins_reads_after_a_write(self):
+        pinned, response = self._run(self.factory.get("/"))
+        self.assertFalse(pinned)
+        self.assertNotIn(routers.PIN_COOKIE_NAME, response.cookies)
+
+        pinned, response = self._run(self.factory.post("/"), write=True)
+        self.assertTrue(pinned)
+        cookie = response.cookies[routers.PIN_COOKIE_NAME]
+        self.assertEqual(cookie["max-age"], routers.REPLICA_PIN_SECONDS)
+
+        request = self.factory.get("/")
+        request.COOKIES[routers.PIN_COOKIE_NAME] = cookie.value
+        self.assertTrue(self._run(request)[0])
+
+        # Cookie expiré ou illisible : retour sur la réplique
+        for value in ("1", "abc"):
+            request = self.factory.get("/")
+            request.COOKIES[routers.PIN_COOKIE_NAME] = value
+            self.assertFalse(self._run(request)[0])
+        self.assertIsNone(routers._request_state.get())
+
+    async def test_async_middleware(self):
+        async def view(request):
+            self.router.db_for_write(Client)
+            return HttpResponse()
+        response = await routers.ReadYourWritesMiddleware(view)(self.factory.get("/"))
+        self.assertIn(routers.PIN_COOKIE_NAME, response.cookies)
+
+    def test_api_write_sets_cookie(self):
+        admin = Utilisateur.objects.create_superuser(username="admin", password="motdepasse123", email="a@example.com")
+        client_http = DjangoClient()
+        client_http.force_login(admin)
+        response = client_http.post(reverse("branche-list"), {"nom": "Douala", "ville": "Douala"})
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(routers.PIN_COOKIE_NAME, response.cookies)
+
+
+# --------- TESTS DE LA RÉPLIQUE EN LECTURE SEULE ---------
+class ReplicaFileTests(TransactionTestCase):
+    """
+    Réplique réelle : "default" sur un fichier SQLite, "replica" sur le même fichier
+    ouvert en lecture seule (URI mode=ro), comme en local hors tests.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "intia.sqlite3")
+        # Schéma de la base de test copié dans le fichier
+        self._copy(connection, self.path)
+        self._connect("default", self.path)
+        self._connect("replica", f"file:{self.path}?mode=ro")
+
+    def _copy(self, source, path):
+        source.ensure_connection()
+        target = sqlite3.connect(path)
+        source.connection.backup(target)
+        target.close()
+
+    def _connect(self, alias, name):
+        config = {**connections.settings[alias], "NAME": name}
+        patcher = mock.patch.dict(connections.settings, {alias: config})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        original = connections[alias]
+        wrapper = load_backend(config["ENGINE"]).DatabaseWrapper(config, alias)
+        connections[alias] = wrapper
+        self.addCleanup(connections.__setitem__, alias, original)
+        self.addCleanup(wrapper.close)
+
+    def _stale_replica(self):
+        """Réplique figée sur l'état actuel de "default" (retard de réplication)."""
+        path = os.path.join(self.directory, "copie.sqlite3")
+        self._copy(connections["default"], path)
+        self._connect("replica", f"file:{path}?mode=ro")
+
+    def test_reads_use_replica_and_writes_are_refused(self):
+        self.assertEqual(routers.replica_alias(), "replica")
+        Branche.objects.create(nom="Douala", ville="Douala")
+        admin = Utilisateur.objects.create_superuser(username="admin", password="motdepasse123", email="a@example.com")
+        client_http = DjangoClient()
+        client_http.force_login(admin)
+
+        with CaptureQueriesContext(connections["replica"]) as replica, \
+                CaptureQueriesContext(connections["default"]) as primary:
+            response = client_http.get(reverse("branche-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["nom"] for row in response.json()["results"]], ["Douala"])
+        self.assertTrue(any('FROM "gestion_branche"' in q["sql"] for q in replica.captured_queries))
+        self.assertFalse(any('FROM "gestion_branche"' in q["sql"] for q in primary.captured_queries))
+        # L'utilisateur connecté est lu sur "default" (voir routers.py)
+        self.assertFalse(any("gestion_utilisateur" in q["sql"] for q in replica.captured_queries))
+
+        # Écriture envoyée par erreur à la réplique : refusée par SQLite
+        with self.assertRaisesMessage(OperationalError, "readonly"):
+            Branche.objects.using("replica").create(nom="Yaounde", ville="Yaounde")
+        self.assertEqual(Branche.objects.using("default").count(), 1)
+
+    def test_cached_user_and_session_ignore_stale_replica(self):
+        user = Utilisateur.objects.create_user(username="agent", password="ancien-motdepasse")
+        session = SessionStore()
+        session["_auth_user_id"] = str(user.pk)
+        session.create()
+        self._stale_replica()
+        self.assertEqual(Utilisateur.objects.using("replica").count(), 1)
+
+        # Mot de passe changé et session supprimée sur "default", pas encore sur la réplique
+        user.set_password("nouveau-motdepasse")
+        user.save()
+        SessionStore(session.session_key).delete()
+        backends.user_cache().clear()
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+
+        # Lectures hors requête épinglée : elles iraient sur la réplique
+        self.assertEqual(routers.PrimaryReplicaRouter().db_for_read(Client), "replica")
+        cached = backends.CachedModelBackend().get_user(user.pk)
+        self.assertTrue(cached.check_password("nouveau-motdepasse"))
+        self.assertTrue(backends.user_cache().get(backends.user_cache_key(user.pk)).check_password("nouveau-motdepasse"))
+        self.assertEqual(dict(SessionStore(session.session_key).load()), {})
+        self.assertFalse(SessionStore(session.session_key).exists(session.session_key))
+
+
+# --------- TESTS DU CACHE DES UTILISATEURS ---------
+class CachedUserTests(TestCase):
+    """
+    Vérifie le chargement de l'utilisateur connecté depuis le cache : aucune requête
+    pour la session, l'utilisateur et sa branche quand le cache est chaud, et
+    invalidation quand l'utilisateur ou sa branche change.
+    """
+
+    def setUp(self):
+        self.branche = Branche.objects.create(nom="Douala", ville="Douala")
+        self.agent = Utilisateur.objects.create_user(username="agent", password="motdepasse123", branch=self.branche)
+        self.client_http = DjangoClient()
+        self.assertTrue(self.client_http.login(username="agent", password="motdepasse123"))
+
+    def _auth_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_http.get(url)
+        tables = ('"django_session"', '"gestion_utilisateur"', '"gestion_branche"')
+        return response, [q["sql"] for q in queries.captured_queries if any(t in q["sql"] for t in tables)]
+
+    def test_cache_shared_between_workers(self):
+        # Autre worker : autre instance du backend, mêmes fichiers
+        other_worker = caches.create_connection("default")
+        backends.CachedModelBackend().get_user(self.agent.pk)
+        self.assertIsNotNone(other_worker.get(backends.user_cache_key(self.agent.pk)))
+        self.agent.set_password("nouveau-mot-de-passe")
+        self.agent.save()
+        self.assertIsNone(other_worker.get(backends.user_cache_key(self.agent.pk)))
+
+    def test_process_local_cache_refused(self):
+        self.assertEqual([e.id for e in run_checks(tags=["caches"]) if e.id.startswith("gestion.")], [])
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        with override_settings(CACHES=locmem):
+            ids = {e.id for e in run_checks(tags=["caches"])}
+        self.assertTrue({"gestion.E001", "gestion.E002"} <= ids)
+
+    def test_warm_cache_needs_no_auth_query(self):
+        url = reverse("client_list")
+        self.client_http.get(url)
+        response, auth_queries = self._auth_queries(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(auth_queries, [])
+        # La branche est chargée avec l'utilisateur
+        user = backends.CachedModelBackend().get_user(self.agent.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.branch.nom, "Douala")
+
+    def test_password_change_logs_out_other_sessions(self):
+        self.client_http.get(reverse("client_list"))
+        agent = Utilisateur.objects.get(pk=self.agent.pk)
+        agent.set_password("nouveaumotdepasse456")
+        agent.save()
+        response = self.client_http.get(reverse("client_list"))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse("login"), response["Location"])
+
+    def test_branch_changes_invalidate_cached_user(self):
+        self.client_http.get(reverse("home"))
+        self.branche.nom = "Douala Centre"
+        self.branche.save()
+        self.assertContains(self.client_http.get(reverse("home")), "Douala Centre")
+
+        self.branche.delete()
+        self.assertIsNone(backends.CachedModelBackend().get_user(self.agent.pk).branch)
+
+
+# --------- TESTS DE LA GÉNÉRATION DE DONNÉES ---------
+class SeedPortfolioTests(TestCase):
+    """
+    Vérifie la commande seed_portfolio : volumes demandés, données reproductibles
+    à graine égale, répartition inégale entre branches et cohérence du journal.
+    """
+
+    def _seed(self, **options):
+        out = io.StringIO()
+        call_command("seed_portfolio", contracts="300", seed=7, date="2026-01-15", batch_size=40, stdout=out, **options)
+        return out.getvalue()
+
+    def _contracts(self, branches):
+        return list(
+            Assurance.objects.filter(branche__in=branches).order_by("pk")
+            .values_list("type_assurance", "date_debut", "date_fin", "montant", "client__nom", "client__email")
+        )
+
+    def test_seed_is_reproducible_and_skewed(self):
+        output = self._seed()
+        self.assertIn("300 contrats", output)
+        first = list(Branche.objects.order_by("pk"))
+        self.assertEqual(len(first), 5)
+        self.assertEqual(Assurance.objects.count(), 300)
+        counts = [Assurance.objects.filter(branche=b).count() for b in first]
+        self.assertEqual(counts[0], max(counts))
+        self.assertTrue(Utilisateur.objects.filter(username="siege", role="SuperAdmin").exists())
+        self.assertTrue(Utilisateur.objects.filter(role="Agent", branch=first[0]).exists())
+        # Chaque objet créé est dans le journal de synchronisation
+        self.assertEqual(Changement.objects.count(), Branche.objects.count() + Client.objects.count() + 300)
+        self.assertEqual(StatistiqueBranche.objects.filter(calcule_le__isnull=False).count(), 5)
+
+        # Sans --append, la commande refuse d'écrire dans une base non vide
+        with self.assertRaises(CommandError):
+            self._seed()
+
+        # Même graine, autre taille de lot : mêmes données
+        call_command("seed_portfolio", contracts="300", seed=7, date="2026-01-15", batch_size=1000,
+                     append=True, stdout=io.StringIO())
+        second = list(Branche.objects.order_by("pk"))[5:]
+        self.assertEqual(self._contracts(first), self._contracts(second))
+
+    def test_scale_suffixes(self):
+        from .management.commands.seed_portfolio import parse_scale
+        self.assertEqual(parse_scale("1k"), 1000)
+        self.assertEqual(parse_scale("2.5M"), 2_500_000)
+        with self.assertRaises(CommandError):
+            parse_scale("beaucoup")
+
+
+# --------- TESTS DU BENCHMARK DES ROUTES ---------
+class BenchmarkUrlsCommandTests(TestCase):
+    """
+    Vérifie la commande benchmark_urls : routes découvertes, mesures par rôle,
+    sortie JSON et détection des régressions par rapport à une référence.
+    """
+
+    def setUp(self):
+        self.branche = Branche.objects.create(nom="Douala", ville="Douala")
+        client = Client.objects.create(
+            nom="Dupont", prenom="Jean", adresse="Rue", email="dupont@example.com",
+            telephone="6", branche=self.branche, date_inscription="2025-01-01",
+        )
+        Assurance.objects.create(
+            type_assurance="Auto", date_debut="2025-01-01", date_fin="2025-12-31",
+            montant=Decimal("100"), client=client, branche=self.branche,
+        )
+        Utilisateur.objects.create_user(username="siege", password="motdepasse123", role="SuperAdmin")
+        Utilisateur.objects.create_user(username="chef", password="motdepasse123", role="BranchAdmin", branch=self.branche)
+        Utilisateur.objects.create_user(username="agent", password="motdepasse123", branch=self.branche)
+        self.output = os.path.join(tempfile.mkdtemp(), "resultats.json")
+
+    def _run(self, **options):
+        call_command("benchmark_urls", iterations=2, warmup=0, host="testserver",
+                     stdout=io.StringIO(), stderr=io.StringIO(), **options)
+
+    def test_discovered_routes(self):
+        from .management.commands.benchmark_urls import discover_routes
+        names = {name for name, _ in discover_routes()}
+        self.assertTrue({"home", "client_list", "client-list", "client-detail", "assurance-expiring"} <= names)
+        # Déconnexion, suppressions et actions sans GET ne sont pas appelées
+        self.assertFalse({"logout", "client_delete", "client-bulk", "client-bulk-import"} & names)
+
+    def test_results_and_compare(self):
+        self._run(output=self.output)
+        with open(self.output, encoding="utf-8") as stream:
+            results = json.load(stream)["results"]
+        self.assertEqual({r["role"] for r in results}, {"SuperAdmin", "BranchAdmin", "Agent"})
+        self.assertTrue(all(r["status"] < 500 for r in results), [r for r in results if r["status"] >= 500])
+        detail = next(r for r in results if r["name"] == "client-detail" and r["role"] == "Agent")
+        self.assertEqual(detail["status"], 200)
+        self.assertGreater(detail["bytes"], 0)
+        self.assertLessEqual(detail["p50_ms"], detail["p99_ms"])
+
+        # Référence où l'accueil faisait moins de requêtes : régression signalée
+        with open(self.output, encoding="utf-8") as stream:
+            baseline = json.load(stream)
+        for result in baseline["results"]:
+            if result["name"] == "home":
+                result["queries"] = -1
+        with open(self.output, "w", encoding="utf-8") as stream:
+            json.dump(baseline, stream)
+        with self.assertRaisesMessage(CommandError, "régression"):
+            self._run(compare=self.output, only="home")
+
+    def test_temporary_caches_leave_shared_caches_alone(self):
+        from .management.commands.benchmark_urls import Command
+        caches["default"].set("session-en-service", 1)
+        directory = Path(tempfile.mkdtemp())
+        with Command().temporary_caches(directory):
+            self.assertIsNone(caches["default"].get("session-en-service"))
+            caches["listes"].set("liste-generee", 1)
+        self.assertEqual(caches["default"].get("session-en-service"), 1)
+        self.assertIsNone(caches["listes"].get("liste-generee"))
+        self.assertTrue(os.listdir(directory / "listes"))
+
+
+# --------- TESTS DU PROFILAGE DES REQUÊTES ---------
+class ProfilingMiddlewareTests(TestCase):
+    """
+    Vérifie le middleware de profilage : retiré quand il est désactivé,
+    en-tête Server-Timing, profils échantillonnés ou lents, rotation des fichiers.
+    """
+
+    def setUp(self):
+        self.branche = Branche.objects.create(nom="Douala", ville="Douala")
+        Utilisateur.objects.create_user(username="agent", password="motdepasse123", branch=self.branche)
+        self.directory = tempfile.mkdtemp()
+
+    def _client(self, **constants):
+        constants = {"PROFILING_ENABLED": True, "PROFILING_DIR": profiling.Path(self.directory), **constants}
+        patcher = mock.patch.multiple(profiling, **constants)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Nouveau client : la chaîne de middlewares est reconstruite avec les constantes
+        http = DjangoClient()
+        http.login(username="agent", password="motdepasse123")
+        return http
+
+    def _profiles(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse("login"))
+        self.assertNotIn("Server-Timing", response)
+
+    def test_server_timing_header(self):
+        response = self._client().get(reverse("client_list"))
+        timing = response["Server-Timing"]
+        self.assertIn('view;desc="client_list"', timing)
+        for metric in ("total;dur=", "db;dur=", "tpl;dur=", "app;dur="):
+            self.assertIn(metric, timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* requêtes"')
+        self.assertNotRegex(timing, r"tpl;dur=0\.0,")
+        # Sans échantillonnage ni seuil, aucun profil
+        self.assertEqual(self._profiles(), [])
+
+    def test_sampled_profiles_and_rotation(self):
+        http = self._client(PROFILING_SAMPLE_RATE=1.0, PROFILING_MAX_FILES=2)
+        for _ in range(4):
+            http.get(reverse("client_list"))
+        profiles = self._profiles()
+        self.assertEqual(len(profiles), 2)
+        self.assertTrue(all(name.endswith(".prof") and "client_list" in name for name in profiles))
+        pstats.Stats(os.path.join(self.directory, profiles[0]))
+
+    def test_slow_threshold(self):
+        http = self._client(PROFILING_SLOW_MS=60_000)
+        http.get(reverse("client_list"))
+        self.assertEqual(self._profiles(), [])
+        profiling.PROFILING_SLOW_MS = 0
+        http.get(reverse("client_list"))
+        self.assertEqual(len(self._profiles()), 1)
+
+    def test_concurrent_requests(self):
+        self._client(PROFILING_SLOW_MS=0)
+        barrier = threading.Barrier(2, timeout=10)
+
+        def view(request):
+            # Les deux requêtes sont en cours en même temps
+            barrier.wait()
+            return HttpResponse("ok")
+
+        middleware = profiling.ProfilingMiddleware(view)
+        factory = RequestFactory()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            responses = list(executor.map(lambda _: middleware(factory.get("/")), range(2)))
+        self.assertTrue(all(r.status_code == 200 and "total;dur=" in r["Server-Timing"] for r in responses))
+        # Un seul profileur actif à la fois : une seule des deux requêtes est profilée
+        self.assertEqual(len(self._profiles()), 1)
+
+        # Autre outil de profilage déjà actif : la requête est servie sans profil
+        with mock.patch.object(profiling.cProfile.Profile, "enable", side_effect=ValueError("already active")):
+            response = middleware.__class__(lambda request: HttpResponse("ok"))(factory.get("/"))
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertEqual(len(self._profiles()), 1)
+        self.assertFalse(profiling._profiler_lock.locked())
+
+
+# --------- TESTS DU JOURNAL DES REQUÊTES LENTES ---------
+class SlowQueryLogTests(TestCase):
+    """
+    Vérifie le journal des requêtes lentes : SQL normalisé, appelant, forme des
+    paramètres, plan SQLite, parcours complets signalés et rapport slow_queries.
+    """
+
+    def setUp(self):
+        self.branche = Branche.objects.create(nom="Douala", ville="Douala")
+        Client.objects.create(
+            nom="Dupont", prenom="Jean", adresse="Rue de la Joie", email="dupont@example.com",
+            telephone="6", branche=self.branche, date_inscription="2025-01-01",
+        )
+        self.log = slow_queries.Path(tempfile.mkdtemp()) / "lentes.log"
+        # Seuil à 0 : toutes les requêtes sont "lentes"
+        patcher = mock.patch.multiple(slow_queries, SLOW_QUERY_MS=0, SLOW_QUERY_LOG=self.log, _plans={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            slow_queries.normalize_sql('SELECT "U0"."id" FROM t U0 WHERE x IN (%s, %s, %s) AND y = \'a\'  LIMIT 21'),
+            'SELECT "U0"."id" FROM t U0 WHERE x IN (...) AND y = ? LIMIT ?',
+        )
+        self.assertEqual(slow_queries.params_shape([1, 2, "a", None], False), "int×2, str, NoneType")
+
+    def test_entry_and_full_scan(self):
+        self.assertIn(slow_queries.log_slow_query, connection.execute_wrappers)
+        list(Client.objects.filter(adresse__contains="Joie"))
+        list(Client.objects.filter(email="dupont@example.com"))
+        entries = [json.loads(line) for line in self.log.read_text(encoding="utf-8").splitlines()]
+        scan, search_ = entries[-2:]
+        self.assertEqual(scan["full_scans"], ["gestion_client"])
+        self.assertNotIn("Joie", scan["sql"])
+        self.assertEqual(scan["params"], "str")
+        self.assertTrue(scan["caller"].startswith("gestion/tests.py:"))
+        self.assertTrue(any(detail.startswith("SCAN") for detail in scan["plan"]))
+        # Recherche par index : pas de parcours complet
+        self.assertEqual(search_["full_scans"], [])
+        self.assertTrue(any("INDEX" in detail for detail in search_["plan"]))
+
+    def test_report_command(self):
+        for _ in range(3):
+            list(Client.objects.filter(adresse__contains="Joie"))
+        Branche.objects.count()
+        out = io.StringIO()
+        call_command("slow_queries", log=str(self.log), top=1, sort="count", stdout=out)
+        report = out.getvalue()
+        self.assertIn("Parcours complet : gestion_client", report)
+        self.assertIn("3 fois", report)
+        self.assertIn("gestion/tests.py:", report)
+
+        out = io.StringIO()
+        call_command("slow_queries", log=str(self.log), json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(sum(r["count"] for r in results), len(self.log.read_text(encoding="utf-8").splitlines()))
+
+
+# --------- TESTS DES MÉTRIQUES ---------
+class MetricsTests(TestCase):
+    """
+    Vérifie les métriques par vue : compteurs, histogramme, requêtes SQL et caches,
+    somme des fichiers des autres processus et accès à l'endpoint Prometheus.
+    """
+
+    def setUp(self):
+        self.branche = Branche.objects.create(nom="Douala", ville="Douala")
+        Client.objects.create(
+            nom="Dupont", prenom="Jean", adresse="Rue", email="dupont@example.com",
+            telephone="6", branche=self.branche, date_inscription="2025-01-01",
+        )
+        self.agent = Utilisateur.objects.create_user(username="agent", password="motdepasse123", branch=self.branche)
+        self.siege = Utilisateur.objects.create_user(username="siege", password="motdepasse123", role="SuperAdmin")
+        self.directory = tempfile.mkdtemp()
+        self.store = metrics.MetricsStore(self.directory)
+        patcher = mock.patch.object(metrics, "store", self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        caching.list_cache().clear()
+
+    def _metrics(self):
+        self.client.force_login(self.siege)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_per_view_metrics(self):
+        self.client.force_login(self.agent)
+        self.client.get(reverse("client_list"))
+        self.client.get(reverse("client_list"))
+        text = self._metrics()
+        self.assertIn('intia_http_requests_total{view="client_list",method="GET",status="200"} 2', text)
+        self.assertIn('intia_http_request_duration_seconds_bucket{view="client_list",le="+Inf"} 2', text)
+        self.assertIn('intia_http_request_duration_seconds_count{view="client_list"} 2', text)
+        self.assertRegex(text, r'intia_db_queries_total\{view="client_list"\} [1-9]')
+        self.assertIn('intia_cache_requests_total{view="client_list",cache="listes",result="miss"} 1', text)
+        self.assertIn('intia_cache_requests_total{view="client_list",cache="listes",result="hit"} 1', text)
+        self.assertIn("# TYPE intia_http_request_duration_seconds histogram", text)
+
+    def test_other_processes(self):
+        self.client.force_login(self.agent)
+        self.client.get(reverse("client_list"))
+        # Processus en cours (autre conteneur, même pid) et processus terminés (aggregate.json)
+        other = {"requests": {"client_list\tGET\t200": 5}, "latency": {}, "db_queries": {}, "db_seconds": {}, "cache": {}}
+        for name in (f"process-autre-{os.getpid()}-0000.json", metrics.AGGREGATE_FILE):
+            with open(os.path.join(self.directory, name), "w", encoding="utf-8") as stream:
+                json.dump(other, stream)
+        text = self._metrics()
+        self.assertIn('intia_http_requests_total{view="client_list",method="GET",status="200"} 11', text)
+        # Le fichier de ce processus a été écrit (premier enregistrement)
+        self.assertTrue(self.store.path.exists())
+
+    def test_exit_keeps_counters(self):
+        self.client.force_login(self.agent)
+        self.client.get(reverse("client_list"))
+        worker = metrics.MetricsStore(self.directory)
+        with mock.patch.object(metrics, "METRICS_FLUSH_INTERVAL", 3600):
+            for _ in range(3):
+                worker.record("client_list", "GET", 200, 0.01, {"queries": 1, "db_seconds": 0.001, "cache": {}})
+        self.assertEqual(worker.collect()["requests"]["client_list\tGET\t200"], 4)
+        # Fin du worker : compteurs non écrits compris, la somme ne baisse pas
+        path = worker.path
+        worker.close()
+        worker.close()
+        self.assertFalse(path.exists())
+        self.assertEqual(self.store.collect()["requests"]["client_list\tGET\t200"], 4)
+        self.assertIn('intia_http_requests_total{view="client_list",method="GET",status="200"} 4', self._metrics())
+
+    def test_access(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.agent)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.client.logout()
+        with mock.patch.object(metrics, "METRICS_TOKEN", "secret"):
+            self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+            self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer autre").status_code, 302)
+
+    def test_async_view_queries(self):
+        async_client = AsyncClient()
+        async_client.force_login(self.agent)
+        # Requêtes SQL exécutées dans les threads de sync_to_async : comptées pour la vue
+        response = async_to_sync(async_client.get)(reverse("async_client_list"))
+        self.assertEqual(response.status_code, 200)
+        text = metrics.render()
+        self.assertIn('intia_http_requests_total{view="async_client_list",method="GET",status="200"} 1', text)
+        self.assertRegex(text, r'intia_db_queries_total\{view="async_client_list"\} [1-9]')
+
+
+# --------- TESTS DES CHAMPS PARTIELS DE L'API (?fields=) ---------
+class SparseFieldsetTests(TestCase):
+    """
+    Vérifie ?fields= / ?omit= sur l'API : champs du JSON, colonnes lues en SQL,
+    clés étrangères sans requête supplémentaire, validation et écritures inchangées.
+    """
+
+    def setUp(self):
+        self.branche = Branche.objects.create(nom="Douala", ville="Douala")
+        self.clients = [
+            Client.objects.create(
+                nom=f"Nom{i}", prenom="Jean", adresse="Longue adresse " * 20, email=f"c{i}@example.com",
+                telephone="6", branche=self.branche, date_inscription="2025-01-01",
+            )
+            for i in range(3)
+        ]
+        today = timezone.localdate()
+        for i, client in enumerate(self.clients):
+            Assurance.objects.create(
+                type_assurance="Auto", date_debut=today - datetime.timedelta(days=10),
+                date_fin=today + datetime.timedelta(days=5 + i),
+                montant=Decimal("100"), client=client, branche=self.branche,
+            )
+        agent = Utilisateur.objects.create_user(username="agent", password="motdepasse123", branch=self.branche)
+        self.client_http = DjangoClient()
+        self.client_http.force_login(agent)
+        caching.list_cache().clear()
+        # Utilisateur et session en cache : seules les requêtes de la vue sont comptées
+        self.client_http.get(reverse("branche-list"))
+
+    def _get(self, name, params, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_http.get(reverse(name, **kwargs), params)
+        return response, "\n".join(q["sql"] for q in queries)
+
+    def test_fields_shrink_payload_and_columns(self):
+        response, sql = self._get("client-list", {"fields": "id,nom,prenom"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([set(row) for row in response.json()["results"]], [{"id", "nom", "prenom"}] * 3)
+        self.assertNotIn('"gestion_client"."adresse"', sql)
+
+        response, sql = self._get("client-list", {"omit": "adresse"})
+        row = response.json()["results"][0]
+        self.assertNotIn("adresse", row)
+        self.assertIn("email", row)
+        self.assertNotIn('"gestion_client"."adresse"', sql)
+
+        # Sans paramètre : tous les champs
+        response, sql = self._get("client-list", {})
+        self.assertIn("adresse", response.json()["results"][0])
+        self.assertIn('"gestion_client"."adresse"', sql)
+
+    def test_foreign_key_without_extra_query(self):
+        with CaptureQueriesContext(connection) as full:
+            self.client_http.get(reverse("assurance-list"))
+        caching.list_cache().clear()
+        with CaptureQueriesContext(connection) as sparse:
+            response = self.client_http.get(reverse("assurance-list"), {"fields": "client,branche"})
+        rows = response.json()["results"]
+        self.assertEqual(rows[0], {"client": self.clients[0].pk, "branche": self.branche.pk})
+        self.assertEqual(len(sparse), len(full))
+        self.assertNotIn('"gestion_assurance"."montant"', "\n".join(q["sql"] for q in sparse))
+
+    def test_detail_and_cursor_ordering(self):
+        response, _ = self._get("client-detail", {"fields": "nom"}, args=[self.clients[0].pk])
+        self.assertEqual(response.json(), {"nom": "Nom0"})
+        # Pagination par date de fin : la colonne de tri reste lue, pas de requête par objet
+        with CaptureQueriesContext(connection) as full:
+            self.client_http.get(reverse("assurance-expiring"), {"horizon": "30", "page_size": "2"})
+        with CaptureQueriesContext(connection) as sparse:
+            response = self.client_http.get(reverse("assurance-expiring"), {"horizon": "30", "page_size": "2", "fields": "id"})
+        self.assertEqual(response.json()["results"][0].keys(), {"id"})
+        self.assertIsNotNone(response.json()["next"])
+        self.assertEqual(len(sparse), len(full))
+
+    def test_unknown_field_and_writes(self):
+        response = self.client_http.get(reverse("client-list"), {"fields": "nom,mot_de_passe"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("mot_de_passe", response.json()["detail"])
+        # Les écritures renvoient l'objet complet
+        response = self.client_http.patch(
+            reverse("client-detail", args=[self.clients[0].pk]) + "?fields=nom",
+            json.dumps({"prenom": "Paul"}), content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["prenom"], "Paul")
+        self.assertIn("adresse", response.json())
+        self.clients[0].refresh_from_db()
+        self.assertEqual(self.clients[0].adresse, "Longue adresse " * 20)
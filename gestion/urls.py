@@ -2,16 +2,23 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ClientListView, ClientCreateView, ClientUpdateView, ClientDeleteView,
-    AssuranceListView, AssuranceCreateView, AssuranceUpdateView, AssuranceDeleteView,
+    AssuranceListView, ExpiringAssuranceListView, AssuranceCreateView, AssuranceUpdateView, AssuranceDeleteView,
     BrancheListView, BrancheCreateView, BrancheUpdateView, BrancheDeleteView,
-    ClientViewSet, AssuranceViewSet, BrancheViewSet,
-    login_view, logout_view, add_employee_view, employee_list_view, home_view
+    ClientViewSet, AssuranceViewSet, BrancheViewSet, SyncViewSet,
+    login_view, logout_view, add_employee_view, employee_list_view, home_view,
+    export_assurances_view, export_clients_view,
+    autocomplete_clients_view, autocomplete_branches_view, dashboard_stats_view, cache_stats_view, metrics_view,
+)
+from .async_views import (
+    async_client_list_view, async_client_detail_view,
+    async_assurance_list_view, async_assurance_detail_view, async_dashboard_view,
 )
 
 router = DefaultRouter()
 router.register(r'clients', ClientViewSet)
 router.register(r'assurances', AssuranceViewSet)
 router.register(r'branches', BrancheViewSet)
+router.register(r'sync', SyncViewSet, basename='sync')
 
 urlpatterns = [
     # --------- URL D'ACCUEIL ---------
@@ -32,6 +39,7 @@ urlpatterns = [
     path('clients/<int:pk>/delete/', ClientDeleteView.as_view(), name='client_delete'),
 
     path('assurances/', AssuranceListView.as_view(), name='assurance_list'),
+    path('assurances/echeances/', ExpiringAssuranceListView.as_view(), name='assurance_expiring'),
     path('assurances/add/', AssuranceCreateView.as_view(), name='assurance_add'),
     path('assurances/<int:pk>/edit/', AssuranceUpdateView.as_view(), name='assurance_edit'),
     path('assurances/<int:pk>/delete/', AssuranceDeleteView.as_view(), name='assurance_delete'),
@@ -40,5 +48,28 @@ urlpatterns = [
     path('branches/add/', BrancheCreateView.as_view(), name='branche_add'),
     path('branches/<int:pk>/edit/', BrancheUpdateView.as_view(), name='branche_edit'),
     path('branches/<int:pk>/delete/', BrancheDeleteView.as_view(), name='branche_delete'),
+
+    # --------- URLs D'AUTOCOMPLÉTION (JSON) ---------
+    path('autocomplete/clients/', autocomplete_clients_view, name='autocomplete_clients'),
+    path('autocomplete/branches/', autocomplete_branches_view, name='autocomplete_branches'),
+
+    # --------- URLs D'EXPORT (CSV / NDJSON) ---------
+    path('exports/assurances/', export_assurances_view, name='export_assurances'),
+    path('exports/clients/', export_clients_view, name='export_clients'),
+
+    # --------- TABLEAU DE BORD (JSON) ---------
+    path('stats/dashboard/', dashboard_stats_view, name='dashboard_stats'),
+
+    # --------- STATISTIQUES TECHNIQUES (réservé au siège) ---------
+    path('stats/cache/', cache_stats_view, name='cache_stats'),
+    path('stats/metrics/', metrics_view, name='metrics'),
+
+    # --------- URLs DE LECTURE ASYNCHRONES (JSON, pour un déploiement ASGI) ---------
+    path('async/clients/', async_client_list_view, name='async_client_list'),
+    path('async/clients/<int:pk>/', async_client_detail_view, name='async_client_detail'),
+    path('async/assurances/', async_assurance_list_view, name='async_assurance_list'),
+    path('async/assurances/<int:pk>/', async_assurance_detail_view, name='async_assurance_detail'),
+    path('async/dashboard/', async_dashboard_view, name='async_dashboard'),
+
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
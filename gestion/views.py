@@ -5,99 +5,463 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.contrib.auth import get_user_model
 from .models import Client, Assurance, Branche
-from .forms import ClientForm, AssuranceForm, BrancheForm, LoginForm, AddEmployeeForm
+from .forms import (
+    ClientForm, AssuranceForm, BrancheForm, LoginForm, AddEmployeeForm, BrancheScopedFormMixin,
+)
+from .pagination import ExpiringCursorPagination, KeysetPaginationMixin, OptionalOffsetPaginationMixin
+from .bulk import BulkModelViewSetMixin
+from .caching import CachedListViewMixin, CachedListViewSetMixin
+from .conditional import ConditionalViewSetMixin
+from .fieldsets import SparseFieldsetViewSetMixin
+from .sync import SYNC_MAX_PAGE_SIZE, SYNC_PAGE_SIZE, ResyncRequired, changes_since
+from . import caching
+from .search import search_clients
+from . import dashboard
+from . import metrics
+from .importers import (
+    ClientImporter, AssuranceImporter, IMPORT_ENCODING, IMPORT_FORMATS, ImportEncodingError,
+    check_encoding, decode_lines, guess_format, read_records,
+)
+from .exports import (
+    ASSURANCE_COLUMNS, CLIENT_COLUMNS, EXPORT_FORMATS, filter_export, streaming_export,
+)
 
 # On récupère le modèle utilisateur personnalisé
 Utilisateur = get_user_model()
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from .serializers import ClientSerializer, AssuranceSerializer, BrancheSerializer
 
+# --------- FILTRAGE PAR BRANCHE ---------
+class BrancheScopedViewMixin:
+    """
+    Vues génériques : ne montre que les objets de la branche de l'utilisateur
+    (les SuperAdmin voient tout) et restreint les choix des formulaires de la même façon.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().for_user(self.request.user)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        # Seuls nos formulaires savent filtrer leurs choix (DeleteView utilise un Form simple)
+        if issubclass(self.get_form_class(), BrancheScopedFormMixin):
+            kwargs['user'] = self.request.user
+        return kwargs
+
+
+class BrancheScopedViewSetMixin:
+    """
+    ViewSets : même filtrage par branche, y compris pour les clés étrangères
+    acceptées par les serializers (impossible de rattacher un objet à une autre branche).
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().for_user(self.request.user)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = getattr(serializer, 'child', serializer).fields
+        for field in fields.values():
+            queryset = getattr(field, 'queryset', None)
+            if queryset is not None and hasattr(queryset, 'for_user'):
+                field.queryset = queryset.for_user(self.request.user)
+        return serializer
+
+
 # --------- VUES WEB PROTÉGÉES (nécessitent une connexion) ---------
 # LoginRequiredMixin : redirige vers la page de login si l'utilisateur n'est pas connecté
-class ClientListView(LoginRequiredMixin, ListView):
+# BrancheScopedViewMixin : un employé ne voit que les données de sa branche
+# KeysetPaginationMixin : pagination par curseur optionnelle (?pagination=keyset)
+class ClientListView(LoginRequiredMixin, BrancheScopedViewMixin, CachedListViewMixin, KeysetPaginationMixin, ListView):
     model = Client
     template_name = 'client_list.html'
     context_object_name = 'clients'
     paginate_by = 10
+    keyset_ordering = 'nom'
+    # select_related : la branche est chargée dans la même requête (jointure SQL)
+    # only() : on ne lit que les colonnes affichées dans client_list.html
+    queryset = Client.objects.select_related('branche').only('nom', 'prenom', 'branche__nom')
+
+    def get_queryset(self):
+        # ?q= : recherche plein texte, résultats triés par pertinence (voir search.py)
+        queryset = super().get_queryset()
+        query = self.request.GET.get('q', '').strip()
+        if query:
+            queryset = search_clients(queryset, query)
+        return queryset
+
+    def use_keyset(self):
+        # Les résultats d'une recherche sont triés par pertinence, pas par nom
+        return not self.request.GET.get('q', '').strip() and super().use_keyset()
 
-class ClientCreateView(LoginRequiredMixin, CreateView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['q'] = self.request.GET.get('q', '')
+        return context
+
+class ClientCreateView(LoginRequiredMixin, BrancheScopedViewMixin, CreateView):
     model = Client
     form_class = ClientForm
     template_name = 'client_form.html'
     success_url = '/clients/'
 
-class ClientUpdateView(LoginRequiredMixin, UpdateView):
+class ClientUpdateView(LoginRequiredMixin, BrancheScopedViewMixin, UpdateView):
     model = Client
     form_class = ClientForm
     template_name = 'client_form.html'
     success_url = '/clients/'
 
-class ClientDeleteView(LoginRequiredMixin, DeleteView):
+class ClientDeleteView(LoginRequiredMixin, BrancheScopedViewMixin, DeleteView):
     model = Client
     success_url = '/clients/'
 
 # Web Views pour Assurance (protégées)
-class AssuranceListView(LoginRequiredMixin, ListView):
+class AssuranceListView(LoginRequiredMixin, BrancheScopedViewMixin, CachedListViewMixin, KeysetPaginationMixin, ListView):
     model = Assurance
     template_name = 'assurance_list.html'
     context_object_name = 'assurances'
     paginate_by = 10
+    keyset_ordering = 'date_fin'
+    # Le template affiche assurance.client et assurance.branche : sans jointure,
+    # chaque ligne déclencherait 2 requêtes supplémentaires (problème N+1)
+    queryset = Assurance.objects.select_related('client', 'branche').only(
+        'type_assurance', 'montant', 'date_debut', 'date_fin',
+        'client__nom', 'client__prenom', 'branche__nom',
+    )
+
+class ExpiringAssuranceListView(AssuranceListView):
+    """
+    Liste des échéances : contrats actifs qui expirent dans les 7, 30 ou 90 prochains jours
+    (?horizon=), filtrable par branche (?branche=).
+    Les lignes sont lues par intervalle sur l'index (branche, date_fin), en mode keyset
+    (pas de COUNT) ; les compteurs par horizon viennent des statistiques précalculées.
+    """
+    template_name = 'assurance_expiring.html'
+    paginate_by = 20
+    pagination_mode = 'keyset'
+
+    def get(self, request, *args, **kwargs):
+        try:
+            self.horizon, self.branche_id = dashboard.parse_expiring_params(request.GET)
+        except ValueError as exc:
+            return HttpResponseBadRequest(str(exc))
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return dashboard.expiring_contracts(super().get_queryset(), self.horizon, self.branche_id)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        statistiques = dashboard.branch_statistics(self.request.user)
+        counts = dashboard.expiring_counts(statistiques, self.branche_id)
+        context.update({
+            'horizon': self.horizon,
+            'horizons': [(horizon, counts[horizon]) for horizon in dashboard.EXPIRING_HORIZONS],
+            'branches': [branche for branche, _ in statistiques],
+            'branche_id': self.branche_id,
+        })
+        return context
 
-class AssuranceCreateView(LoginRequiredMixin, CreateView):
+class AssuranceCreateView(LoginRequiredMixin, BrancheScopedViewMixin, CreateView):
     model = Assurance
     form_class = AssuranceForm
     template_name = 'assurance_form.html'
     success_url = '/assurances/'
 
-class AssuranceUpdateView(LoginRequiredMixin, UpdateView):
+class AssuranceUpdateView(LoginRequiredMixin, BrancheScopedViewMixin, UpdateView):
     model = Assurance
     form_class = AssuranceForm
     template_name = 'assurance_form.html'
     success_url = '/assurances/'
 
-class AssuranceDeleteView(LoginRequiredMixin, DeleteView):
+class AssuranceDeleteView(LoginRequiredMixin, BrancheScopedViewMixin, DeleteView):
     model = Assurance
     success_url = '/assurances/'
 
 # Web Views pour Branche (protégées)
-class BrancheListView(LoginRequiredMixin, ListView):
+class BrancheListView(LoginRequiredMixin, BrancheScopedViewMixin, CachedListViewMixin, KeysetPaginationMixin, ListView):
     model = Branche
     template_name = 'branche_list.html'
     context_object_name = 'branches'
     paginate_by = 10
+    keyset_ordering = 'nom'
 
-class BrancheCreateView(LoginRequiredMixin, CreateView):
+class BrancheCreateView(LoginRequiredMixin, BrancheScopedViewMixin, CreateView):
     model = Branche
     form_class = BrancheForm
     template_name = 'branche_form.html'
     success_url = '/branches/'
 
-class BrancheUpdateView(LoginRequiredMixin, UpdateView):
+class BrancheUpdateView(LoginRequiredMixin, BrancheScopedViewMixin, UpdateView):
     model = Branche
     form_class = BrancheForm
     template_name = 'branche_form.html'
     success_url = '/branches/'
 
-class BrancheDeleteView(LoginRequiredMixin, DeleteView):
+class BrancheDeleteView(LoginRequiredMixin, BrancheScopedViewMixin, DeleteView):
     model = Branche
     success_url = '/branches/'
 
 # API Viewsets
-class ClientViewSet(viewsets.ModelViewSet):
-    queryset = Client.objects.all()
+class ImportActionMixin:
+    """
+    Ajoute POST /api/<ressource>/import/ : import en masse d'un fichier CSV ou NDJSON
+    (champ 'file', format déduit de l'extension ou du champ 'format', encodage UTF-8
+    ou celui du champ 'encoding').
+    Mêmes règles que la commande `manage.py import_portfolio`.
+    """
+
+    importer_class = None
+
+    @action(detail=False, methods=['post'], url_path='import',
+            parser_classes=[MultiPartParser], permission_classes=[IsAuthenticated])
+    def bulk_import(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': "Fichier manquant (champ 'file')."}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.data.get('format') or guess_format(upload.name)
+        if fmt not in IMPORT_FORMATS:
+            return Response({'detail': "Format inconnu (csv ou ndjson)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        encoding = request.data.get('encoding') or IMPORT_ENCODING
+        if not check_encoding(encoding):
+            return Response({'detail': f"Encodage inconnu : {encoding}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Lecture en flux du fichier envoyé, sans le charger entièrement en mémoire
+        stream = decode_lines(upload.file, encoding)
+        try:
+            result = self.importer_class(user=request.user).run(read_records(stream, fmt))
+        except ImportEncodingError as exc:
+            return Response({'detail': str(exc), **exc.result.as_dict()}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict())
+
+
+# Les serializers exposent les clés étrangères sous forme d'id (branche_id, client_id) :
+# ces colonnes sont déjà dans la ligne, une jointure n'apporterait rien.
+# Le nombre de requêtes reste donc constant quelle que soit la taille de la page.
+# La pagination (curseur par défaut, offset sur demande) est définie dans pagination.py ;
+# le tri sur l'id sert aussi à la pagination par offset.
+# BulkModelViewSetMixin : création / modification / suppression en masse (voir bulk.py).
+# BrancheScopedViewSetMixin : filtrage par branche de l'utilisateur.
+# SparseFieldsetViewSetMixin : ?fields= / ?omit= réduisent le JSON et les colonnes lues (voir fieldsets.py).
+class ClientViewSet(BrancheScopedViewSetMixin, SparseFieldsetViewSetMixin, ConditionalViewSetMixin, CachedListViewSetMixin, BulkModelViewSetMixin, ImportActionMixin, OptionalOffsetPaginationMixin, viewsets.ModelViewSet):
+    queryset = Client.objects.order_by('id')
     serializer_class = ClientSerializer
+    importer_class = ClientImporter
+
+    def get_queryset(self):
+        # ?q= : recherche plein texte classée par pertinence
+        queryset = super().get_queryset()
+        query = self.request.query_params.get('q', '').strip()
+        if query and self.action == 'list':
+            queryset = search_clients(queryset, query)
+        return queryset
 
-class AssuranceViewSet(viewsets.ModelViewSet):
-    queryset = Assurance.objects.all()
+    def use_offset_pagination(self):
+        # La pagination par curseur impose un tri sur l'id : une recherche
+        # (triée par pertinence) est donc paginée par offset
+        return bool(self.request.query_params.get('q', '').strip()) or super().use_offset_pagination()
+
+class AssuranceViewSet(BrancheScopedViewSetMixin, SparseFieldsetViewSetMixin, ConditionalViewSetMixin, CachedListViewSetMixin, BulkModelViewSetMixin, ImportActionMixin, OptionalOffsetPaginationMixin, viewsets.ModelViewSet):
+    queryset = Assurance.objects.order_by('id')
     serializer_class = AssuranceSerializer
+    importer_class = AssuranceImporter
+
+    @action(detail=False, methods=['get'], url_path='expiring', pagination_class=ExpiringCursorPagination)
+    def expiring(self, request):
+        """
+        GET /api/assurances/expiring/?horizon=7|30|90&branche=<id>
+        Contrats actifs qui expirent dans l'horizon, par date de fin croissante.
+        """
+        try:
+            horizon, branche_id = dashboard.parse_expiring_params(request.query_params)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = dashboard.expiring_contracts(self.get_queryset(), horizon, branche_id)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
 
-class BrancheViewSet(viewsets.ModelViewSet):
-    queryset = Branche.objects.all()
+    @action(detail=False, methods=['get'], url_path='expiring/summary')
+    def expiring_summary(self, request):
+        """
+        GET /api/assurances/expiring/summary/
+        Nombre de contrats expirant sous 7, 30 et 90 jours, par branche visible.
+        Lu dans les statistiques précalculées : la table des contrats n'est pas interrogée.
+        """
+        statistiques = dashboard.branch_statistics(request.user)
+        return Response({
+            'horizons': list(dashboard.EXPIRING_HORIZONS),
+            'branches': [
+                {
+                    'branche': branche.pk,
+                    'nom': branche.nom,
+                    'expirant': {
+                        str(horizon): getattr(stat, dashboard.expiring_field(horizon))
+                        for horizon in dashboard.EXPIRING_HORIZONS
+                    },
+                }
+                for branche, stat in statistiques
+            ],
+            'total': {str(horizon): count for horizon, count in dashboard.expiring_counts(statistiques).items()},
+        })
+
+class BrancheViewSet(BrancheScopedViewSetMixin, SparseFieldsetViewSetMixin, ConditionalViewSetMixin, CachedListViewSetMixin, BulkModelViewSetMixin, OptionalOffsetPaginationMixin, viewsets.ModelViewSet):
+    queryset = Branche.objects.order_by('id')
     serializer_class = BrancheSerializer
 
 
+class SyncViewSet(viewsets.ViewSet):
+    """
+    GET /api/sync/?since=<jeton>&limit=N
+    Changements (créations, modifications, suppressions) des branches, clients et contrats
+    visibles par l'utilisateur depuis le jeton. Sans jeton : tout le périmètre.
+    Réponse 410 si le jeton n'est plus valable : l'application doit tout resynchroniser.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        limit = request.query_params.get('limit', '')
+        if limit and not limit.isdigit():
+            return Response({'detail': "Le paramètre 'limit' doit être un entier."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(int(limit or SYNC_PAGE_SIZE), SYNC_MAX_PAGE_SIZE) or SYNC_PAGE_SIZE
+        try:
+            changes, token, has_more = changes_since(request.user, request.query_params.get('since'), limit)
+        except ResyncRequired:
+            return Response(
+                {'detail': "Jeton de synchronisation invalide : resynchronisation complète nécessaire."},
+                status=status.HTTP_410_GONE,
+            )
+        return Response({'changes': changes, 'token': token, 'has_more': has_more})
+
+
+# --------- EXPORTS (CSV / NDJSON en streaming) ---------
+
+def _export_view(request, queryset, columns, date_field, filename):
+    """
+    Logique commune aux exports : format (?format=csv|ndjson), filtres, puis streaming.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Format d'export inconnu (csv ou ndjson).")
+    try:
+        queryset = filter_export(queryset, request.GET, date_field)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    return streaming_export(queryset, columns, fmt, filename)
+
+
+@login_required
+@require_http_methods(["GET"])
+def export_assurances_view(request):
+    """
+    Export de toutes les assurances, avec le nom du client et de la branche.
+    Filtres : ?branche=<id>, ?date_min= et ?date_max= (sur la date de début).
+    """
+    queryset = Assurance.objects.for_user(request.user)
+    return _export_view(request, queryset, ASSURANCE_COLUMNS, 'date_debut', 'assurances')
+
+
+@login_required
+@require_http_methods(["GET"])
+def export_clients_view(request):
+    """
+    Export de tous les clients, avec le nom de leur branche.
+    Filtres : ?branche=<id>, ?date_min= et ?date_max= (sur la date d'inscription).
+    """
+    queryset = Client.objects.for_user(request.user)
+    return _export_view(request, queryset, CLIENT_COLUMNS, 'date_inscription', 'clients')
+
+
+# --------- AUTOCOMPLÉTION (widgets AutocompleteSelect du formulaire Assurance) ---------
+
+# Nombre maximal de propositions renvoyées
+AUTOCOMPLETE_LIMIT = 20
+
+
+@login_required
+@require_http_methods(["GET"])
+def autocomplete_clients_view(request):
+    """
+    Propositions de clients pour ?q=, par préfixe, via l'index plein texte (voir search.py).
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'results': []})
+    queryset = Client.objects.for_user(request.user).only('nom', 'prenom', 'email')
+    clients = search_clients(queryset, query, limit=AUTOCOMPLETE_LIMIT)
+    results = [
+        {'id': client.pk, 'text': f"{client} ({client.email})"}
+        for client in clients[:AUTOCOMPLETE_LIMIT]
+    ]
+    return JsonResponse({'results': results})
+
+
+@login_required
+@require_http_methods(["GET"])
+def autocomplete_branches_view(request):
+    """
+    Propositions de branches dont le nom commence par ?q=.
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'results': []})
+    branches = Branche.objects.for_user(request.user).filter(nom__istartswith=query).order_by('nom').only('nom', 'ville')
+    results = [
+        {'id': branche.pk, 'text': f"{branche.nom} - {branche.ville}"}
+        for branche in branches[:AUTOCOMPLETE_LIMIT]
+    ]
+    return JsonResponse({'results': results})
+
+
+# --------- TABLEAU DE BORD (JSON) ---------
+
+@login_required
+@require_http_methods(["GET"])
+def dashboard_stats_view(request):
+    """
+    Statistiques du tableau de bord par branche visible, en JSON (mêmes chiffres que la page
+    d'accueil). Pendant synchrone de async_dashboard_view (voir la commande benchmark_asgi).
+    """
+    return JsonResponse(dashboard.statistics_json(dashboard.branch_statistics(request.user)))
+
+
+# --------- STATISTIQUES DU CACHE DES LISTES ---------
+
+@login_required
+@require_http_methods(["GET"])
+def cache_stats_view(request):
+    """
+    Compteurs de succès / échecs du cache des listes (JSON), réservés au siège.
+    """
+    if not (request.user.is_superuser or request.user.is_super_admin()):
+        return JsonResponse({'detail': "Accès réservé aux super administrateurs."}, status=403)
+    return JsonResponse(caching.stats())
+
+
+# --------- MÉTRIQUES (FORMAT PROMETHEUS) ---------
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """
+    Métriques de tous les workers au format texte de Prometheus (voir metrics.py).
+    Réservé au siège, ou à un collecteur qui présente le jeton METRICS_TOKEN.
+    """
+    if not metrics.has_scrape_token(request):
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if not (request.user.is_superuser or request.user.is_super_admin()):
+            return HttpResponse("Accès réservé aux super administrateurs.\n", status=403, content_type=metrics.CONTENT_TYPE)
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 # --------- VUES D'AUTHENTIFICATION ---------
 
 @require_http_methods(["GET", "POST"])
@@ -147,7 +511,7 @@ def add_employee_view(request):
     
     # Si c'est une requête POST (formulaire soumis)
     if request.method == 'POST':
-        form = AddEmployeeForm(request.POST)
+        form = AddEmployeeForm(request.POST, user=request.user)
         if form.is_valid():
             # On sauvegarde le nouvel employé
             user = form.save()
@@ -158,7 +522,7 @@ def add_employee_view(request):
             messages.error(request, 'Veuillez corriger les erreurs ci-dessous.')
     else:
         # Si c'est une requête GET, on affiche le formulaire vide
-        form = AddEmployeeForm()
+        form = AddEmployeeForm(user=request.user)
     
     return render(request, 'add_employee.html', {'form': form})
 
@@ -182,7 +546,18 @@ def home_view(request):
     Sinon, on redirige vers la page de connexion.
     """
     if request.user.is_authenticated:
-        return render(request, 'home.html', {'user': request.user})
+        # Statistiques précalculées (dashboard.py) : une ligne lue par branche visible
+        statistiques = dashboard.branch_statistics(request.user)
+        totaux = {
+            name: sum(getattr(stat, name) for _, stat in statistiques)
+            for name in dashboard.FIGURES
+        }
+        return render(request, 'home.html', {
+            'user': request.user,
+            'statistiques': statistiques,
+            'totaux': totaux,
+            'horizon_expiration': dashboard.EXPIRATION_HORIZON_DAYS,
+        })
     else:
         return redirect('login')
 
@@ -190,15 +565,15 @@ def home_view(request):
 @login_required
 def employee_list_view(request):
     """
-    Vue pour lister tous les employés.
-    Accessible seulement aux administrateurs.
+    Vue pour lister les employés : tous pour le siège, ceux de sa branche
+    pour un administrateur de branche.
     """
     # Vérification que l'utilisateur est un administrateur
     if not (request.user.is_super_admin() or request.user.is_branch_admin()):
         messages.error(request, 'Vous n\'avez pas les permissions nécessaires pour voir la liste des employés.')
         return redirect('/')
     
-    # Récupération de tous les utilisateurs
-    employees = Utilisateur.objects.all().order_by('username')
+    # Employés visibles par l'utilisateur (filtre par branche en SQL)
+    employees = Utilisateur.objects.for_user(request.user).order_by('username')
     
     return render(request, 'employee_list.html', {'employees': employees})
\ No newline at end of file
@@ -0,0 +1,51 @@
+from django import forms
+
+
+# --------- WIDGET D'AUTOCOMPLÉTION ---------
+# Un <select> classique contient une <option> par ligne de la table : avec 100 000 clients,
+# la page "nouvelle assurance" pèse plusieurs Mo. Ce widget n'affiche qu'un champ texte
+# et un champ caché (l'id choisi) ; les propositions arrivent au fil de la frappe depuis
+# un endpoint JSON (voir autocomplete_clients_view / autocomplete_branches_view).
+
+
+class AutocompleteSelect(forms.Widget):
+    """
+    Remplace le <select> d'un ModelChoiceField par un champ de recherche.
+    Seul l'objet déjà sélectionné (en modification) est lu en base pour afficher son libellé ;
+    le reste de la table n'est jamais chargé.
+    """
+
+    template_name = "widgets/autocomplete.html"
+
+    class Media:
+        js = ["gestion/autocomplete.js"]
+
+    def __init__(self, url, attrs=None, placeholder="Tapez pour rechercher..."):
+        super().__init__(attrs)
+        # URL de l'endpoint JSON (peut être un reverse_lazy)
+        self.url = url
+        self.placeholder = placeholder
+        # Renseigné par ModelChoiceField (comme pour un Select)
+        self.choices = []
+
+    def label_for(self, value):
+        """
+        Libellé de l'objet sélectionné (une seule requête, par clé primaire).
+        """
+        queryset = getattr(self.choices, "queryset", None)
+        if value in (None, "") or queryset is None:
+            return ""
+        try:
+            obj = queryset.filter(pk=value).first()
+        except (TypeError, ValueError):
+            return ""
+        return str(obj) if obj is not None else ""
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"].update({
+            "url": str(self.url),
+            "label": self.label_for(value),
+            "placeholder": self.placeholder,
+        })
+        return context
@@ -43,7 +43,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "gestion.profiling.ProfilingMiddleware",
+    "gestion.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "gestion.routers.ReadYourWritesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -75,13 +78,66 @@ WSGI_APPLICATION = "intia_assurance.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Profil SQLite de production, appliqué à chaque nouvelle connexion :
+# - journal_mode=WAL : les lectures ne bloquent plus les écritures (et inversement) ;
+# - synchronous=NORMAL : sûr en WAL, évite un fsync à chaque commit ;
+# - busy_timeout : une écriture attend le verrou (ms) au lieu d'échouer aussitôt ;
+# - cache_size (négatif = Kio) et mmap_size (octets) : pages gardées en mémoire ;
+# - transaction_mode IMMEDIATE : une transaction prend le verrou d'écriture dès BEGIN,
+#   au lieu de tenter de passer de lecture à écriture en cours de route ("database is locked"
+#   immédiat, sans attente, quand deux transactions le tentent en même temps).
+# CONN_MAX_AGE garde la connexion (et ses pragmas) d'une requête à l'autre.
+# Au-delà de busy_timeout, gestion/database.py relance l'instruction avec backoff.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -20000,
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": ";".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+            "transaction_mode": "IMMEDIATE",
+        },
     }
 }
 
+# Réplique en lecture seule : les lectures y sont envoyées par gestion/routers.py.
+# En local, c'est le même fichier ouvert en lecture seule (URI mode=ro) : une écriture
+# routée par erreur vers elle échoue. En production, pointer NAME vers la copie répliquée.
+# Pendant les tests, la réplique est un miroir de "default" (et n'est donc pas utilisée).
+DATABASES["replica"] = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": (BASE_DIR / "db.sqlite3").as_uri() + "?mode=ro",
+    "CONN_MAX_AGE": 600,
+    "CONN_HEALTH_CHECKS": True,
+    "OPTIONS": {
+        "uri": True,
+        # journal_mode, synchronous et BEGIN IMMEDIATE écrivent : inutiles en lecture seule
+        "init_command": ";".join(
+            f"PRAGMA {name}={SQLITE_PRAGMAS[name]}" for name in ("busy_timeout", "cache_size", "mmap_size", "temp_store")
+        ),
+    },
+    "TEST": {"MIRROR": "default"},
+}
+DATABASE_ROUTERS = ["gestion.routers.PrimaryReplicaRouter"]
+DATABASE_READ_REPLICA = "replica"
+# Durée (secondes) pendant laquelle un navigateur qui vient d'écrire lit sur "default"
+REPLICA_PIN_SECONDS = 5
+
+# Relance des instructions bloquées au-delà de busy_timeout (gestion/database.py)
+DB_LOCK_RETRY_ATTEMPTS = 5
+DB_LOCK_RETRY_BASE_DELAY = 0.05
+DB_LOCK_RETRY_MAX_DELAY = 2.0
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -128,7 +184,89 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Format : 'nom_app.nom_modele'
 AUTH_USER_MODEL = "gestion.Utilisateur"
 
+# Utilisateur connecté chargé depuis le cache, avec sa branche (gestion/backends.py)
+AUTHENTICATION_BACKENDS = ["gestion.backends.CachedModelBackend"]
+AUTH_USER_CACHE_ALIAS = "default"
+AUTH_USER_CACHE_TIMEOUT = 300
+# Sessions lues dans le cache "default", écrites aussi en base (elles survivent au cache)
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
 # URL de redirection après connexion réussie
 LOGIN_URL = "/login/"
 LOGIN_REDIRECT_URL = "/"
-LOGOUT_REDIRECT_URL = "/login/"
\ No newline at end of file
+LOGOUT_REDIRECT_URL = "/login/"
+
+# --------- CONFIGURATION DE L'API REST (Django REST Framework) ---------
+# Toutes les listes de l'API sont paginées (curseur sur l'id par défaut)
+# pour ne jamais sérialiser une table entière en une seule réponse.
+REST_FRAMEWORK = {
+    "DEFAULT_PAGINATION_CLASS": "gestion.pagination.ApiCursorPagination",
+    "PAGE_SIZE": 50,
+}
+
+# Taille de page maximale acceptée par l'API (?page_size= ou ?limit=)
+API_MAX_PAGE_SIZE = 500
+
+# Opérations en masse de l'API : taille des lots SQL et nombre maximal d'éléments par requête
+API_BULK_BATCH_SIZE = 500
+API_BULK_MAX_ITEMS = 5000
+
+# --------- CACHE ---------
+# "default" est partagé par tous les workers (FileBasedCache : un fichier par entrée
+# dans CACHE_DIR, sur le disque de la machine). Il porte les sessions (cached_db) et
+# les utilisateurs connectés (gestion/backends.py) : une déconnexion, un changement de
+# mot de passe, de rôle ou de branche doit être vu de tous les workers. Un cache propre
+# à chaque processus (LocMemCache) est refusé au démarrage (gestion/checks.py).
+# "listes" : pages des listes (web et API) par branche, voir gestion/caching.py. Partagé
+# lui aussi : les versions incrémentées à chaque écriture doivent être vues de tous les
+# workers, sinon la page affichée après une redirection vers un autre worker peut
+# ignorer l'écriture. Au-delà de MAX_ENTRIES, 1/CULL_FREQUENCY des entrées est supprimé.
+# Plusieurs machines : passer à un cache réseau (django.core.cache.backends.redis.RedisCache).
+CACHE_DIR = BASE_DIR / "cache"
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_DIR / "default",
+        "OPTIONS": {"MAX_ENTRIES": 20000, "CULL_FREQUENCY": 10},
+    },
+    "listes": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_DIR / "listes",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 5000, "CULL_FREQUENCY": 10},
+    },
+}
+LIST_CACHE_ALIAS = "listes"
+# Durée de vie (secondes) d'une page en cache : borne le délai de prise en compte
+# des écritures qui n'envoient pas de signal (QuerySet.update, SQL direct)
+LIST_CACHE_TIMEOUT = 300
+
+# --------- PROFILAGE DES REQUÊTES ---------
+# En-tête Server-Timing et profils cProfile, voir gestion/profiling.py.
+# Désactivé par défaut : le middleware se retire alors de la chaîne.
+PROFILING_ENABLED = False
+# Part des requêtes profilées (0.01 = 1 %)
+PROFILING_SAMPLE_RATE = 0.0
+# Garder le profil de toute requête plus lente (ms) ; None = désactivé
+PROFILING_SLOW_MS = None
+PROFILING_DIR = BASE_DIR / "profiles"
+PROFILING_MAX_FILES = 50
+
+# --------- JOURNAL DES REQUÊTES LENTES ---------
+# Requêtes SQL plus lentes que SLOW_QUERY_MS (None = désactivé), avec leur plan SQLite,
+# voir gestion/slow_queries.py. Rapport : python manage.py slow_queries
+SLOW_QUERY_MS = 200
+SLOW_QUERY_LOG = BASE_DIR / "slow_queries.log"
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+# Tables dont un parcours complet est signalé
+SLOW_QUERY_SCAN_TABLES = ("gestion_client", "gestion_assurance")
+
+# --------- MÉTRIQUES (FORMAT PROMETHEUS) ---------
+# Requêtes, durées, requêtes SQL et succès de cache par vue, voir gestion/metrics.py.
+# Endpoint /stats/metrics/ : siège connecté, ou "Authorization: Bearer <METRICS_TOKEN>".
+# Dossier partagé par les workers d'une même machine (un fichier par processus)
+METRICS_DIR = BASE_DIR / "metrics"
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Jeton du collecteur Prometheus (None = accès par session uniquement)
+METRICS_TOKEN = None